@@ -1,35 +1,41 @@
+import os
 import pygame
 import sys
 import random
 
+# The shared asset cache lives in the Python folder, next to the assets
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Python"))
+from asset_cache import DINO_DUCKING, DINO_RUNNING, GROUND_SIZE, shared
+from game_sim import CLOUD_SIZE, DUCK_SIZE, RUN_SIZE
+
 class DinoGame:
     def __init__(self):
         pygame.init()
         self.screen = pygame.display.set_mode((1280, 720))
         pygame.display.set_caption("Dino Game")
         self.clock = pygame.time.Clock()
-        self.game_font = pygame.font.Font(None, 24)
+        # Every image, sound and font, loaded once before the game starts
+        self.assets = shared().preload()
+        self.game_font = self.assets.font(None, 24)
 
         self.game_speed = 7
         self.player_score = 0
         self.game_over = False
 
-        self.ground = pygame.image.load("assets/ground.png")
-        self.ground = pygame.transform.scale(self.ground, (1280, 20))
+        self.ground = self.assets.image("ground.png", GROUND_SIZE)
         self.ground_x = 0
 
-        self.cloud = pygame.image.load("assets/cloud.png")
-        self.cloud = pygame.transform.scale(self.cloud, (200, 80))
+        self.cloud = self.assets.image("cloud.png", CLOUD_SIZE)
         
         self.cloud_group = pygame.sprite.Group()
         self.dino_group = pygame.sprite.GroupSingle()
 
-        self.dinosaur = Dino(50, 360)
+        self.dinosaur = Dino(self.assets, 50, 360)
         self.dino_group.add(self.dinosaur)
 
-        self.death_sfx = pygame.mixer.Sound("assets/sfx/lose.mp3")
-        self.points_sfx = pygame.mixer.Sound("assets/sfx/100points.mp3")
-        self.jump_sfx = pygame.mixer.Sound("assets/sfx/jump.mp3")
+        self.death_sfx = self.assets.sound("sfx/lose.mp3")
+        self.points_sfx = self.assets.sound("sfx/100points.mp3")
+        self.jump_sfx = self.assets.sound("sfx/jump.mp3")
 
         self.CLOUD_EVENT = pygame.USEREVENT
         pygame.time.set_timer(self.CLOUD_EVENT, 3000)
@@ -128,16 +134,10 @@ class Cloud(pygame.sprite.Sprite):
         self.rect.x -= 1
 
 class Dino(pygame.sprite.Sprite):
-    def __init__(self, x_pos, y_pos):
+    def __init__(self, assets, x_pos, y_pos):
         super().__init__()
-        self.running_sprites = [
-            pygame.transform.scale(pygame.image.load("assets/Dino1.png"), (80, 100)),
-            pygame.transform.scale(pygame.image.load("assets/Dino2.png"), (80, 100))
-        ]
-        self.ducking_sprites = [
-            pygame.transform.scale(pygame.image.load("assets/DinoDucking1.png"), (110, 60)),
-            pygame.transform.scale(pygame.image.load("assets/DinoDucking2.png"), (110, 60))
-        ]
+        self.running_sprites = assets.images(DINO_RUNNING, RUN_SIZE)
+        self.ducking_sprites = assets.images(DINO_DUCKING, DUCK_SIZE)
         self.image = self.running_sprites[0]
         self.rect = self.image.get_rect(center=(x_pos, y_pos))
         self.velocity = 50
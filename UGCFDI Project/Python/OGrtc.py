@@ -5,64 +5,75 @@ This script performs real-time classification by reading sensor data from the se
 processing a sliding window of data, extracting enhanced features,
 and using the trained model to predict the movement.
 
-
+Usage: python OGrtc.py [--port COM4] [--binary] [--game 127.0.0.1:9999] [--latency-log latency.json]
+       python OGrtc.py --replay data [--speed 0]
+--replay feeds the recordings in the given folder instead of the Arduino (see replay.py);
+--speed 0 replays as fast as possible to measure throughput and per-decision latency.
+--game sends jump/duck commands (with latency stamps, see latency.py) to dino_game.py.
 """
 
-import serial
+import argparse
 import time
 import numpy as np
-import tensorflow as tf
-from collections import deque
 
-# Load the trained model
-model = tf.keras.models.load_model("emg_classifier.h5")
-# Define label classes as per the training (update these based on your actual labels)
-label_classes = ['clench', 'index', 'rest', 'wrist']
+from acquisition import Acquisition, SerialSource
+from command_server import connect
+from feature_registry import model_features
+from inference import load_classifier
+from latency import LatencyRecorder, LatencyTrace
+from ring_buffer import hop_size
+from serial_protocol import ASCII_BAUD, BINARY_BAUD
+from streaming_features import StreamingFeatures
+
+# Load the trained model. The .npz export loads with NumPy only (no TensorFlow import);
+# "direct"/"keras" load the .h5 saved next to it and need TensorFlow
+MODEL_PATH = "emg_classifier.npz"
+INFERENCE_BACKEND = "numpy"  # "numpy", "direct" (model(x, training=False)) or "keras" (model.predict)
+model = load_classifier(MODEL_PATH, backend=INFERENCE_BACKEND)
+# Label classes in training order, stored with the model
+label_classes = model.label_classes
 
 # Parameters for the sliding window
 WINDOW_SIZE = 100  # Number of samples in each window
 OVERLAP_PERCENTAGE = 0  # 50% overlap between windows
 CONFIDENCE_THRESHOLD = 0.7  # Only report predictions above this confidence
 
-data_buffer = deque(maxlen=WINDOW_SIZE)
-timestamps_buffer = deque(maxlen=WINDOW_SIZE)
-
-# Open serial connection (adjust port if necessary)
-ser = serial.Serial('COM4', 9600)
-ser.flushInput()
-time.sleep(0.5)
-
-def extract_features(window, timestamps):
-    """
-    Extract enhanced features from a list of sensor values.
-    Features: AUC, mean, std, RMS, max, min, mean derivative, std derivative.
-    """
-    window = np.array(window)
-    timestamps = np.array(timestamps)
-    
-    # Calculate AUC using the trapezoidal rule
-    if len(timestamps) > 1:
-        auc = np.trapezoid(window, timestamps)
-    else:
-        auc = 0
-
-    mean_val = np.mean(window)
-    std_val = np.std(window)
-    rms_val = np.sqrt(np.mean(np.square(window)))
-    max_val = np.max(window)
-    min_val = np.min(window)
-    
-    # Compute derivative features
-    derivative = np.diff(window)
-    if len(derivative) > 0:
-        mean_deriv = np.mean(derivative)
-        std_deriv = np.std(derivative)
-    else:
-        mean_deriv = 0
-        std_deriv = 0
-    
-    features = np.array([auc, mean_val, std_val, rms_val, max_val, min_val, mean_deriv, std_deriv])
-    return features.reshape(1, -1)
+# Sliding window with only the features the model was trained on, in its input
+# order; without overlap each window is recomputed when its hop is due, with a
+# large overlap the statistics are kept up to date per sample (streaming_features.py)
+feature_engine = StreamingFeatures(WINDOW_SIZE, hop=hop_size(WINDOW_SIZE, OVERLAP_PERCENTAGE),
+                                   features=model_features(model))
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--port', type=str, default='COM4', help='Serial port (e.g., COM4 or /dev/ttyACM0)')
+# Binary frames come from emg_sensor.ino with BINARY_MODE 1 at 500-1000 Hz,
+# so WINDOW_SIZE covers less time than with the ASCII output at ~100 Hz
+parser.add_argument('--binary', action='store_true', help='Read binary frames instead of ASCII lines')
+parser.add_argument('--replay', type=str, help='Replay the recordings in this folder instead of reading the serial port')
+parser.add_argument('--speed', type=float, default=1.0, help='Replay speed (1.0 = real time, 0 = as fast as possible)')
+parser.add_argument('--game', type=str, help='host:port (or unix:<path>) of the dino_game.py command server')
+parser.add_argument('--latency-log', type=str, help='Write per-stage latency percentiles/histograms to this JSON file')
+args = parser.parse_args()
+
+# Movements that control the game
+GAME_COMMANDS = {'clench': 'jump', 'wrist': 'duck'}
+game = None
+if args.game:
+    game = connect(args.game)
+
+if args.replay:
+    from replay import ReplaySource, load_recordings
+    source = ReplaySource(load_recordings(args.replay), speed=args.speed or None, block_size=64)
+else:
+    import serial
+    # Open serial connection (adjust port if necessary)
+    ser = serial.Serial(args.port, BINARY_BAUD if args.binary else ASCII_BAUD)
+    ser.flushInput()
+    time.sleep(0.5)
+    source = SerialSource(ser, binary=args.binary)
+
+# Sample reading runs in its own thread; a slow prediction no longer backs up the serial buffer
+acquisition = Acquisition(source, drop_when_full=not args.replay).start()
 
 print("Starting real-time classification. Press Ctrl+C to stop.")
 
@@ -70,20 +81,33 @@ last_prediction = None
 last_prediction_time = 0
 prediction_cooldown = 0.5  # Seconds between reporting same prediction
 
+# Throughput and per-decision latency (features + inference), reported on exit
+samples_processed = 0
+decision_times = []
+latency = LatencyRecorder()
+run_start = time.perf_counter()
+
 try:
     while True:
-        line = ser.readline().decode('latin-1').strip()
-        try:
-            value = int(line)
-            current_time = time.time()
-            
-            data_buffer.append(value)
-            timestamps_buffer.append(current_time)
+        block = acquisition.get(timeout=1.0)
+        if block is None:
+            if getattr(source, "exhausted", False):
+                break  # replay finished
+            continue
+
+        timestamps, values, arrival, _ = block
+        samples_processed += len(values)
+        for current_time, value in zip(timestamps.tolist(), values.tolist()):
+            feature_engine.push(current_time, value)
             
-            # Check if we have enough data to make a prediction
-            if len(data_buffer) >= WINDOW_SIZE:
-                features = extract_features(list(data_buffer), list(timestamps_buffer))
+            # Predict once the window is full and has moved on by one hop
+            if feature_engine.hop_due():
+                trace = LatencyTrace().mark("sample", arrival).mark("window")
+                features = feature_engine.features()
+                trace.mark("features")
                 prediction = model.predict(features)
+                trace.mark("inference")
+                decision_times.append(trace.stamps["inference"] - trace.stamps["window"])
                 max_prob = np.max(prediction)
                 predicted_label = label_classes[np.argmax(prediction)]
                 
@@ -94,16 +118,27 @@ try:
                     print(f"Predicted movement: {predicted_label} (Confidence: {max_prob:.2f})")
                     last_prediction = predicted_label
                     last_prediction_time = current_time
-                
-                # Slide the window with overlap
-                slide_amount = int(WINDOW_SIZE * (1 - OVERLAP_PERCENTAGE))
-                data_buffer = deque(list(data_buffer)[slide_amount:], maxlen=WINDOW_SIZE)
-                timestamps_buffer = deque(list(timestamps_buffer)[slide_amount:], maxlen=WINDOW_SIZE)
 
-        except Exception as e:
-            # Optionally, print or log the exception: print("Error:", e)
-            continue
+                    command = GAME_COMMANDS.get(predicted_label)
+                    if game is not None and command:
+                        # One command per line, followed by the stamps so far
+                        trace.mark("sent")
+                        game.sendall(f"{command} {trace.encode()}\n".encode())
+                latency.add(trace)
 
 except KeyboardInterrupt:
     print("Exiting real-time classification...")
-ser.close()
+acquisition.stop()
+if game is not None:
+    game.close()
+elapsed = time.perf_counter() - run_start
+print("Acquisition stats:", acquisition.stats())
+print(f"Processed {samples_processed} samples in {elapsed:.2f} s ({samples_processed / elapsed:.0f} samples/s), "
+      f"{len(decision_times)} decisions")
+if decision_times:
+    p50, p95, p99 = np.percentile(decision_times, [50, 95, 99]) * 1e6
+    print(f"Decision latency (features + inference): p50 {p50:.0f} us, p95 {p95:.0f} us, p99 {p99:.0f} us")
+    print(latency.format_line("inference"))
+if args.latency_log:
+    latency.export(args.latency_log)
+    print(f"Latency report saved to {args.latency_log}")
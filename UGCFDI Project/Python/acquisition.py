@@ -0,0 +1,200 @@
+"""
+acquisition.py
+
+Serial acquisition in its own thread.
+
+The reader thread only reads from the sensor and pushes timestamped sample blocks
+into a bounded queue; the classifier (or the game) consumes them at its own pace.
+A slow prediction or a slow frame therefore no longer backs up the OS serial buffer.
+
+A sample source is any object with:
+    read_block() -> (timestamps, values)   blocking until at least one sample (or a
+                                           short timeout), may return empty arrays;
+                                           multi-channel sources return
+                                           (timestamps, values, channels)
+    close()
+SerialSource wraps a pyserial port in ASCII or binary frame mode.
+
+If the consumer falls behind and the queue is full, the oldest block is dropped so
+the classifier always sees the freshest data; stats() reports every such overrun.
+Sources that can wait (replays) use drop_when_full=False to apply backpressure instead.
+"""
+
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from serial_protocol import FrameDecoder, read_frames
+
+# arrival: time.perf_counter() when the block was read (see latency.py)
+# channels: channel of every sample for multi-channel sources, None otherwise
+Block = namedtuple("Block", ["timestamps", "values", "arrival", "channels"], defaults=(None,))
+
+
+class SerialSource:
+    """
+    Sample source reading from an open serial port.
+    ASCII mode timestamps every line with time.time() as it is read and returns all
+    lines already waiting as one block; binary mode decodes whole chunks of frames
+    and uses the Arduino's micros() clock.
+    With channels=True (binary mode, several electrodes on one board) read_block()
+    also returns the channel of every sample.
+    """
+
+    def __init__(self, ser, binary=False, max_block=256, channels=False):
+        if channels and not binary:
+            raise ValueError("Only binary frames carry a channel")
+        self.ser = ser
+        self.binary = binary
+        self.channels = channels
+        self.max_block = max_block
+        self.decoder = FrameDecoder() if binary else None
+        self.parse_errors = 0
+
+    @property
+    def dropped(self):
+        """Samples the device sent but we never received (sequence gaps, binary mode only)."""
+        return self.decoder.dropped if self.decoder else 0
+
+    def read_block(self):
+        if self.binary:
+            frames = read_frames(self.ser, self.decoder)
+            if self.channels:
+                return frames.device_time, frames.values, frames.channels
+            return frames.device_time, frames.values
+
+        timestamps = []
+        values = []
+        while True:
+            line = self.ser.readline()
+            if not line:
+                break  # read timeout
+            now = time.time()
+            try:
+                values.append(int(line.decode('latin-1').strip()))
+                timestamps.append(now)
+            except ValueError:
+                self.parse_errors += 1
+            if len(values) >= self.max_block or self.ser.in_waiting == 0:
+                break
+        return np.array(timestamps), np.array(values)
+
+    def close(self):
+        self.ser.close()
+
+
+class Acquisition:
+    """
+    Runs source.read_block() in a daemon thread and hands Block(timestamps, values, arrival,
+    channels) tuples to the consumer through a bounded queue of `max_blocks` blocks.
+    """
+
+    def __init__(self, source, max_blocks=256, drop_when_full=True):
+        self.source = source
+        self.drop_when_full = drop_when_full
+        self.blocks = queue.Queue(maxsize=max_blocks)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="acquisition", daemon=True)
+        self.error = None
+
+        self.samples_read = 0
+        self.blocks_read = 0
+        self.overruns = 0           # blocks discarded because the consumer fell behind
+        self.overrun_samples = 0
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        self._thread.join(timeout)
+        self.source.close()
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                timestamps, values, *channels = self.source.read_block()
+                if len(values) == 0:
+                    continue
+                self.samples_read += len(values)
+                self.blocks_read += 1
+                self._put(Block(timestamps, values, time.perf_counter(), *channels))
+        except Exception as e:
+            # Surface the error to the consumer instead of dying silently
+            self.error = e
+
+    def _put(self, block):
+        if not self.drop_when_full:
+            while not self._stop.is_set():
+                try:
+                    self.blocks.put(block, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+            return
+        while True:
+            try:
+                self.blocks.put_nowait(block)
+                return
+            except queue.Full:
+                try:
+                    dropped = self.blocks.get_nowait()
+                    self.overruns += 1
+                    self.overrun_samples += len(dropped.values)
+                except queue.Empty:
+                    pass
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise RuntimeError("acquisition thread stopped") from self.error
+
+    def get(self, timeout=None):
+        """
+        Next Block, or None if nothing arrived within `timeout`. Blocks read before
+        the reader thread failed are still returned; the error is raised once they
+        have all been taken.
+        """
+        while True:
+            try:
+                if self.error is not None:
+                    return self.blocks.get_nowait()
+                # Wakes up now and then so a reader that fails while we wait is noticed
+                return self.blocks.get(timeout=0.1 if timeout is None else timeout)
+            except queue.Empty:
+                self._raise_error()
+                if timeout is not None:
+                    return None
+
+    def drain(self):
+        """
+        All blocks waiting right now, without blocking (for once-per-frame consumers).
+        Raises the reader thread's error only when no block is left.
+        """
+        blocks = []
+        while True:
+            try:
+                blocks.append(self.blocks.get_nowait())
+            except queue.Empty:
+                if not blocks:
+                    self._raise_error()
+                return blocks
+
+    def stats(self):
+        """Counters to check that no data is lost under load."""
+        return {
+            "samples_read": self.samples_read,
+            "blocks_read": self.blocks_read,
+            "queued_blocks": self.blocks.qsize(),
+            "overruns": self.overruns,
+            "overrun_samples": self.overrun_samples,
+            "device_dropped": getattr(self.source, "dropped", 0),
+            "parse_errors": getattr(self.source, "parse_errors", 0),
+        }
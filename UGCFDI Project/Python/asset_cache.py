@@ -0,0 +1,196 @@
+"""
+asset_cache.py
+
+Images, sounds and fonts of the Dino games (Python/assets), loaded once per
+process and shared by everything that draws or plays them.
+
+The games used to load from disk whenever a sprite was built. UI/gameUI.py's
+Cactus read and scaled all six cactus images on every spawn, mid-game, and the
+Ptero read two. Each game variant also kept its own copies. Now:
+- image(name, size) decodes the file once, scales it once, and converts it to the
+  display's pixel format once (convert_alpha(), so blits do not convert per
+  pixel). Every caller gets the same Surface; never draw on it
+- sound(name) decodes the file to mixer samples once (pygame.mixer.Sound), so
+  play() only mixes
+- font(name, size): one Font object per file and size (None: pygame's default)
+- preload() loads every asset the games use (GAME_IMAGES, GAME_SOUNDS), right after
+  pygame.display.set_mode(), so nothing touches the disk once the game runs.
+  Anything else is loaded on first use
+- stats() reports the load time, the number of files read and the memory of the
+  decoded surfaces and sounds
+
+shared() is the cache of the process, emptied by pygame.quit(): dino_game.py,
+OGgame.py, gameUI.py and UI/gameUI.py all use it. Paths are relative to this file, so the games can be run
+from any folder.
+
+Usage: python asset_cache.py
+preloads everything headless and prints the time and memory per asset. It also
+times a cactus spawn the old way (six files read and scaled) against a spawn from
+the cache.
+"""
+
+import os
+import time
+
+import pygame
+
+from game_sim import CACTUS_SIZE, CACTUS_VARIANTS, CLOUD_SIZE, DUCK_SIZE, PTERO_SIZE, RUN_SIZE
+
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+
+DINO_RUNNING = ["Dino1.png", "Dino2.png"]
+DINO_DUCKING = ["DinoDucking1.png", "DinoDucking2.png"]
+PTERO = ["Ptero1.png", "Ptero2.png"]
+CACTI = [f"cacti/cactus{i}.png" for i in range(1, CACTUS_VARIANTS + 1)]
+GROUND_SIZE = (1280, 20)
+
+# (file, size) of every image the games draw, at the size they draw it
+GAME_IMAGES = ([(name, RUN_SIZE) for name in DINO_RUNNING] + [(name, DUCK_SIZE) for name in DINO_DUCKING]
+               + [(name, PTERO_SIZE) for name in PTERO] + [(name, CACTUS_SIZE) for name in CACTI]
+               + [("ground.png", GROUND_SIZE), ("cloud.png", CLOUD_SIZE)])
+GAME_SOUNDS = ["sfx/jump.mp3", "sfx/100points.mp3", "sfx/lose.mp3"]
+GAME_FONTS = [(None, 24)]
+
+
+class AssetCache:
+    """Loads each (image, size, convert), sound and (font, size) once and hands out the same object."""
+
+    def __init__(self, root=ASSET_DIR):
+        self.root = root
+        self._images = {}
+        self._sounds = {}
+        self._fonts = {}
+        self.files_read = 0
+        self.load_time = 0.0
+        self.times = {}             # key -> seconds it took to load
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def image(self, name, size=None, convert=True):
+        """
+        `name` scaled to `size`, converted to the display format (needs
+        pygame.display.set_mode() first; convert=False keeps the file's format).
+        """
+        key = (name, size, convert)
+        if key not in self._images:
+            start = time.perf_counter()
+            original = self._image_file(name)
+            image = pygame.transform.scale(original, size) if size else original.copy()
+            self._images[key] = image.convert_alpha() if convert else image
+            self._loaded(key, start)
+        return self._images[key]
+
+    def images(self, names, size=None, convert=True):
+        return [self.image(name, size, convert) for name in names]
+
+    def _image_file(self, name):
+        # Decoded once, whatever sizes it is scaled to
+        key = (name, None, False)
+        if key not in self._images:
+            start = time.perf_counter()
+            self._images[key] = pygame.image.load(self.path(name))
+            self.files_read += 1
+            # Part of the image() call that needed it, so not added to load_time
+            self.times[key] = time.perf_counter() - start
+        return self._images[key]
+
+    def sound(self, name):
+        if name not in self._sounds:
+            start = time.perf_counter()
+            self._sounds[name] = pygame.mixer.Sound(self.path(name))
+            self.files_read += 1
+            self._loaded(name, start)
+        return self._sounds[name]
+
+    def font(self, name=None, size=24):
+        key = (name, size)
+        if key not in self._fonts:
+            start = time.perf_counter()
+            self._fonts[key] = pygame.font.Font(self.path(name) if name else None, size)
+            if name:
+                self.files_read += 1
+            self._loaded(key, start)
+        return self._fonts[key]
+
+    def _loaded(self, key, start):
+        elapsed = time.perf_counter() - start
+        self.times[key] = elapsed
+        self.load_time += elapsed
+
+    def preload(self, images=GAME_IMAGES, sounds=GAME_SOUNDS, fonts=GAME_FONTS, convert=True):
+        """Load everything the games use now, instead of during the game."""
+        for name, size in images:
+            self.image(name, size, convert)
+        for name in sounds:
+            self.sound(name)
+        for name, size in fonts:
+            self.font(name, size)
+        return self
+
+    def image_bytes(self):
+        # Decoded originals included: scaling other sizes needs them
+        return sum(image.get_pitch() * image.get_height() for image in self._images.values())
+
+    def sound_bytes(self):
+        frequency, size, channels = pygame.mixer.get_init() or (0, 0, 0)
+        return int(sum(sound.get_length() * frequency * channels * abs(size) // 8 for sound in self._sounds.values()))
+
+    def stats(self):
+        return {"images": len(self._images), "sounds": len(self._sounds), "fonts": len(self._fonts),
+                "files_read": self.files_read, "load_ms": self.load_time * 1000,
+                "image_bytes": self.image_bytes(), "sound_bytes": self.sound_bytes()}
+
+    def format_line(self):
+        stats = self.stats()
+        return (f"{stats['images']} images, {stats['sounds']} sounds, {stats['fonts']} font(s) from {stats['files_read']} "
+                f"files in {stats['load_ms']:.0f} ms; {stats['image_bytes'] / 1e6:.1f} MB of surfaces, "
+                f"{stats['sound_bytes'] / 1e6:.1f} MB of sound samples")
+
+
+_shared = None
+
+
+def shared():
+    """The AssetCache of this process, until pygame.quit() (its fonts and sounds do not outlive pygame)."""
+    global _shared
+    if _shared is None:
+        _shared = AssetCache()
+        pygame.register_quit(_forget_shared)
+    return _shared
+
+
+def _forget_shared():
+    global _shared
+    _shared = None
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    pygame.init()
+    pygame.display.set_mode((1280, 720))
+
+    start = time.perf_counter()
+    cache = shared().preload()
+    startup = time.perf_counter() - start
+    print(f"Preloaded in {startup * 1000:.1f} ms: {cache.format_line()}")
+    for key, seconds in sorted(cache.times.items(), key=lambda item: -item[1]):
+        print(f"  {seconds * 1000:7.2f} ms  {key}")
+
+    # A cactus spawn the old way (UI/gameUI.py's Cactus.__init__) against one from the cache
+    runs = 20
+    start = time.perf_counter()
+    for _ in range(runs):
+        sprites = [pygame.transform.scale(pygame.image.load(cache.path(name)), CACTUS_SIZE) for name in CACTI]
+    old = (time.perf_counter() - start) / runs
+    files_read = cache.files_read
+    start = time.perf_counter()
+    for _ in range(runs):
+        sprites = cache.images(CACTI, CACTUS_SIZE)
+    new = (time.perf_counter() - start) / runs
+    budget = 1000 / 120
+    print(f"Cactus spawn: {old * 1000:.2f} ms reading and scaling {len(CACTI)} files "
+          f"({old * 1000 / budget:.0%} of a 120 FPS frame), {new * 1e6:.1f} us from the cache "
+          f"({cache.files_read - files_read} files read)")
+    pygame.quit()
@@ -0,0 +1,211 @@
+"""
+benchmarks.py
+
+Micro-benchmarks for the classification hot path, run on the recordings in data/:
+- every registered feature on its own (feature/<name>/<window>, see feature_registry.py)
+- the whole feature vector as the real-time scripts compute it: full recompute
+  (window_features), StreamingFeatures per window without overlap (OGrtc.py:
+  basic, NEWrealtimeclass.py: extended, both recompute each window) and with a
+  hop of 10 samples (running sums), and batch_window_features per 64 windows
+- model prediction: NumPy backend, Keras model called directly and model.predict
+  (the Keras ones only if TensorFlow is installed)
+- loading the recordings: one CSV, the whole CSV folder and a recording store
+
+Window sizes go from 50 to 2000 samples. Every benchmark reports the best
+per-call time of several repeats, which is the most stable figure on a busy machine.
+
+Usage: python benchmarks.py [--filter feature/] [--quick] [--save] [--threshold 1.25]
+Results are compared with the baseline file (benchmark_baseline.json, specific to
+the machine it was recorded on) and benchmarks slower than threshold x baseline
+are flagged; the exit status is 1 if any is. --save records the current timings
+as the new baseline (merged with the benchmarks that did not run).
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from feature_cache import recording_label
+from feature_registry import FEATURES, batch_features, model_features
+from inference import load_classifier
+from recording_store import RecordingStore, import_csv_folder
+from replay import load_recordings
+from streaming_features import StreamingFeatures, batch_window_features, window_features
+
+WINDOW_SIZES = [50, 100, 200, 500, 1000, 2000]
+QUICK_WINDOW_SIZES = [100, 200]
+BATCH_WINDOWS = 64
+DEFAULT_BASELINE = "benchmark_baseline.json"
+DEFAULT_THRESHOLD = 1.25
+
+
+def measure(func, min_time=0.02, repeat=5):
+    """Best time per call in seconds, each repeat running func enough times to last min_time."""
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed > min_time / 4 else 10
+    times = [elapsed] + timer.repeat(repeat=repeat - 1, number=number)
+    return min(times) / number
+
+
+def single_feature_functions():
+    """One function per registered feature computing only that feature on one window."""
+    return {name: (lambda names: lambda v, t: batch_features(v[None], t[None], names))([name]) for name in FEATURES}
+
+
+class StreamingBench:
+    """Pushes one hop of new samples (default: the window size) and reads the features."""
+
+    def __init__(self, timestamps, values, window_size, extended, hop=None):
+        self.engine = StreamingFeatures(window_size, extended=extended, hop=hop)
+        self.window_size = window_size
+        self.hop = self.engine.hop
+        self.timestamps = timestamps.tolist()
+        self.values = values.tolist()
+        self.pos = 0
+        for _ in range(window_size):
+            self._push()
+
+    def _push(self):
+        if self.pos == len(self.values):
+            self.pos = 0
+        self.engine.push(self.timestamps[self.pos], self.values[self.pos])
+        self.pos += 1
+
+    def __call__(self):
+        for _ in range(self.hop):
+            self._push()
+        return self.engine.features()
+
+
+def benchmarks(data_folder, window_sizes, model_path, selected=lambda name: True):
+    """
+    Yield (name, function) pairs for the benchmarks whose name passes `selected`;
+    the others are not set up at all (no model loading, no store import).
+    """
+    recordings = load_recordings(data_folder)
+    if not recordings:
+        raise SystemExit(f"No recordings in {data_folder}")
+    # One long, monotonic signal to cut windows from
+    offset = 0.0
+    all_timestamps = []
+    for _, ts, _ in recordings:
+        all_timestamps.append(ts - ts[0] + offset)
+        offset = all_timestamps[-1][-1] + 0.01
+    timestamps = np.concatenate(all_timestamps)
+    values = np.concatenate([vs for _, _, vs in recordings]).astype(np.int64)
+
+    features = single_feature_functions()
+    for n in window_sizes:
+        start = len(values) // 3
+        v, t = values[start:start + n], timestamps[start:start + n]
+        for name, func in features.items():
+            if selected(f"feature/{name}/{n}"):
+                yield f"feature/{name}/{n}", (lambda func, v, t: lambda: func(v, t))(func, v, t)
+
+    for n in window_sizes:
+        start = len(values) // 3
+        v, t = values[start:start + n], timestamps[start:start + n]
+        view = np.lib.stride_tricks.sliding_window_view
+        vw = view(values, n)[start:start + BATCH_WINDOWS * n:n]
+        tw = view(timestamps, n)[start:start + BATCH_WINDOWS * n:n]
+        extract = {
+            "window_features_basic": lambda v=v, t=t: lambda: window_features(v, t),
+            "window_features_extended": lambda v=v, t=t: lambda: window_features(v, t, True),
+            "streaming_basic": lambda n=n: StreamingBench(timestamps, values, n, extended=False),
+            "streaming_extended": lambda n=n: StreamingBench(timestamps, values, n, extended=True),
+            "streaming_basic_hop10": lambda n=n: StreamingBench(timestamps, values, n, extended=False, hop=10),
+            "streaming_extended_hop10": lambda n=n: StreamingBench(timestamps, values, n, extended=True, hop=10),
+            f"batch_extended_x{BATCH_WINDOWS}": lambda vw=vw, tw=tw: lambda: batch_window_features(vw, tw, True),
+        }
+        for name, make in extract.items():
+            if selected(f"extract/{name}/{n}"):
+                yield f"extract/{name}/{n}", make()
+
+    keras_selected = selected("predict/keras_direct") or selected("predict/keras_predict")
+    if os.path.exists(model_path) and (selected("predict/numpy") or keras_selected):
+        model = load_classifier(model_path)
+        names = model_features(model)
+        row = window_features(values[:100], timestamps[:100], features=names).astype(np.float32).reshape(1, -1)
+        if selected("predict/numpy"):
+            yield "predict/numpy", lambda: model.predict(row)
+    if os.path.exists(model_path) and keras_selected:
+        try:
+            direct = load_classifier(model_path, backend="direct")
+            keras = load_classifier(model_path, backend="keras")
+        except ImportError:
+            print("TensorFlow not installed, skipping the Keras predict benchmarks")
+        else:
+            if selected("predict/keras_direct"):
+                yield "predict/keras_direct", lambda: direct.predict(row)
+            if selected("predict/keras_predict"):
+                yield "predict/keras_predict", lambda: keras.predict(row)
+
+    csv_files = sorted(f for f in os.listdir(data_folder) if f.endswith(".csv") and recording_label(f))
+    if csv_files and selected("load/read_csv_one"):
+        first_csv = os.path.join(data_folder, csv_files[0])
+        yield "load/read_csv_one", lambda: pd.read_csv(first_csv)
+    if selected("load/csv_folder"):
+        yield "load/csv_folder", lambda: load_recordings(data_folder)
+    if selected("load/store_folder"):
+        store_dir = tempfile.mkdtemp(prefix="emg_store_")
+        import_csv_folder(RecordingStore(store_dir), data_folder)
+        yield "load/store_folder", lambda: [len(vs) for _, _, vs in RecordingStore(store_dir).iter_sessions()]
+        shutil.rmtree(store_dir, ignore_errors=True)
+
+
+def load_baseline(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', type=str, default="data", help='Folder with data_<label>_<timestamp>.csv recordings')
+    parser.add_argument('--model', type=str, default="emg_classifier.npz", help='Classifier for the predict benchmarks')
+    parser.add_argument('--filter', type=str, default="", help='Only run benchmarks whose name contains this text')
+    parser.add_argument('--quick', action='store_true', help=f'Only window sizes {QUICK_WINDOW_SIZES}')
+    parser.add_argument('--baseline', type=str, default=DEFAULT_BASELINE, help='Baseline JSON file')
+    parser.add_argument('--save', action='store_true', help='Save the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Flag benchmarks slower than threshold x baseline')
+    parser.add_argument('--min-time', type=float, default=0.02, help='Seconds per timing repeat (raise on a noisy machine)')
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.baseline)
+    results = {}
+    regressions = []
+    print(f"{'benchmark':<48} {'us/call':>12} {'baseline':>12} {'ratio':>7}")
+    window_sizes = QUICK_WINDOW_SIZES if args.quick else WINDOW_SIZES
+    for name, func in benchmarks(args.data, window_sizes, args.model, lambda name: args.filter in name):
+        seconds = measure(func, min_time=args.min_time)
+        results[name] = seconds * 1e6
+        line = f"{name:<48} {results[name]:>12.2f}"
+        if name in baseline:
+            ratio = results[name] / baseline[name]
+            line += f" {baseline[name]:>12.2f} {ratio:>7.2f}"
+            if ratio > args.threshold:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line, flush=True)
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print(f"Saved {len(results)} timings to {args.baseline}")
+    if regressions:
+        print(f"{len(regressions)} regressions over {args.threshold}x baseline: {', '.join(regressions)}")
+        sys.exit(1)
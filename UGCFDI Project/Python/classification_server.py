@@ -0,0 +1,320 @@
+"""
+classification_server.py
+
+One classification process for several players and electrodes.
+
+Each station used to run its own copy of OGrtc.py, with one serial port, one model
+and one Python runtime per player. This server reads any number of sample sources,
+each carrying one or more channels, and classifies all of them with a single model:
+- one acquisition.Acquisition thread per source (serial port or replay). Binary
+  frames carry the channel in bits 12-15 of the sample (serial_protocol.py,
+  NUM_CHANNELS in emg_sensor.ino); ASCII lines and replays are channel 0
+- one Stream per player, i.e. per (source, channel): a StreamingFeatures window with
+  the features the model lists, and the decision state (threshold, cooldown)
+- every tick the blocks of all sources are drained, each window whose hop is due
+  adds a feature row, and all rows of the tick go through ONE model.predict() call;
+  the decisions are routed to each player's game (dino_game.py command server)
+
+A player costs one window of samples and a few running sums; the model and its
+runtime are shared, so memory stays flat as stations are added and inference is
+amortized over the batch.
+
+Usage: python classification_server.py --binary --player alice COM4 0 127.0.0.1:9999 --player bob COM4 1 127.0.0.1:9998
+       python classification_server.py --player alice replay:data 0 127.0.0.1:9999
+       python classification_server.py --simulate 8 [--replay data] [--speed 1.0] [--duration 30]
+A player is NAME SOURCE [CHANNEL [GAME]]: SOURCE is a serial port or replay:<folder>,
+GAME the host:port (or unix:<path>) of that player's dino_game.py. --simulate N replays the
+recordings to N players, each starting at a different recording.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from acquisition import Acquisition, SerialSource
+from command_server import connect
+from feature_registry import model_features
+from latency import LatencyRecorder, LatencyTrace
+from ring_buffer import hop_size
+from streaming_features import StreamingFeatures
+
+WINDOW_SIZE = 100           # Same defaults as OGrtc.py
+OVERLAP_PERCENTAGE = 0
+CONFIDENCE_THRESHOLD = 0.7
+PREDICTION_COOLDOWN = 0.5   # Seconds between reporting the same prediction
+TICK = 0.005                # Seconds between batched inference calls
+
+# Movements that control the game
+GAME_COMMANDS = {'clench': 'jump', 'wrist': 'duck'}
+
+
+def is_decision(confidence, label, current_time, last_label, last_time, threshold, cooldown):
+    """OGrtc.py's rule: confident, and not the label already reported less than `cooldown` seconds ago."""
+    return confidence > threshold and (current_time - last_time > cooldown or label != last_label)
+
+
+class GameClient:
+    """Newline-terminated commands to one dino_game.py; a closed game only disables this player."""
+
+    def __init__(self, address):
+        self.address = address
+        self.sock = connect(address)
+
+    def send(self, command, trace):
+        if self.sock is None:
+            return
+        try:
+            self.sock.sendall(f"{command} {trace.encode()}\n".encode())
+        except OSError as e:
+            print(f"Game {self.address} disconnected: {e}")
+            self.close()
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class Stream:
+    """One player: the sliding window of one channel of one source and its decisions."""
+
+    def __init__(self, name, channel, engine, game=None):
+        self.name = name
+        self.channel = channel
+        self.engine = engine
+        self.game = game
+        self.last_prediction = None
+        self.last_prediction_time = 0
+        self.samples = 0
+        self.windows = 0
+        self.decisions = 0
+
+
+class ClassificationServer:
+    """
+    Classifies the streams of all registered players with one model, one batched
+    predict() per tick(). Stream windows only keep WINDOW_SIZE samples each.
+    """
+
+    def __init__(self, model, window_size=WINDOW_SIZE, overlap=OVERLAP_PERCENTAGE,
+                 threshold=CONFIDENCE_THRESHOLD, cooldown=PREDICTION_COOLDOWN, verbose=True):
+        self.model = model
+        self.label_classes = model.label_classes
+        self.feature_names = model_features(model)
+        self.window_size = window_size
+        self.hop = hop_size(window_size, overlap)
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.verbose = verbose
+        self.sources = {}           # source key -> (Acquisition, {channel: Stream})
+        self.running = False
+        self.latency = LatencyRecorder()
+        self.ticks = 0
+        self.batches = 0
+        self.batch_rows = 0
+        self.inference_time = 0.0
+
+    @property
+    def streams(self):
+        return [stream for _, streams in self.sources.values() for stream in streams.values()]
+
+    def add_player(self, name, key, make_acquisition, channel=0, game=None):
+        """
+        Route channel `channel` of the source `key` to player `name`. Players on the
+        same key share one Acquisition, created by make_acquisition() for the first.
+        """
+        if key not in self.sources:
+            self.sources[key] = (make_acquisition(), {})
+        streams = self.sources[key][1]
+        if channel in streams:
+            raise ValueError(f"Channel {channel} of {key} is already routed to {streams[channel].name}")
+        engine = StreamingFeatures(self.window_size, hop=self.hop, features=self.feature_names)
+        streams[channel] = Stream(name, channel, engine, game)
+        return streams[channel]
+
+    def start(self):
+        self.running = True
+        for acquisition, _ in self.sources.values():
+            acquisition.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        for acquisition, streams in self.sources.values():
+            acquisition.stop()
+            for stream in streams.values():
+                if stream.game is not None:
+                    stream.game.close()
+
+    @property
+    def exhausted(self):
+        """True once every source is a finished replay with nothing left in its queue."""
+        return all(getattr(acquisition.source, "exhausted", False) and acquisition.blocks.empty()
+                   for acquisition, _ in self.sources.values())
+
+    def tick(self):
+        """Drain every source, classify all due windows in one batch and route the decisions."""
+        self.ticks += 1
+        rows = []
+        due = []                    # (stream, sample time, trace) per row
+        for acquisition, streams in self.sources.values():
+            for block in acquisition.drain():
+                self._push_block(block, streams, rows, due)
+        if not rows:
+            return 0
+
+        start = time.perf_counter()
+        probabilities = self.model.predict(np.concatenate(rows))
+        finished = time.perf_counter()
+        self.inference_time += finished - start
+        self.batches += 1
+        self.batch_rows += len(rows)
+        for (stream, sample_time, trace), prediction in zip(due, probabilities):
+            self._decide(stream, prediction, sample_time, trace.mark("inference", finished))
+        return len(rows)
+
+    def _push_block(self, block, streams, rows, due):
+        for channel, stream in streams.items():
+            if block.channels is None:
+                if channel != 0:
+                    continue
+                timestamps, values = block.timestamps, block.values
+            else:
+                mask = block.channels == channel
+                timestamps, values = block.timestamps[mask], block.values[mask]
+            stream.samples += len(values)
+            engine = stream.engine
+            for current_time, value in zip(timestamps.tolist(), values.tolist()):
+                engine.push(current_time, value)
+                if engine.hop_due():
+                    trace = LatencyTrace().mark("sample", block.arrival).mark("window")
+                    rows.append(engine.features())
+                    due.append((stream, current_time, trace.mark("features")))
+                    stream.windows += 1
+
+    def _decide(self, stream, prediction, current_time, trace):
+        max_prob = np.max(prediction)
+        predicted_label = self.label_classes[np.argmax(prediction)]
+        # Report prediction only if confidence is high and not repeating too fast
+        if is_decision(max_prob, predicted_label, current_time, stream.last_prediction,
+                       stream.last_prediction_time, self.threshold, self.cooldown):
+            if self.verbose:
+                print(f"{stream.name}: {predicted_label} (Confidence: {max_prob:.2f})")
+            stream.last_prediction = predicted_label
+            stream.last_prediction_time = current_time
+            stream.decisions += 1
+            command = GAME_COMMANDS.get(predicted_label)
+            if stream.game is not None and command:
+                trace.mark("sent")
+                stream.game.send(command, trace)
+        self.latency.add(trace)
+
+    def run(self, tick=TICK, duration=None):
+        """Call tick() every `tick` seconds until the replays end, `duration` passes, stop() or Ctrl+C."""
+        start = time.perf_counter()
+        next_tick = start
+        try:
+            while self.running and not self.exhausted:
+                self.tick()
+                now = time.perf_counter()
+                if duration is not None and now - start >= duration:
+                    break
+                next_tick += tick
+                if next_tick > now:
+                    time.sleep(next_tick - now)
+                else:
+                    next_tick = now  # fell behind, do not try to catch up
+        except KeyboardInterrupt:
+            print("Exiting classification server...")
+        self.tick()
+        return time.perf_counter() - start
+
+    def stats(self):
+        return {stream.name: {"samples": stream.samples, "windows": stream.windows, "decisions": stream.decisions}
+                for stream in self.streams}
+
+
+def parse_player(fields):
+    """NAME SOURCE [CHANNEL [GAME]] -> (name, source, channel, game address or None)."""
+    if not 2 <= len(fields) <= 4:
+        raise argparse.ArgumentTypeError(f"--player takes NAME SOURCE [CHANNEL [GAME]], got {fields}")
+    name, source = fields[:2]
+    channel = int(fields[2]) if len(fields) > 2 else 0
+    if not 0 <= channel <= 15:
+        raise argparse.ArgumentTypeError(f"Channel must be 0-15, got {channel}")
+    return name, source, channel, fields[3] if len(fields) > 3 else None
+
+
+if __name__ == "__main__":
+    from inference import load_classifier
+    from replay import ReplaySource, load_recordings
+    from serial_protocol import ASCII_BAUD, BINARY_BAUD
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--player', nargs='+', action='append', default=[], metavar='FIELD',
+                        help='NAME SOURCE [CHANNEL [GAME]], repeat for every player')
+    parser.add_argument('--simulate', type=int, default=0, help='Add N players replaying the recordings in --replay')
+    parser.add_argument('--replay', type=str, default="data", help='Recordings for --simulate')
+    parser.add_argument('--speed', type=float, default=1.0, help='Replay speed (1.0 = real time, 0 = as fast as possible)')
+    parser.add_argument('--binary', action='store_true', help='Serial ports send binary frames (needed for channels > 0)')
+    parser.add_argument('--model', type=str, default="emg_classifier.npz", help='Classifier shared by all players')
+    parser.add_argument('--window', type=int, default=WINDOW_SIZE, help='Window size in samples')
+    parser.add_argument('--overlap', type=float, default=OVERLAP_PERCENTAGE, help='Overlap between windows')
+    parser.add_argument('--tick', type=float, default=TICK, help='Seconds between batched inference calls')
+    parser.add_argument('--duration', type=float, help='Stop after this many seconds')
+    parser.add_argument('--quiet', action='store_true', help='Do not print every decision')
+    parser.add_argument('--latency-log', type=str, help='Write per-stage latency percentiles/histograms to this JSON file')
+    args = parser.parse_args()
+
+    model = load_classifier(args.model)
+    server = ClassificationServer(model, args.window, args.overlap, verbose=not args.quiet)
+    speed = args.speed or None
+    replays = {}
+
+    def replay_acquisition(folder, offset=0, count=None):
+        if folder not in replays:
+            replays[folder] = load_recordings(folder)
+        # Rotate the recordings so simulated players do not move in lockstep
+        offset %= len(replays[folder]) or 1
+        recordings = (replays[folder][offset:] + replays[folder][:offset])[:count]
+        return Acquisition(ReplaySource(recordings, speed=speed, block_size=16, loop=args.duration is not None),
+                           drop_when_full=False)
+
+    def serial_acquisition(port):
+        import serial
+        ser = serial.Serial(port, BINARY_BAUD if args.binary else ASCII_BAUD)
+        ser.flushInput()
+        return Acquisition(SerialSource(ser, binary=args.binary, channels=args.binary))
+
+    for fields in args.player:
+        name, source, channel, game = parse_player(fields)
+        if source.startswith("replay:"):
+            make = lambda folder=source[len("replay:"):]: replay_acquisition(folder)
+        else:
+            make = lambda port=source: serial_acquisition(port)
+        server.add_player(name, source, make, channel, GameClient(game) if game else None)
+    for i in range(args.simulate):
+        # A slice of recordings per simulated player keeps the replay copies small
+        server.add_player(f"sim{i + 1}", f"simulate:{i}", lambda i=i: replay_acquisition(args.replay, i * 7, 20))
+    if not server.sources:
+        parser.error("no players: use --player or --simulate")
+
+    print(f"Classifying {len(server.streams)} players from {len(server.sources)} sources, "
+          f"{len(server.feature_names)} features, one batched predict every {args.tick * 1000:g} ms. Press Ctrl+C to stop.")
+    server.start()
+    elapsed = server.run(args.tick, args.duration)
+    server.stop()
+
+    total_samples = sum(stream.samples for stream in server.streams)
+    for name, counts in server.stats().items():
+        print(f"{name:>12}: {counts['samples']} samples, {counts['windows']} windows, {counts['decisions']} decisions")
+    print(f"Processed {total_samples} samples in {elapsed:.2f} s ({total_samples / elapsed:.0f} samples/s)")
+    if server.batches:
+        print(f"{server.batches} predict calls for {server.batch_rows} windows "
+              f"({server.batch_rows / server.batches:.1f} rows per call, "
+              f"{server.inference_time / server.batch_rows * 1e6:.1f} us per window)")
+        print(server.latency.format_line("inference"))
+    if args.latency_log:
+        server.latency.export(args.latency_log)
+        print(f"Latency report saved to {args.latency_log}")
@@ -0,0 +1,303 @@
+"""
+command_server.py
+
+Asyncio command server for dino_game.py (the game side of the classifier -> game link).
+
+Protocol: newline-terminated text lines "<command> [fields]", e.g.
+"jump sample=12.000100 window=12.000300 ..." (latency stamps, see latency.py).
+- framing: lines are split on b"\\n" across reads, so coalesced TCP segments
+  ("jump\\nduck\\n" in one read) and commands split over several reads are both
+  handled; a final line without newline is taken when the client disconnects,
+  and a line longer than max_line closes that connection
+- any number of concurrent clients, one coroutine each; a client that disconnects
+  or crashes does not affect the others, and can reconnect at any time
+- TCP (host:port) or, on the same machine, a Unix domain socket (path=, clients
+  use the address "unix:<path>"; not on Windows)
+- backpressure: lines go through a bounded asyncio.Queue to a single dispatcher
+  that calls handler(command, fields) in arrival order. When the queue is full the
+  readers stop reading, so TCP flow control slows the senders down instead of the
+  server buffering without limit or dropping commands. handler() returns False
+  when the consumer cannot take the command yet (the game's
+  game_bridge.CommandQueue is full);
+  the dispatcher retries it after a short pause. A handler that raises only loses
+  that line (counted in `failed`), the dispatcher carries on with the next one.
+
+Usage: python command_server.py [--clients 4] [--commands 20000] [--queue 64] [--unix /tmp/game.sock]
+runs the load test: clients send numbered commands as fast as they can in randomly
+cut writes, reconnecting halfway, while the handler now and then refuses a
+command and a few malformed lines make it raise; the test checks that every
+command arrived exactly once, unmerged and in order per connection, and that each
+malformed line was counted and skipped.
+"""
+
+import asyncio
+import os
+import socket
+import threading
+
+HOST = '127.0.0.1'
+PORT = 9999
+MAX_LINE = 4096             # Bytes; a command with all latency stamps is ~150
+QUEUE_SIZE = 256            # Commands between the readers and the dispatcher
+RETRY_DELAY = 0.001         # Seconds before offering a refused command again
+
+
+class LineTooLong(Exception):
+    pass
+
+
+def connect(address):
+    """Client socket for a "host:port" or "unix:<path>" command server address."""
+    if address.startswith("unix:"):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address[len("unix:"):])
+        return sock
+    host, port = address.rsplit(':', 1)
+    sock = socket.create_connection((host, int(port)))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+class LineFramer:
+    """Splits a byte stream into lines, keeping the trailing partial line for the next feed()."""
+
+    def __init__(self, max_line=MAX_LINE):
+        self.max_line = max_line
+        self._pending = b""
+
+    def feed(self, data):
+        lines = (self._pending + data).split(b"\n")
+        self._pending = lines.pop()
+        if len(self._pending) > self.max_line:
+            raise LineTooLong(f"no newline in {len(self._pending)} bytes")
+        return lines
+
+    def flush(self):
+        """The partial line left when the stream ends (a client that did not end with a newline)."""
+        pending, self._pending = self._pending, b""
+        return [pending] if pending.strip() else []
+
+
+class CommandServer:
+    """
+    Accepts newline-framed commands from any number of TCP clients (or Unix socket
+    clients with `path`) and hands them to handler(command, fields) one at a time.
+    `commands` restricts the accepted command names (others are counted in
+    `invalid` and skipped).
+    """
+
+    def __init__(self, handler, host=HOST, port=PORT, commands=None, queue_size=QUEUE_SIZE,
+                 max_line=MAX_LINE, verbose=True, path=None):
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.path = path
+        self.commands = set(commands) if commands is not None else None
+        self.queue_size = queue_size
+        self.max_line = max_line
+        self.verbose = verbose
+        self.error = None
+        self._loop = None
+        self._stopping = None
+        self._thread = None
+        self._writers = set()
+
+        self.connections = 0        # accepted since start
+        self.received = 0           # valid command lines read
+        self.dispatched = 0         # commands taken by the handler
+        self.invalid = 0            # lines with an unknown command
+        self.retries = 0            # times the handler refused a command
+        self.failed = 0             # commands the handler raised on (dropped)
+        self.max_queued = 0
+
+    @property
+    def address(self):
+        """Address to give connect()."""
+        return f"unix:{self.path}" if self.path else f"{self.host}:{self.port}"
+
+    @property
+    def clients(self):
+        """Clients connected right now."""
+        return len(self._writers)
+
+    async def serve(self, ready=None):
+        """Run until stop(); `ready` (a threading.Event) is set once the port is bound."""
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._queue = asyncio.Queue(self.queue_size)
+        if self.path:
+            if os.path.exists(self.path):
+                os.unlink(self.path)  # left over by a game that did not exit cleanly
+            server = await asyncio.start_unix_server(self._client, self.path)
+        else:
+            server = await asyncio.start_server(self._client, self.host, self.port)
+            # Port 0 picks a free port
+            self.port = server.sockets[0].getsockname()[1]
+        if self.verbose:
+            print(f"Game server listening on {self.address}")
+        dispatcher = asyncio.create_task(self._dispatch())
+        if ready is not None:
+            ready.set()
+        async with server:
+            await self._stopping.wait()
+            for writer in list(self._writers):
+                writer.close()
+        dispatcher.cancel()
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def start_in_thread(self):
+        """Serve from a daemon thread with its own event loop (the game loop keeps the main thread)."""
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_thread, args=(ready,), name="command-server", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def _run_thread(self, ready):
+        try:
+            asyncio.run(self.serve(ready))
+        except Exception as e:
+            self.error = e
+            ready.set()
+
+    def stop(self, timeout=1.0):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._stopping.set)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    async def _client(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        self.connections += 1
+        self._writers.add(writer)
+        if self.verbose:
+            print("AI connected from", peer)
+        framer = LineFramer(self.max_line)
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break  # AI disconnected
+                for line in framer.feed(data):
+                    await self._submit(line)
+            for line in framer.flush():
+                await self._submit(line)
+        except (ConnectionError, LineTooLong) as e:
+            print(f"Dropping client {peer}: {e}")
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+            if self.verbose:
+                print("AI disconnected from", peer)
+
+    async def _submit(self, line):
+        command, _, fields = line.decode("utf-8", "replace").strip().partition(" ")
+        if not command:
+            return
+        if self.commands is not None and command not in self.commands:
+            self.invalid += 1
+            return
+        self.received += 1
+        # Waits while the queue is full: this reader stops reading until the dispatcher catches up
+        await self._queue.put((command, fields))
+        self.max_queued = max(self.max_queued, self._queue.qsize())
+
+    async def _dispatch(self):
+        while True:
+            command, fields = await self._queue.get()
+            try:
+                while self.handler(command, fields) is False:
+                    self.retries += 1
+                    await asyncio.sleep(RETRY_DELAY)
+            except Exception as e:
+                # Dying here would stop dispatching for every client and fill the queue
+                self.failed += 1
+                print(f"Dropping command {command!r} {fields!r}: {type(e).__name__}: {e}")
+                continue
+            self.dispatched += 1
+
+    def stats(self):
+        return {"connections": self.connections, "clients": self.clients, "received": self.received,
+                "dispatched": self.dispatched, "invalid": self.invalid, "retries": self.retries, "failed": self.failed,
+                "max_queued": self.max_queued}
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+    from collections import defaultdict
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=4, help='Concurrent clients')
+    parser.add_argument('--commands', type=int, default=20000, help='Commands per client')
+    parser.add_argument('--queue', type=int, default=64, help='Queue size between readers and dispatcher')
+    parser.add_argument('--refuse', type=float, default=0.01, help='Fraction of handler calls that refuse the command')
+    parser.add_argument('--unix', type=str, help='Test over a Unix domain socket at this path instead of TCP')
+    args = parser.parse_args()
+
+    received = defaultdict(list)        # (client, connection) -> sequence numbers
+    rng = random.Random(42)
+
+    def handler(command, fields):
+        if rng.random() < args.refuse:
+            return False  # consumer busy, the dispatcher offers it again
+        values = dict(field.split("=") for field in fields.split())
+        received[values["client"], values["connection"]].append(int(values["seq"]))
+        return True
+
+    server = CommandServer(handler, port=0, commands=["jump", "duck", "run"], queue_size=args.queue,
+                           verbose=False, path=args.unix).start_in_thread()
+
+    def client(index):
+        """Sends its commands over two connections, cut into random chunks to coalesce and split lines."""
+        local = random.Random(index)
+        half = args.commands // 2
+        for connection, seqs in enumerate([range(half), range(half, args.commands)]):
+            payload = b"".join(f"{local.choice(['jump', 'duck', 'run'])} client={index} connection={connection} "
+                               f"seq={seq}\n".encode() for seq in seqs)
+            # A malformed line makes the handler raise; the commands after it must still arrive
+            malformed = f"jump sample=abc client={index} connection={connection} seq=bad\n".encode()
+            cut = local.randrange(len(payload))
+            cut = payload.index(b"\n", cut) + 1 if b"\n" in payload[cut:] else len(payload)
+            payload = payload[:cut] + malformed + payload[cut:]
+            with connect(server.address) as sock:
+                pos = 0
+                while pos < len(payload):
+                    size = local.choice([1, 7, 40, 1000, 16384])
+                    sock.sendall(payload[pos:pos + size])
+                    pos += size
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = args.clients * args.commands
+    malformed = args.clients * 2
+    while server.dispatched + server.failed < total + malformed and time.perf_counter() - start < 60:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    server.stop()
+
+    errors = []
+    half = args.commands // 2
+    for index in range(args.clients):
+        for connection, expected in enumerate([range(half), range(half, args.commands)]):
+            got = received.get((str(index), str(connection)), [])
+            if got != list(expected):
+                errors.append(f"client {index} connection {connection}: {len(got)} of {len(expected)} commands, "
+                              f"{'in order' if got == sorted(got) else 'out of order'}")
+    print(f"{server.dispatched} of {total} commands in {elapsed:.2f} s ({server.dispatched / elapsed:.0f} commands/s)")
+    print("Server stats:", server.stats())
+    if server.failed != malformed:
+        errors.append(f"{server.failed} of {malformed} malformed lines counted as failed")
+    if errors or server.invalid:
+        print("FAILED:", *errors, f"{server.invalid} invalid (merged or corrupt) lines", sep="\n  ")
+        raise SystemExit(1)
+    print("Every command arrived exactly once, unmerged and in order per connection; "
+          f"the {malformed} malformed lines were skipped")
@@ -1,45 +1,155 @@
+"""
+dino_game.py
+
+Dino game controlled by the classifier. Commands are "jump", "duck" or "run",
+optionally followed by the latency stamps of the decision (see latency.py). They
+reach the game through a game_bridge.CommandQueue that the game loop drains once
+per frame, so the frame rate never depends on the sensor or the network:
+- tcp (default): newline-terminated lines on 127.0.0.1:9999, received by the
+  asyncio server in command_server.py (any number of classifier connections and
+  reconnections while the game runs)
+- unix: the same over a Unix domain socket (OGrtc.py --game unix:/tmp/dino_game.sock)
+- inprocess: the classifier runs in a worker thread of the game process, reading
+  the serial port (--serial) or replaying recordings (--replay)
+
+Game time: the rules run in game_sim.GameSim, in fixed 1/120 s steps. The loop
+runs as many steps as the real time since the last frame holds, and draws the
+sprites between the last two steps. So the game plays at the same speed at any
+frame rate. A command takes effect at the step of the game time it was queued at.
+
+Rendering (--render):
+- dirty (default): surfaces converted to the display format once, the score drawn
+  from a pre-rendered digit atlas only when it changes, all sprites in a
+  LayeredDirty group that redraws just what moved, and display.update() with that
+  rect list instead of the whole 1280x720 window
+- full: the original loop (fill and flip the whole window, re-render the score text
+  every frame, unconverted surfaces), kept for comparison (render_benchmark.py)
+
+Usage: python dino_game.py [--bridge tcp] [--port 9999] [--latency-log latency.json] [--latency-overlay]
+       python dino_game.py --bridge unix [--socket /tmp/dino_game.sock]
+       python dino_game.py --bridge inprocess [--serial COM4 [--binary] | --replay data [--speed 1.0]] [--model emg_classifier.npz]
+       python dino_game.py --render full
+The frame rate and command queue -> frame delays are printed on exit.
+"""
+
+import argparse
+import os
 import pygame
 import sys
-import random
-import threading
-import socket
+
+from asset_cache import DINO_DUCKING, DINO_RUNNING, GROUND_SIZE, shared
+from command_server import HOST, PORT, CommandServer
+from game_bridge import CommandQueue
+from game_sim import CLOUD_SIZE, DUCK_SIZE, RUN_SIZE, FixedTimestep, GameSim
+from latency import LatencyRecorder, now
+
+AI_COMMANDS = ("jump", "duck", "run")
+FPS = 120
+SOCKET_PATH = "/tmp/dino_game.sock"
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "emg_classifier.npz")
+RENDER_MODES = ("dirty", "full")
 
 class DinoGame:
-    def __init__(self):
+    def __init__(self, latency_log=None, latency_overlay=False, commands=None, render="dirty", fps=FPS):
+        if render not in RENDER_MODES:
+            raise ValueError(f"render must be one of {RENDER_MODES}")
         pygame.init()
         self.screen = pygame.display.set_mode((1280, 720))
         pygame.display.set_caption("Dino Game")
         self.clock = pygame.time.Clock()
-        self.game_font = pygame.font.Font(None, 24)
+        self.fps = fps
+        self.dirty_rendering = render == "dirty"
+        convert = self.dirty_rendering
+        # Every image, sound and font, loaded once before the game starts
+        self.assets = shared().preload(convert=convert)
+        self.game_font = self.assets.font(None, 24)
 
-        self.game_speed = 7
-        self.player_score = 0
-        self.game_over = False
+        # Game state, advanced in fixed steps; no obstacles in this game
+        self.sim = GameSim(obstacles=False)
+        self.timestep = FixedTimestep()
+        self.start_time = None  # perf_counter() at game time 0
+        self.last_frame = None
 
-        self.ground = pygame.image.load("assets/ground.png")
-        self.ground = pygame.transform.scale(self.ground, (1280, 20))
+        self.ground = self.assets.image("ground.png", GROUND_SIZE, convert)
         self.ground_x = 0
 
-        self.cloud = pygame.image.load("assets/cloud.png")
-        self.cloud = pygame.transform.scale(self.cloud, (200, 80))
+        self.cloud = self.assets.image("cloud.png", CLOUD_SIZE, convert)
         
         self.cloud_group = pygame.sprite.Group()
+        self.clouds = {}  # game_sim cloud -> its sprite
         self.dino_group = pygame.sprite.GroupSingle()
 
-        self.dinosaur = Dino(50, 360)
+        self.dinosaur = Dino(self.sim, self.assets, convert)
         self.dino_group.add(self.dinosaur)
 
-        self.death_sfx = pygame.mixer.Sound("assets/sfx/lose.mp3")
-        self.points_sfx = pygame.mixer.Sound("assets/sfx/100points.mp3")
-        self.jump_sfx = pygame.mixer.Sound("assets/sfx/jump.mp3")
+        if self.dirty_rendering:
+            # Everything drawn goes through one LayeredDirty group over a white background
+            self.background = pygame.Surface(self.screen.get_size()).convert()
+            self.background.fill("white")
+            self.screen.blit(self.background, (0, 0))
+            self.ground_strip = Ground(self.ground)
+            self.score = Score(GlyphAtlas(self.game_font, "black", "white"), (1150, 10))
+            self.layers = pygame.sprite.LayeredDirty()
+            self.layers.clear(self.screen, self.background)
+            self.layers.add(self.ground_strip, layer=0)
+            self.layers.add(self.dinosaur, layer=1)
+            self.layers.add(self.score, layer=2)
+            self.latency_text = None
+
+        self.death_sfx = self.assets.sound("sfx/lose.mp3")
+        self.points_sfx = self.assets.sound("sfx/100points.mp3")
+        self.jump_sfx = self.assets.sound("sfx/jump.mp3")
+
+        # AI commands, drained once per frame
+        self.commands = commands if commands is not None else CommandQueue()
+
+        # Traces of AI commands handled this frame are stamped once the frame is on screen
+        self.latency = LatencyRecorder()
+        self.latency_log = latency_log
+        self.latency_overlay = latency_overlay
+        self.pending_traces = []
+        self.latency_surface = None
 
-        self.CLOUD_EVENT = pygame.USEREVENT
-        pygame.time.set_timer(self.CLOUD_EVENT, 3000)
+    def quit(self):
+        print("Game loop:", self.commands.format_line())
+        if self.latency_log and len(self.latency):
+            self.latency.export(self.latency_log)
+            print(f"Latency report saved to {self.latency_log}")
+        pygame.quit()
+        sys.exit()
+
+    def handle_command(self, command):
+        print(f"Received AI command: {command.command}")
+        # At the game time it was queued, not at this frame (the frame rate does not shift it)
+        self.sim.command(command.command, command.queued - self.start_time - self.timestep.skipped)
+        if command.command == "jump":
+            self.jump_sfx.play()
+        self.pending_traces.append(command.trace)
+
+    def frame_rendered(self):
+        if not self.pending_traces:
+            return
+        for trace in self.pending_traces:
+            self.latency.add(trace.mark("rendered"))
+        self.pending_traces = []
+        if self.latency_overlay:
+            # Only re-render the overlay text when new measurements arrive
+            self.latency_surface = self.game_font.render(self.latency.format_line("rendered"), True, "gray40")
+            if self.dirty_rendering:
+                if self.latency_text is None:
+                    self.latency_text = pygame.sprite.DirtySprite()
+                    self.layers.add(self.latency_text, layer=2)
+                else:
+                    # The old text's area is cleared when the sprite is redrawn
+                    self.latency_text.dirty = 1
+                self.latency_text.image = self.latency_surface
+                self.latency_text.rect = self.latency_surface.get_rect(topleft=(10, 10))
+                self.latency_text.dirty = 1
 
     def end_game(self):
         self.screen.fill("white")
         game_over_text = self.game_font.render("Game Over!", True, "black")
-        score_text = self.game_font.render(f"Score: {int(self.player_score)}", True, "black")
+        score_text = self.game_font.render(f"Score: {int(self.sim.score)}", True, "black")
         restart_button = pygame.Rect(540, 380, 200, 50)
         pygame.draw.rect(self.screen, "gray", restart_button)
         restart_text = self.game_font.render("Restart", True, "black")
@@ -51,163 +161,225 @@ class DinoGame:
         while waiting:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
+                    self.quit()
                 # Allow restart via mouse click
                 if event.type == pygame.MOUSEBUTTONDOWN and restart_button.collidepoint(event.pos):
                     self.reset_game()
                     waiting = False
 
     def reset_game(self):
-        self.player_score = 0
-        self.game_speed = 7
-        self.cloud_group.empty()
-        self.dinosaur.rect.centery = 360
-        self.dinosaur.unduck()
-        self.game_over = False
+        self.sim.reset()
+        self.timestep.reset()
+        self.start_time = self.last_frame = None
+        self.sync_clouds()
+        # Commands sent while the game over screen was up are stale
+        self.commands.clear()
+        if self.dirty_rendering:
+            # The game over screen covered everything
+            self.screen.blit(self.background, (0, 0))
+            self.layers.repaint_rect(self.screen.get_rect())
+
+    def sync_clouds(self):
+        """One Cloud sprite per cloud of the game state."""
+        for cloud in self.sim.clouds:
+            if cloud not in self.clouds:
+                self.clouds[cloud] = Cloud(self.cloud, cloud)
+                self.cloud_group.add(self.clouds[cloud])
+                if self.dirty_rendering:
+                    self.layers.add(self.clouds[cloud], layer=0)
+        current = set(self.sim.clouds)
+        for cloud in [cloud for cloud in self.clouds if cloud not in current]:
+            self.clouds.pop(cloud).kill()
 
     def run(self):
         while True:
-            # Process events (all commands come via socket-posted custom events)
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if event.type == self.CLOUD_EVENT:
-                    current_cloud = Cloud(self.cloud, 1380, random.randint(50, 300))
-                    self.cloud_group.add(current_cloud)
-                # AI-triggered events:
-                if event.type == pygame.USEREVENT + 1:
-                    print("Received AI event: jump")
-                    self.dinosaur.jump()
-                    self.jump_sfx.play()
-                elif event.type == pygame.USEREVENT + 2:
-                    print("Received AI event: duck")
-                    self.dinosaur.duck()
-                elif event.type == pygame.USEREVENT + 3:
-                    print("Received AI event: run")
-                    self.dinosaur.unduck()
-            
-            self.screen.fill("white")
-            if self.game_over:
-                self.end_game()
-            else:
-                self.game_speed += 0.0015
-                if round(self.player_score, 1) % 100 == 0 and int(self.player_score) > 0:
-                    self.points_sfx.play()
-                self.player_score += 0.1
-                score_surface = self.game_font.render(str(int(self.player_score)), True, "black")
-                self.screen.blit(score_surface, (1150, 10))
-                self.cloud_group.update()
-                self.cloud_group.draw(self.screen)
-                self.dino_group.update()
-                self.dino_group.draw(self.screen)
-                self.ground_x -= self.game_speed
-                self.screen.blit(self.ground, (self.ground_x, 360))
-                self.screen.blit(self.ground, (self.ground_x + 1280, 360))
-                if self.ground_x <= -1280:
-                    self.ground_x = 0
-            
-            self.clock.tick(120)
-            pygame.display.update()
-
-class Cloud(pygame.sprite.Sprite):
-    def __init__(self, image, x_pos, y_pos):
+            self.frame()
+
+    def frame(self, elapsed=None):
+        """One rendered frame; `elapsed` overrides the real time since the last one (seconds)."""
+        # Wait for the frame first, then take the commands that arrived meanwhile,
+        # so they are drawn in this frame
+        self.clock.tick(self.fps)
+        frame_time = now()
+        if self.start_time is None:
+            self.start_time = self.last_frame = frame_time
+        for command in self.commands.drain(frame_time):
+            self.handle_command(command)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.quit()
+
+        if self.sim.game_over:
+            self.end_game()
+            return
+        # As many fixed steps as the time since the last frame holds (none at a high frame rate)
+        for _ in range(self.timestep.advance(frame_time - self.last_frame if elapsed is None else elapsed)):
+            self.sim.step()
+        self.last_frame = frame_time
+        for event in self.sim.take_events():
+            if event == "points":
+                self.points_sfx.play()
+            elif event == "game_over":
+                self.death_sfx.play()
+
+        # Draw between the last two steps
+        alpha = self.timestep.alpha
+        self.sync_clouds()
+        self.cloud_group.update(alpha)
+        self.dino_group.update(alpha)
+        distance = self.sim.prev_distance + (self.sim.distance - self.sim.prev_distance) * alpha
+        self.ground_x = -round(distance % 1280)
+        if self.dirty_rendering:
+            self.draw_dirty()
+        else:
+            self.draw_full()
+        self.frame_rendered()
+
+    def draw_full(self):
+        self.screen.fill("white")
+        score_surface = self.game_font.render(str(int(self.sim.score)), True, "black")
+        self.screen.blit(score_surface, (1150, 10))
+        self.cloud_group.draw(self.screen)
+        self.dino_group.draw(self.screen)
+        self.screen.blit(self.ground, (self.ground_x, 360))
+        self.screen.blit(self.ground, (self.ground_x + 1280, 360))
+        if self.latency_surface is not None:
+            self.screen.blit(self.latency_surface, (10, 10))
+        pygame.display.update()
+
+    def draw_dirty(self):
+        self.score.set_value(int(self.sim.score))
+        self.ground_strip.rect.x = self.ground_x
+        # Only the areas sprites left or moved into are redrawn and sent to the display
+        pygame.display.update(self.layers.draw(self.screen))
+
+class GlyphAtlas:
+    """Characters rendered once by the font, blitted side by side to draw text."""
+
+    def __init__(self, font, color, background, characters="0123456789"):
+        self.glyphs = {c: font.render(c, True, color, background).convert() for c in characters}
+        self.height = max(glyph.get_height() for glyph in self.glyphs.values())
+        self.background = background
+
+    def draw(self, surface, text, topleft=(0, 0)):
+        x, y = topleft
+        for c in text:
+            glyph = self.glyphs[c]
+            surface.blit(glyph, (x, y))
+            x += glyph.get_width()
+
+class Score(pygame.sprite.DirtySprite):
+    """Score text drawn from a GlyphAtlas into one reused surface, only when the value changes."""
+
+    def __init__(self, atlas, topleft, digits=7):
+        super().__init__()
+        self.atlas = atlas
+        width = digits * max(glyph.get_width() for glyph in atlas.glyphs.values())
+        self.image = pygame.Surface((width, atlas.height)).convert()
+        self.rect = self.image.get_rect(topleft=topleft)
+        self.value = None
+        self.set_value(0)
+
+    def set_value(self, value):
+        if value == self.value:
+            return
+        self.value = value
+        self.image.fill(self.atlas.background)
+        self.atlas.draw(self.image, str(value))
+        self.dirty = 1
+
+class Ground(pygame.sprite.DirtySprite):
+    """The ground image twice side by side; scrolling moves the strip's rect."""
+
+    def __init__(self, ground, y=360):
+        super().__init__()
+        width, height = ground.get_size()
+        self.image = pygame.Surface((2 * width, height), pygame.SRCALPHA).convert_alpha()
+        self.image.blit(ground, (0, 0))
+        self.image.blit(ground, (width, 0))
+        self.rect = self.image.get_rect(topleft=(0, y))
+        self.dirty = 2  # moves every frame
+
+class Cloud(pygame.sprite.DirtySprite):
+    """Draws a game_sim cloud; DinoGame.sync_clouds() kills it once the cloud is off screen."""
+
+    def __init__(self, image, body):
         super().__init__()
         self.image = image
-        self.rect = self.image.get_rect(center=(x_pos, y_pos))
+        self.body = body
+        self.rect = self.image.get_rect(center=(round(body.x), round(body.y)))
+        self.dirty = 2  # moves every frame
     
-    def update(self):
-        self.rect.x -= 1
+    def update(self, alpha=1.0):
+        x, y = self.body.position(alpha)
+        self.rect.center = (round(x), round(y))
 
-class Dino(pygame.sprite.Sprite):
-    def __init__(self, x_pos, y_pos):
+class Dino(pygame.sprite.DirtySprite):
+    """Draws the dino of a game_sim.GameSim."""
+
+    def __init__(self, sim, assets, convert=False):
         super().__init__()
-        self.running_sprites = [
-            pygame.transform.scale(pygame.image.load("assets/Dino1.png"), (80, 100)),
-            pygame.transform.scale(pygame.image.load("assets/Dino2.png"), (80, 100))
-        ]
-        self.ducking_sprites = [
-            pygame.transform.scale(pygame.image.load("assets/DinoDucking1.png"), (110, 60)),
-            pygame.transform.scale(pygame.image.load("assets/DinoDucking2.png"), (110, 60))
-        ]
+        self.sim = sim
+        self.running_sprites = assets.images(DINO_RUNNING, RUN_SIZE, convert)
+        self.ducking_sprites = assets.images(DINO_DUCKING, DUCK_SIZE, convert)
         self.image = self.running_sprites[0]
-        self.rect = self.image.get_rect(center=(x_pos, y_pos))
-        self.velocity = 50
-        self.gravity = 4.5
-        self.ducking = False
-        self.current_image = 0
-        self.duck_timer = 0  # Timer to keep track of duck duration
-
-    def jump(self):
-        if self.rect.centery >= 360:
-            self.rect.centery -= self.velocity
-
-    def duck(self):
-        self.ducking = True
-        self.rect.centery = 380
-        self.duck_timer = 0.5  # Duck for 0.5 seconds
-
-    def unduck(self):
-        self.ducking = False
-        self.rect.centery = 360
-        self.duck_timer = 0
-
-    def apply_gravity(self):
-        if self.rect.centery < 360:
-            self.rect.centery += self.gravity
-
-    def update(self):
-        self.animate()
-        self.apply_gravity()
-        # If currently ducking, reduce the duck timer and unduck if timer expires
-        if self.ducking:
-            self.duck_timer -= 1 / 120  # Assuming 120 FPS
-            if self.duck_timer <= 0:
-                self.unduck()
-
-    def animate(self):
-        self.current_image += 0.05
-        if self.current_image >= 2:
-            self.current_image = 0
-        self.image = self.ducking_sprites[int(self.current_image)] if self.ducking else self.running_sprites[int(self.current_image)]
-
-def socket_server():
-    """
-    Sets up a TCP socket server that listens for commands from the AI.
-    When a command is received, posts a corresponding custom Pygame event.
-    """
-    HOST = '127.0.0.1'
-    PORT = 9999
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_socket.bind((HOST, PORT))
-    server_socket.listen(1)
-    print(f"Game server listening on {HOST}:{PORT}")
-    conn, addr = server_socket.accept()
-    print("AI connected from", addr)
-    while True:
-        try:
-            data = conn.recv(1024)
-            if not data:
-                continue
-            command = data.decode().strip()
-            print(f"Received command from AI: {command}")
-            if command == "jump":
-                pygame.event.post(pygame.event.Event(pygame.USEREVENT + 1))
-            elif command == "duck":
-                pygame.event.post(pygame.event.Event(pygame.USEREVENT + 2))
-            elif command == "run":
-                pygame.event.post(pygame.event.Event(pygame.USEREVENT + 3))
-        except Exception as e:
-            print("Socket error:", e)
-            break
-    conn.close()
-    server_socket.close()
+        self.rect = self.image.get_rect(center=(round(sim.dino.x), round(sim.dino.y)))
+        self.drawn = None  # (image, position) last drawn, for dirty rendering
+
+    def update(self, alpha=1.0):
+        dino = self.sim.dino
+        sprites = self.ducking_sprites if self.sim.ducking else self.running_sprites
+        self.image = sprites[int(dino.frame)]
+        x, y = dino.position(alpha)
+        self.rect = self.image.get_rect(center=(round(x), round(y)))
+        # Redraw (dirty rendering) only when the image or the position changed
+        state = (self.image, self.rect.topleft)
+        if state != self.drawn:
+            self.drawn = state
+            self.dirty = 1
 
 if __name__ == "__main__":
-    # Start the socket server in a background thread to receive AI commands
-    socket_thread = threading.Thread(target=socket_server, daemon=True)
-    socket_thread.start()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency-log', type=str, help='Write sample->frame latency percentiles/histograms to this JSON file on exit')
+    parser.add_argument('--latency-overlay', action='store_true', help='Draw p50/p95/p99 input latency on screen')
+    parser.add_argument('--bridge', choices=["tcp", "unix", "inprocess"], default="tcp", help='How classifier commands reach the game')
+    parser.add_argument('--host', type=str, default=HOST, help='Address to accept classifier connections on (tcp)')
+    parser.add_argument('--port', type=int, default=PORT, help='Command port (tcp; one per player with classification_server.py)')
+    parser.add_argument('--socket', type=str, default=SOCKET_PATH, help='Unix socket path (unix)')
+    parser.add_argument('--serial', type=str, default='COM4', help='Serial port of the sensor (inprocess)')
+    parser.add_argument('--binary', action='store_true', help='The sensor sends binary frames (inprocess)')
+    parser.add_argument('--replay', type=str, help='Replay the recordings in this folder instead of the sensor (inprocess)')
+    parser.add_argument('--speed', type=float, default=1.0, help='Replay speed (inprocess)')
+    parser.add_argument('--model', type=str, default=MODEL_PATH, help='Classifier .npz (inprocess; default: next to this file)')
+    parser.add_argument('--render', choices=RENDER_MODES, default="dirty", help='Redraw only what changed, or the whole window')
+    args = parser.parse_args()
+
+    commands = CommandQueue()
+    if args.bridge == "inprocess":
+        from acquisition import Acquisition, SerialSource
+        from classification_server import ClassificationServer
+        from game_bridge import start_classifier_worker
+        from inference import load_classifier
+
+        if args.replay:
+            from replay import ReplaySource, load_recordings
+            make = lambda: Acquisition(ReplaySource(load_recordings(args.replay), speed=args.speed or None, loop=True),
+                                       drop_when_full=False)
+        else:
+            import serial
+            from serial_protocol import ASCII_BAUD, BINARY_BAUD
+            make = lambda: Acquisition(SerialSource(serial.Serial(args.serial, BINARY_BAUD if args.binary else ASCII_BAUD),
+                                                    binary=args.binary))
+        # Same settings as OGrtc.py; the decisions go straight to the command queue
+        classifier = ClassificationServer(load_classifier(args.model), verbose=False)
+        classifier.add_player("player", args.replay or args.serial, make, game=commands)
+        start_classifier_worker(classifier)
+    else:
+        # Receive AI commands in a background thread running the asyncio command server
+        CommandServer(commands.handle, args.host, args.port, commands=AI_COMMANDS,
+                      path=args.socket if args.bridge == "unix" else None).start_in_thread()
 
-    game = DinoGame()
+    game = DinoGame(latency_log=args.latency_log, latency_overlay=args.latency_overlay, commands=commands,
+                    render=args.render)
+    print("Assets:", game.assets.format_line())
     game.run()
@@ -4,26 +4,29 @@ model_training.py
 This script loads features.csv (with enhanced features),
 encodes the movement labels,
 trains a neural network classifier using TensorFlow/Keras,
-and saves the model.
+and saves the model (Keras .h5 plus a NumPy-only .npz for the real-time scripts).
 """
 
+import os
+import sys
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 import tensorflow as tf
 
+# The runtime export and feature code live one folder up, next to model_training.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from feature_registry import EXTENDED_FEATURES
+from inference import NumpyDenseClassifier
+
 keras = tf.keras
 
 # Load features dataset (ensure features.csv has the new feature columns)
 data = pd.read_csv("features.csv")
 
 # Use the enhanced feature set including basic, fTDD, TSD, and wavelet features
-feature_columns = [
-    "auc", "mean", "std", "rms", "max", "min", "mean_deriv", "std_deriv",
-    "ps_moment1", "ps_moment2", "sparsity", "irregularity_factor", "waveform_length_ratio",
-    "cov", "tkeo", "wavelet_energy", "wavelet_variance", "wavelet_std", "wavelet_wl", "wavelet_entropy"
-]
+feature_columns = EXTENDED_FEATURES
 X = data[feature_columns].values
 labels = data["label"].values
 print("Labels:", labels)
@@ -51,3 +54,11 @@ model.fit(X_train, y_train, epochs=150, batch_size=4, validation_data=(X_test, y
 model.save("emg_classifier.h5")
 print("Trained classes:", le.classes_)
 print("Model saved as emg_classifier.h5")
+
+# Save a TensorFlow-free copy for the real-time scripts: weights, label classes,
+# feature order and feature scaling (features are not scaled during training, so identity)
+runtime_model = NumpyDenseClassifier.from_keras(model)
+runtime_model.set_metadata(le.classes_, feature_columns,
+                           np.zeros(len(feature_columns)), np.ones(len(feature_columns)))
+runtime_model.save("emg_classifier.npz")
+print("Runtime model saved as emg_classifier.npz")
@@ -13,17 +13,24 @@ import csv
 import time
 import argparse
 import os
+import sys
+
+# The serial frame decoder lives one folder up, next to OGrtc.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from serial_protocol import ASCII_BAUD, BINARY_BAUD, FrameDecoder, read_frames
 
 # Set up command-line arguments
 parser = argparse.ArgumentParser()
 parser.add_argument('--port', type=str, default='COM4', help='Serial port (e.g., COM4 or /dev/ttyACM0)')
-parser.add_argument('--baud', type=int, default=9600, help='Baud rate')
+parser.add_argument('--baud', type=int, default=None, help=f'Baud rate (default {ASCII_BAUD}, or {BINARY_BAUD} with --binary)')
+parser.add_argument('--binary', action='store_true', help='Read binary frames (emg_sensor.ino with BINARY_MODE 1)')
 parser.add_argument('--label', type=str, required=True, help='Label for the movement (e.g., index_finger_up)')
 parser.add_argument('--duration', type=int, default=30, help='Recording duration in seconds')
 args = parser.parse_args()
 
 # Initialize serial communication for collecting data from muscle sensor 
-ser = serial.Serial(args.port, args.baud)
+baud = args.baud or (BINARY_BAUD if args.binary else ASCII_BAUD)
+ser = serial.Serial(args.port, baud)
 ser.flushInput()
 time.sleep(2)  # Wait for the connection to establish
 print("Connection is established")
@@ -35,7 +42,19 @@ while True:
     # Collect data in a list (instead of writing immediately to file)
     data_rows = []
     start_time = time.time()
+    decoder = FrameDecoder()
+    clock_offset = None
     while time.time() - start_time < args.duration:
+        if args.binary:
+            # Whole chunks of frames; timestamps come from the Arduino's micros(),
+            # shifted so the first frame lines up with the host clock
+            frames = read_frames(ser, decoder)
+            if len(frames.values) == 0:
+                continue
+            if clock_offset is None:
+                clock_offset = time.time() - frames.device_time[0]
+            data_rows.extend(zip((frames.device_time + clock_offset).tolist(), frames.values.tolist()))
+            continue
         line = ser.readline().decode('latin-1').strip()
         print(line)
         try:
@@ -45,6 +64,9 @@ while True:
         except ValueError:
             continue  # Skip lines that cannot be converted to int
 
+    if args.binary:
+        print(f"Received {decoder.frames} frames, {decoder.dropped} dropped, {decoder.bad_bytes} bad bytes")
+
     # Check if any reading exceeds the threshold (500)
     if any(row[1] > 60 for row in data_rows):
         print("Data contains values above 60; CSV file will not be saved.")
@@ -0,0 +1,198 @@
+"""
+feature_cache.py
+
+Per-recording feature extraction for data_preprocessing.py (basic features) and
+extra_files/NEWdatapp.py (extended features), run in a multiprocessing pool and
+cached on disk.
+
+The cache is keyed by a hash of each CSV file's contents, so re-running the
+preprocessing only parses and processes recordings that are new or changed;
+renamed or moved files are still cache hits. It lives in the data folder as
+feature_cache_<basic|extended>.npz and is rebuilt automatically when the feature
+set or CACHE_VERSION changes.
+
+Files are processed in sorted filename order, so features.csv has the same rows
+in the same order regardless of the number of workers or what was cached.
+"""
+
+import glob
+import hashlib
+import io
+import os
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from feature_registry import BASIC_FEATURES, EXTENDED_FEATURES
+from streaming_features import window_features
+
+# Bump when the feature computation changes so stale cached rows are not reused
+CACHE_VERSION = 2
+
+# ADC readings are integers, so these are written as integers like before
+INTEGER_FEATURES = ["max", "min"]
+
+
+def recording_label(file):
+    """Label from a data_<label>_<timestamp>.csv filename, or None if it does not match."""
+    parts = os.path.basename(file).split('_')
+    return parts[1] if len(parts) >= 3 else None
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def recording_features(data, extended=False):
+    """
+    Feature vector of one whole recording (CSV file contents as bytes),
+    or None if it has no 'value' column or no samples.
+    """
+    df = pd.read_csv(io.BytesIO(data))
+    if 'value' not in df.columns or len(df) == 0:
+        return None
+    values = df['value'].values
+    # Without timestamps, assume one time unit per sample (trapezoid dx=1, dt=1)
+    timestamps = df['timestamp'].values if 'timestamp' in df.columns else np.arange(len(values))
+    return window_features(values, timestamps, extended)
+
+
+def _extract(job):
+    file, extended = job
+    with open(file, 'rb') as f:
+        return recording_features(f.read(), extended)
+
+
+class FeatureCache:
+    """Content hash -> feature vector, stored as one .npz of hashes and a feature matrix."""
+
+    def __init__(self, path, feature_names):
+        self.path = path
+        self.feature_names = list(feature_names)
+        self.entries = {}
+        self.dirty = False
+        if path and os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        try:
+            with np.load(self.path, allow_pickle=False) as cache:
+                if int(cache["version"]) != CACHE_VERSION or list(cache["feature_names"]) != self.feature_names:
+                    return
+                # Empty rows mark recordings without usable data
+                for key, row, valid in zip(cache["hashes"], cache["features"], cache["valid"]):
+                    self.entries[str(key)] = row if valid else None
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Ignoring unreadable feature cache {self.path}: {e}")
+            self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key, False)
+
+    def put(self, key, features):
+        self.entries[key] = features
+        self.dirty = True
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        width = len(self.feature_names)
+        keys = sorted(self.entries)
+        features = np.zeros((len(keys), width))
+        valid = np.zeros(len(keys), dtype=bool)
+        for i, key in enumerate(keys):
+            if self.entries[key] is not None:
+                features[i] = self.entries[key]
+                valid[i] = True
+        # Write to a temporary file first so an interrupted run never leaves a corrupt cache
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, version=CACHE_VERSION, feature_names=np.array(self.feature_names),
+                 hashes=np.array(keys, dtype=str), features=features, valid=valid)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def default_cache_path(data_folder, extended=False):
+    return os.path.join(data_folder, f"feature_cache_{'extended' if extended else 'basic'}.npz")
+
+
+def extract_features(data_folder="data", extended=False, workers=None, cache_path=None, use_cache=True):
+    """
+    Features of every data_<label>_<timestamp>.csv in `data_folder` as a DataFrame
+    (label column followed by the 8 basic or 20 extended features).
+
+    workers: number of processes for the recordings missing from the cache
+             (None = os.cpu_count(), 1 = run in this process).
+    """
+    feature_names = EXTENDED_FEATURES if extended else BASIC_FEATURES
+    if cache_path is None:
+        cache_path = default_cache_path(data_folder, extended)
+    cache = FeatureCache(cache_path if use_cache else None, feature_names)
+
+    files = [file for file in sorted(glob.glob(os.path.join(data_folder, "*.csv"))) if recording_label(file)]
+    hashes = []
+    missing = []
+    for file in files:
+        with open(file, 'rb') as f:
+            key = content_hash(f.read())
+        hashes.append(key)
+        if cache.get(key) is False:
+            missing.append(file)
+
+    if missing:
+        jobs = [(file, extended) for file in missing]
+        workers = workers or os.cpu_count() or 1
+        workers = min(workers, len(missing))
+        if workers > 1:
+            with Pool(workers) as pool:
+                # map() keeps the results in job order
+                results = pool.map(_extract, jobs, chunksize=max(1, len(jobs) // (workers * 4)))
+        else:
+            results = [_extract(job) for job in jobs]
+        computed = dict(zip(missing, results))
+        for file, key in zip(files, hashes):
+            if file in computed:
+                cache.put(key, computed[file])
+        cache.save()
+
+    labels = []
+    rows = []
+    for file, key in zip(files, hashes):
+        features = cache.get(key)
+        if features is None:
+            continue
+        labels.append(recording_label(file))
+        rows.append(features)
+
+    print(f"{len(files)} recordings: {len(files) - len(missing)} cached, {len(missing)} processed")
+    return _features_frame(labels, rows, feature_names)
+
+
+def extract_store_features(store_path, extended=False):
+    """
+    Same as extract_features() for the sessions of a recording_store.py store.
+    The samples are read straight from the memory-mapped store, so nothing is parsed
+    or cached.
+    """
+    from recording_store import RecordingStore
+
+    feature_names = EXTENDED_FEATURES if extended else BASIC_FEATURES
+    labels = []
+    rows = []
+    for label, timestamps, values in RecordingStore(store_path).iter_sessions():
+        # int16 in the store; widen so squares and products cannot overflow
+        rows.append(window_features(values.astype(np.int64), timestamps, extended))
+        labels.append(label)
+    print(f"{len(rows)} sessions from {store_path}")
+    return _features_frame(labels, rows, feature_names)
+
+
+def _features_frame(labels, rows, feature_names):
+    features_df = pd.DataFrame(np.array(rows).reshape(-1, len(feature_names)), columns=feature_names)
+    for name in INTEGER_FEATURES:
+        column = features_df[name]
+        if len(column) and np.all(np.mod(column, 1) == 0):
+            features_df[name] = column.astype(np.int64)
+    features_df.insert(0, "label", labels)
+    return features_df
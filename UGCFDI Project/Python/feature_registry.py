@@ -0,0 +1,296 @@
+"""
+feature_registry.py
+
+Single definition of every EMG window feature used for training and at run time.
+
+Each feature is registered once, with two implementations of the same formula:
+- batch:  NumPy along the last axis of one window or a stack of windows (a
+          BatchWindows); used by the preprocessing and training scripts and by
+          streaming_features.window_features()/batch_window_features()
+- stream: from the running sums kept by streaming_features.StreamingFeatures (a
+          StreamWindow), O(1) per feature except the spectral/wavelet ones
+
+Statistics shared by several features (mean, std, derivative, dt, spectral
+moments, wavelet band, ...) are computed once per window, on first use, so a
+feature list only pays for what it contains.
+
+Models store the ordered list of features they were trained on (feature_columns
+in the .npz, see inference.py); model_features() reads it back so the real-time
+scripts compute exactly those features, in that order, and fail at start-up
+instead of feeding a model the wrong number of inputs.
+
+Usage: python feature_registry.py [--model emg_classifier.npz]
+(lists the registered features, marking the ones the model uses)
+"""
+
+from collections import namedtuple
+from functools import cached_property
+
+import numpy as np
+
+from spectral import batch_spectral_moments, spectral_moments
+from streaming_wavelet import batch_wavelet_features, wavelet_features
+
+# group: "time" (running sums), "spectral" (needs the spectrum) or "wavelet" (needs the 'db4' band)
+Feature = namedtuple("Feature", ["name", "group", "batch", "stream"])
+
+FEATURES = {}
+
+
+def register(name, group, batch, stream):
+    FEATURES[name] = Feature(name, group, batch, stream)
+
+
+def select_features(extended=False, features=None):
+    """
+    Ordered feature names: `features` if given (validated against the registry),
+    otherwise the basic 8 or extended 20 feature set.
+    """
+    if features is None:
+        return list(EXTENDED_FEATURES if extended else BASIC_FEATURES)
+    names = [str(name) for name in features]
+    unknown = [name for name in names if name not in FEATURES]
+    if unknown:
+        raise ValueError(f"Unknown features {unknown}, registered: {list(FEATURES)}")
+    return names
+
+
+def model_features(model, extended=False):
+    """
+    Feature names a loaded classifier (inference.load_classifier) expects, in order.
+    Models saved without feature_columns fall back to the basic/extended set.
+    Raises ValueError if the list does not match the model's input size.
+    """
+    names = select_features(extended, model.feature_columns)
+    input_size = getattr(model, "input_size", None)
+    if input_size is not None and input_size != len(names):
+        raise ValueError(f"Model expects {input_size} features but lists {len(names)}: {names}")
+    return names
+
+
+def uses_group(names, group):
+    return any(FEATURES[name].group == group for name in names)
+
+
+class BatchWindows:
+    """
+    One window (1-D values and timestamps) or a stack of windows ((n_windows,
+    window_len) arrays), with the statistics shared by several features. Features
+    reduce along the last axis, so a single window costs no more than plain 1-D
+    NumPy code, and every row of a stack reduces exactly like that window alone.
+    """
+
+    def __init__(self, values, timestamps):
+        self.values = values
+        self.timestamps = timestamps
+        self.n = values.shape[-1]
+
+    def zeros(self):
+        return np.zeros(self.values.shape[:-1])
+
+    @cached_property
+    def dt(self):
+        if self.n > 1:
+            return np.mean(np.diff(self.timestamps), axis=-1)
+        return np.ones(self.values.shape[:-1])
+
+    @cached_property
+    def mean(self):
+        return np.mean(self.values, axis=-1)
+
+    @cached_property
+    def std(self):
+        return np.std(self.values, axis=-1)
+
+    @cached_property
+    def max(self):
+        return np.max(self.values, axis=-1)
+
+    @cached_property
+    def min(self):
+        return np.min(self.values, axis=-1)
+
+    @cached_property
+    def derivative(self):
+        return np.diff(self.values)
+
+    @cached_property
+    def std_deriv(self):
+        return np.std(self.derivative, axis=-1) if self.n > 1 else self.zeros()
+
+    @cached_property
+    def waveform_length(self):
+        return np.sum(np.abs(self.derivative), axis=-1) if self.n > 1 else self.zeros()
+
+    @cached_property
+    def spectral(self):
+        if self.values.ndim == 1:
+            return spectral_moments(self.values, self.dt)
+        return batch_spectral_moments(self.values, self.dt)
+
+    @cached_property
+    def wavelet(self):
+        if self.values.ndim == 1:
+            return wavelet_features(self.values)
+        return batch_wavelet_features(self.values)
+
+
+class StreamWindow:
+    """
+    Running sums of a StreamingFeatures window: sum, sum_sq and sum_abs of the
+    values, area (trapezoids), diff_sq and diff_abs of the first differences, lag2
+    (sum of v[i] * v[i + 2]), plus first/last/max/min values and the time span.
+    `spectral(dt)` and `wavelet()` compute the whole-window parts on demand.
+    """
+
+    def __init__(self, n, sums, first, last, max_val, min_val, span, spectral, wavelet):
+        self.n = n
+        self.sum, self.sum_sq, self.sum_abs, self.area, self.diff_sq, self.diff_abs, self.lag2 = sums
+        self.first = first
+        self.last = last
+        self.max = max_val
+        self.min = min_val
+        self.span = span
+        self._spectral = spectral
+        self._wavelet = wavelet
+
+    @cached_property
+    def dt(self):
+        return self.span / (self.n - 1) if self.n > 1 else 1
+
+    @cached_property
+    def mean(self):
+        return self.sum / self.n
+
+    @cached_property
+    def std(self):
+        # Variance as (n * sum_sq - sum^2) / n^2: the numerator is exact for ADC readings
+        n = self.n
+        return np.sqrt(max(n * self.sum_sq - self.sum * self.sum, 0.0)) / n
+
+    @cached_property
+    def std_deriv(self):
+        if self.n < 2:
+            return 0
+        m = self.n - 1
+        diff_sum = self.last - self.first
+        return np.sqrt(max(m * self.diff_sq - diff_sum * diff_sum, 0.0)) / m
+
+    @cached_property
+    def spectral(self):
+        return self._spectral(self.dt)
+
+    @cached_property
+    def wavelet(self):
+        return self._wavelet()
+
+
+def _batch_sparsity(w):
+    if w.n < 2:
+        return w.zeros()
+    norm1 = np.sum(np.abs(w.values), axis=-1)
+    norm2 = np.sqrt(np.sum(np.square(w.values.astype(float)), axis=-1))
+    return np.where(norm2 > 0, (np.sqrt(w.n) - (norm1 / norm2)) / (np.sqrt(w.n) - 1), 0)
+
+
+def _stream_sparsity(s):
+    norm2 = np.sqrt(s.sum_sq)
+    if norm2 > 0 and s.n > 1:
+        return (np.sqrt(s.n) - (s.sum_abs / norm2)) / (np.sqrt(s.n) - 1)
+    return 0
+
+
+def _batch_irregularity(w):
+    if w.n < 2:
+        return w.zeros()
+    mean_abs_deriv = np.mean(np.abs(w.derivative), axis=-1)
+    return np.where(mean_abs_deriv != 0, w.std_deriv / mean_abs_deriv, 0)
+
+
+def _stream_irregularity(s):
+    if s.n > 1 and s.diff_abs != 0:
+        return s.std_deriv / (s.diff_abs / (s.n - 1))
+    return 0
+
+
+def _batch_tkeo(w):
+    if w.n < 3:
+        return w.zeros()
+    v = w.values
+    return np.mean(v[..., 1:-1]**2 - v[..., :-2] * v[..., 2:], axis=-1)
+
+
+def _stream_tkeo(s):
+    if s.n < 3:
+        return 0
+    return (s.sum_sq - s.first * s.first - s.last * s.last - s.lag2) / (s.n - 2)
+
+
+# Basic features (data_preprocessing.py)
+register("auc", "time",
+         lambda w: np.trapezoid(w.values, w.timestamps) if w.n > 1 else w.zeros(),
+         lambda s: s.area if s.n > 1 else 0)
+register("mean", "time", lambda w: w.mean, lambda s: s.mean)
+register("std", "time", lambda w: w.std, lambda s: s.std)
+register("rms", "time",
+         lambda w: np.sqrt(np.mean(np.square(w.values), axis=-1)),
+         lambda s: np.sqrt(s.sum_sq / s.n))
+register("max", "time", lambda w: w.max, lambda s: s.max)
+register("min", "time", lambda w: w.min, lambda s: s.min)
+register("mean_deriv", "time",
+         lambda w: np.mean(w.derivative, axis=-1) if w.n > 1 else w.zeros(),
+         lambda s: (s.last - s.first) / (s.n - 1) if s.n > 1 else 0)
+register("std_deriv", "time", lambda w: w.std_deriv, lambda s: s.std_deriv)
+
+# fTDD (NEWdatapp.py)
+register("ps_moment1", "spectral", lambda w: w.spectral[0], lambda s: s.spectral[0])
+register("ps_moment2", "spectral", lambda w: w.spectral[1], lambda s: s.spectral[1])
+register("sparsity", "time", _batch_sparsity, _stream_sparsity)
+register("irregularity_factor", "time", _batch_irregularity, _stream_irregularity)
+register("waveform_length_ratio", "time",
+         lambda w: w.waveform_length / np.where(w.max - w.min != 0, w.max - w.min, 1),
+         lambda s: s.diff_abs / (s.max - s.min if (s.max - s.min) != 0 else 1))
+
+# TSD
+register("cov", "time",
+         lambda w: np.where(w.mean != 0, w.std / w.mean, 0),
+         lambda s: s.std / s.mean if s.mean != 0 else 0)
+register("tkeo", "time", _batch_tkeo, _stream_tkeo)
+
+# Level-3 'db4' wavelet detail coefficients
+for _i, _name in enumerate(["wavelet_energy", "wavelet_variance", "wavelet_std", "wavelet_wl", "wavelet_entropy"]):
+    register(_name, "wavelet", (lambda i: lambda w: w.wavelet[i])(_i), (lambda i: lambda s: s.wavelet[i])(_i))
+
+BASIC_FEATURES = ["auc", "mean", "std", "rms", "max", "min", "mean_deriv", "std_deriv"]
+EXTENDED_FEATURES = list(FEATURES)
+
+
+def batch_features(values, timestamps, names):
+    """
+    Named features of one window (returns a 1-D vector) or of every window of an
+    (n_windows, window_len) stack (returns an (n_windows, len(names)) array).
+    """
+    windows = BatchWindows(np.asarray(values), np.asarray(timestamps))
+    out = np.empty(windows.values.shape[:-1] + (len(names),))
+    if out.size == 0:
+        return out
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for i, name in enumerate(names):
+            out[..., i] = FEATURES[name].batch(windows)
+    return out
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from inference import load_classifier
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', type=str, default="emg_classifier.npz", help='Classifier whose feature list to show')
+    args = parser.parse_args()
+
+    used = model_features(load_classifier(args.model))
+    print(f"{args.model} uses {len(used)} of {len(FEATURES)} registered features")
+    for name, feature in FEATURES.items():
+        position = f"input {used.index(name)}" if name in used else ""
+        print(f"{name:>22}  {feature.group:<8}  {position}")
@@ -0,0 +1,259 @@
+"""
+feature_selection.py
+
+Which features earn their CPU cost in the live loop? This script
+1. measures what every feature adds to StreamingFeatures.features() per window
+   (with benchmarks.measure(), on a window of real samples), with the running sums
+   or the per-window recompute the live loop uses at --window/--overlap. Features that share
+   work (the FFT of ps_moment1/2, the wavelet band of the wavelet_* features) pay
+   it once per group, so a subset costs the fixed overhead, plus each feature's own
+   cost, plus one share per group it uses;
+2. cross-validates a classifier on the 20-feature set and reports the
+   permutation importance of each feature;
+3. ablates every feature (cross-validated accuracy without it);
+4. searches subsets by backward elimination, dropping at each step the feature
+   whose removal hurts accuracy least (the cheaper subset on ties), and prints the
+   Pareto-optimal subsets: no other subset seen is both cheaper and more accurate.
+
+The rows come from features.csv-style per-recording features (feature_cache.py,
+same as extra_files/NEWdatapp.py), a given features CSV, or with --windowed the
+sliding windows the live loop classifies (recordings are kept whole within a fold).
+The search uses a fast classifier (logistic regression by default); the Pareto
+subsets are then re-scored with an MLP shaped like the model of model_training.py.
+
+The Pareto subsets are saved to feature_subsets.json, each with the command that
+trains a deployable model on it (model_training.py --features ...) on the rows it
+was scored on: --features-csv with --csv, otherwise the search's --data, --window
+and --overlap (model_training.py trains on windows, so per-recording rows are
+the one mode it cannot reproduce exactly). The real-time scripts then compute
+only those features.
+
+The cost model times the features on the longest recording in --data, or on
+synthetic ADC samples when --csv is used without the recordings.
+
+Usage: python feature_selection.py [--data data | --csv features.csv] [--windowed] [--window 100] [--overlap 0]
+                                   [--classifier logistic] [--rescore mlp] [--folds 5]
+"""
+
+import argparse
+import json
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.inspection import permutation_importance
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedGroupKFold, StratifiedKFold
+from sklearn.neural_network import MLPClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from benchmarks import measure
+from feature_registry import EXTENDED_FEATURES, FEATURES
+from ring_buffer import hop_size
+from streaming_features import StreamingFeatures
+
+CLASSIFIERS = {
+    "logistic": lambda: make_pipeline(StandardScaler(), LogisticRegression(max_iter=1000)),
+    # Two hidden layers of 32 like model_training.py (plus scaling, which the search needs)
+    "mlp": lambda: make_pipeline(StandardScaler(), MLPClassifier((32, 32), max_iter=1000, random_state=42)),
+    "forest": lambda: RandomForestClassifier(100, random_state=42),
+}
+SHARED_GROUPS = ("spectral", "wavelet")
+
+
+def feature_costs(timestamps, values, window_size, hop=None, rounds=3):
+    """
+    Per-window cost model of StreamingFeatures.features(), in microseconds:
+    (overhead, own cost per feature, shared cost per group). Every feature is timed
+    in `rounds` interleaved passes and the fastest pass kept, so a slow spell of the
+    machine does not land on a single feature. All features are timed in the mode
+    (running sums or recompute) the 20-feature set uses at this `hop`.
+    """
+    incremental = StreamingFeatures(window_size, extended=True, hop=hop).incremental
+    engines = {}
+    for name in [None] + list(FEATURES):
+        engine = StreamingFeatures(window_size, hop=hop, features=[] if name is None else [name],
+                                   incremental=incremental)
+        engine.extend(timestamps[:window_size], values[:window_size])
+        engines[name] = engine
+    best = {name: np.inf for name in engines}
+    for _ in range(rounds):
+        for name, engine in engines.items():
+            best[name] = min(best[name], measure(engine.features) * 1e6)
+
+    overhead = best.pop(None)
+    single = {name: max(best[name] - overhead, 0.0) for name in FEATURES}
+    own = dict(single)
+    group_costs = {}
+    for group in SHARED_GROUPS:
+        members = [name for name in FEATURES if FEATURES[name].group == group]
+        # The cheapest member is (almost) only the shared part
+        group_costs[group] = min(single[name] for name in members)
+        for name in members:
+            own[name] = single[name] - group_costs[group]
+    return overhead, own, group_costs
+
+
+def subset_cost(names, overhead, own, group_costs):
+    groups = {FEATURES[name].group for name in names}
+    return overhead + sum(own[name] for name in names) + sum(group_costs[g] for g in group_costs if g in groups)
+
+
+def folds(y, groups, n_folds):
+    """(train, test) index pairs, stratified by label and keeping each recording in one fold."""
+    if groups is None:
+        return list(StratifiedKFold(n_folds, shuffle=True, random_state=42).split(y, y))
+    return list(StratifiedGroupKFold(n_folds, shuffle=True, random_state=42).split(y, y, groups))
+
+
+def cross_validated_accuracy(X, y, splits, classifier):
+    """Mean and std of the test accuracy over the folds."""
+    scores = []
+    for train, test in splits:
+        model = CLASSIFIERS[classifier]().fit(X[train], y[train])
+        scores.append(model.score(X[test], y[test]))
+    return float(np.mean(scores)), float(np.std(scores))
+
+
+def permutation_importances(X, y, splits, classifier):
+    """Accuracy drop when each column is shuffled, averaged over the test folds."""
+    importances = []
+    for train, test in splits:
+        model = CLASSIFIERS[classifier]().fit(X[train], y[train])
+        result = permutation_importance(model, X[test], y[test], n_repeats=5, random_state=42)
+        importances.append(result.importances_mean)
+    return np.mean(importances, axis=0)
+
+
+def backward_elimination(X, y, columns, splits, classifier, cost):
+    """
+    Evaluate subsets by dropping one feature at a time. Returns every evaluated
+    subset as {"features", "accuracy", "accuracy_std", "cost_us"}; the first
+    len(columns) + 1 entries are the full set and its leave-one-out ablations.
+    """
+    def evaluate(names):
+        index = [columns.index(name) for name in names]
+        accuracy, accuracy_std = cross_validated_accuracy(X[:, index], y, splits, classifier)
+        return {"features": list(names), "accuracy": accuracy, "accuracy_std": accuracy_std, "cost_us": cost(names)}
+
+    current = list(columns)
+    evaluated = [evaluate(current)]
+    while len(current) > 1:
+        candidates = [evaluate([name for name in current if name != dropped]) for dropped in current]
+        evaluated += candidates
+        best = max(candidates, key=lambda c: (c["accuracy"], -c["cost_us"]))
+        current = best["features"]
+        print(f"{len(current):>2} features: accuracy {best['accuracy']:.3f}, {best['cost_us']:.1f} us per window")
+    return evaluated
+
+
+def pareto_front(subsets):
+    """Subsets that no other subset beats on both cost and accuracy, cheapest first."""
+    front = []
+    for subset in sorted(subsets, key=lambda s: (s["cost_us"], -s["accuracy"])):
+        if not front or subset["accuracy"] > front[-1]["accuracy"]:
+            front.append(subset)
+    return front
+
+
+def training_command(args, names):
+    """The model_training.py command for a subset, at the search's row mode, window and overlap."""
+    if args.csv:
+        rows = f"--features-csv {args.csv}"
+    else:
+        rows = f"--data {args.data} --window {args.window} --overlap {args.overlap:g}"
+    return f"python model_training.py {rows} --features " + " ".join(names)
+
+
+def cost_samples(args):
+    """(timestamps, values) to time the features on: the longest recording, or synthetic 1 kHz ADC samples."""
+    if args.csv and not os.path.exists(args.data):
+        rng = np.random.default_rng(42)
+        n = 10 * args.window
+        return [i / 1000 for i in range(n)], rng.integers(300, 700, n).astype(float).tolist()
+    from replay import load_recordings
+
+    _, timestamps, values = max(load_recordings(args.data), key=lambda r: len(r[2]))
+    return timestamps.tolist(), values.tolist()
+
+
+def load_rows(args):
+    """(X, y, groups, columns) from a features CSV, per-recording features or sliding windows."""
+    if args.csv:
+        df = pd.read_csv(args.csv)
+        columns = [name for name in df.columns if name in FEATURES]
+        return df[columns].values.astype(float), df["label"].values, None, columns
+    if args.windowed:
+        from replay import load_recordings
+        from training_windows import recording_window_features
+
+        xs, ys, groups = [], [], []
+        for i, (label, rows) in enumerate(recording_window_features(
+                load_recordings(args.data), args.window, args.overlap, extended=True)):
+            xs.append(rows)
+            ys += [label] * len(rows)
+            groups += [i] * len(rows)
+        return np.concatenate(xs), np.array(ys), np.array(groups), list(EXTENDED_FEATURES)
+
+    from feature_cache import extract_features
+
+    df = extract_features(args.data, extended=True)
+    return df[EXTENDED_FEATURES].values.astype(float), df["label"].values, None, list(EXTENDED_FEATURES)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', type=str, default="data", help='Folder with data_<label>_<timestamp>.csv recordings, or a recording store')
+    parser.add_argument('--csv', type=str, help='Use the feature columns of this CSV (e.g. features.csv) instead')
+    parser.add_argument('--windowed', action='store_true', help='Cross-validate on sliding windows instead of whole recordings')
+    parser.add_argument('--window', type=int, default=100, help='Window size in samples (WINDOW_SIZE in OGrtc.py)')
+    parser.add_argument('--overlap', type=float, default=0, help='Overlap between windows (--windowed rows, and the saved training commands)')
+    parser.add_argument('--classifier', choices=list(CLASSIFIERS), default="logistic", help='Classifier for the search')
+    parser.add_argument('--rescore', choices=list(CLASSIFIERS) + ["none"], default="mlp", help='Classifier to re-score the Pareto subsets with')
+    parser.add_argument('--folds', type=int, default=5, help='Cross-validation folds')
+    parser.add_argument('--output', type=str, default="feature_subsets.json", help='Where to save the Pareto subsets')
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", category=ConvergenceWarning)
+
+    overhead, own, group_costs = feature_costs(*cost_samples(args), args.window, hop_size(args.window, args.overlap))
+
+    X, y, groups, columns = load_rows(args)
+    splits = folds(y, groups, args.folds)
+    print(f"{len(X)} rows, {len(columns)} features, {args.folds}-fold cross-validation with {args.classifier}")
+    cost = lambda names: subset_cost(names, overhead, own, group_costs)
+
+    importances = permutation_importances(X, y, splits, args.classifier)
+    subsets = backward_elimination(X, y, columns, splits, args.classifier, cost)
+    full = subsets[0]
+    ablations = {name: subset for name, subset in zip(columns, subsets[1:len(columns) + 1])}
+
+    print(f"\nPer-window cost at {args.window} samples: {overhead:.1f} us overhead, "
+          + ", ".join(f"{g} {c:.1f} us shared" for g, c in group_costs.items()))
+    print(f"{'feature':>22} {'group':>9} {'own us':>8} {'importance':>11} {'without it':>11}")
+    for i, name in enumerate(columns):
+        print(f"{name:>22} {FEATURES[name].group:>9} {own[name]:>8.1f} {importances[i]:>11.3f} "
+              f"{ablations[name]['accuracy'] - full['accuracy']:>+11.3f}")
+    print(f"All {len(columns)} features: accuracy {full['accuracy']:.3f}, {full['cost_us']:.1f} us per window")
+
+    front = pareto_front(subsets)
+    if args.rescore != "none":
+        for subset in front:
+            index = [columns.index(name) for name in subset["features"]]
+            subset["rescored_accuracy"], _ = cross_validated_accuracy(X[:, index], y, splits, args.rescore)
+    print(f"\nPareto-optimal subsets ({args.classifier} accuracy"
+          + (f", {args.rescore} accuracy" if args.rescore != "none" else "") + "):")
+    for subset in front:
+        subset["command"] = training_command(args, subset["features"])
+        rescored = f" / {subset['rescored_accuracy']:.3f}" if "rescored_accuracy" in subset else ""
+        print(f"{subset['cost_us']:>8.1f} us  {subset['accuracy']:.3f}{rescored}  {' '.join(subset['features'])}")
+
+    with open(args.output, "w") as f:
+        json.dump({"window_size": args.window, "overlap": args.overlap, "classifier": args.classifier, "rescore": args.rescore,
+                   "rows": "csv" if args.csv else "windows" if args.windowed else "recordings",
+                   "overhead_us": overhead, "own_cost_us": own, "group_cost_us": group_costs,
+                   "pareto": front}, f, indent=1)
+    print(f"Saved {len(front)} subsets to {args.output}")
@@ -0,0 +1,449 @@
+"""
+game_batch.py
+
+Thousands of Dino games at once, as NumPy arrays, played by a classifier-controlled
+player, to see how decision settings (CONFIDENCE_THRESHOLD, the prediction
+cooldown, the duck duration) play out without running dino_game.py live.
+
+The rules are game_sim.py's: UI/gameUI.py's obstacles and jump (HIGH_JUMP), and
+dino_game.py's timed duck, which is what the classifier's "duck" command does.
+Every game is one row of the state arrays (dino height, duck timer, up to SLOTS
+obstacles). One step of all games is a handful of array operations, so Python
+runs once per step, not once per game; rows of games that are over are dropped.
+Each game has its own obstacle course, drawn up front with the game_sim spawn rule
+(it does not depend on the player).
+
+The player's timed commands come from:
+- replayed classifier decisions (--replay data, the default). For every obstacle
+  the player makes the gesture that clears it: clench to jump, wrist to duck under
+  a high pterodactyl. The gesture starts --anticipation seconds before the ideal
+  moment (by default, the classifier's median delay for that gesture). The
+  commands are whatever the classifier decided on a random recording of that
+  gesture, at their delays from its start, so late, missing and wrong commands
+  play out as they would. At rest, false commands come at the rate the classifier
+  makes them on the rest recordings. All windows of the recordings are
+  classified once (one batched predict), and only the decision rule (threshold,
+  cooldown) is re-run per setting.
+- a recorded decision stream (--decisions log.csv, with columns time,command),
+  played as is, from a random point of the looped stream in every game
+
+For each setting, the report shows what the classifier did on the recordings,
+then the survival time and score over the games, and the simulated frames (game
+steps) per second. A perfect player (the right command at the ideal moment) and a
+player without input give the upper and lower bounds.
+
+Usage: python game_batch.py [--replay data] [--games 10000] [--minutes 2] [--threshold 0.5 0.7 0.9] [--cooldown 0.5] [--duck-time 0.5]
+       python game_batch.py --decisions log.csv
+       python game_batch.py --check
+--check plays a few hundred games in both game_batch and game_sim.GameSim, with the
+same courses and commands, and checks that every game ends at the same step.
+"""
+
+import argparse
+import random
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from game_sim import (CACTUS_SIZE, CACTUS_VARIANTS, CACTUS_X, CACTUS_Y, DINO_X, DUCK_SIZE, DUCK_TIME, DUCK_Y, GRAVITY,
+                      GROUND_Y, HIGH_JUMP, OBSTACLE_COOLDOWN, PTERO_HEIGHTS, PTERO_SIZE, PTERO_X, RUN_SIZE, SCORE_GAIN,
+                      SPEED_GAIN, START_SPEED, STEP, GameSim, steps_in)
+
+JUMP, DUCK, RUN = 1, 2, 3
+COMMAND_CODES = {"jump": JUMP, "duck": DUCK, "run": RUN}
+CACTUS, PTERO = 0, 1
+SLOTS = 3                   # Obstacles on screen at once: spawns are >= 1 s apart and one crosses in < 2 s
+SPAWN_CHANCE = 9 / 50       # game_sim: randint(1, 50) gives a cactus on 1-6, a pterodactyl on 7-9
+CACTUS_SHARE = 6 / 9
+REACTION_GAP = 30           # px from the dino to the obstacle at the ideal moment (game_sim.autopilot_inputs)
+GESTURES = {"jump": "clench", "duck": "wrist"}
+
+# Per game (rows) and spawn (columns); the last column is a spawn step never reached
+Courses = namedtuple("Courses", ["steps", "kinds", "heights"])
+# One command per entry: game index, step it applies at, command code
+Events = namedtuple("Events", ["games", "steps", "codes"])
+
+
+def random_courses(games, n_steps, rng):
+    """Obstacle courses of `games` games: after the 1 s cooldown, every step spawns with SPAWN_CHANCE."""
+    cooldown = steps_in(OBSTACLE_COOLDOWN)
+    count = n_steps // cooldown + 1
+    waits = rng.geometric(SPAWN_CHANCE, (games, count)) - 1
+    spawn_steps = np.cumsum(cooldown + waits, axis=1)
+    kinds = np.where(rng.random((games, count)) < CACTUS_SHARE, CACTUS, PTERO)
+    heights = np.where(kinds == CACTUS, CACTUS_Y, np.asarray(PTERO_HEIGHTS)[rng.integers(0, len(PTERO_HEIGHTS), (games, count))])
+    never = np.full((games, 1), n_steps + 1)
+    return Courses(np.hstack([spawn_steps, never]), np.hstack([kinds, never * 0]), np.hstack([heights, never * 0]))
+
+
+def game_sim_courses(seeds, n_steps):
+    """The courses game_sim.GameSim(seed) spawns, drawn from the same random.Random sequence."""
+    cooldown = steps_in(OBSTACLE_COOLDOWN)
+    rows = []
+    for seed in seeds:
+        rng = random.Random(seed)
+        rng.getrandbits(32)  # GameSim.reset() seeds the clouds first
+        spawns, step = [], cooldown
+        while step < n_steps:
+            roll = rng.randint(1, 50)
+            if roll <= 6:
+                rng.randrange(CACTUS_VARIANTS)
+                spawns.append((step, CACTUS, CACTUS_Y))
+            elif roll <= 9:
+                spawns.append((step, PTERO, rng.choice(PTERO_HEIGHTS)))
+            else:
+                step += 1
+                continue
+            step += cooldown
+        rows.append(spawns + [(n_steps + 1, 0, 0)])
+    width = max(len(row) for row in rows)
+    padded = np.array([row + [row[-1]] * (width - len(row)) for row in rows])
+    return Courses(padded[:, :, 0], padded[:, :, 1], padded[:, :, 2])
+
+
+def make_events(games, steps, codes):
+    games, steps, codes = (np.asarray(a, dtype=np.int64).ravel() for a in (games, steps, codes))
+    return Events(games, np.maximum(steps, 0), codes)
+
+
+def concat_events(*events):
+    return Events(*(np.concatenate([e[i] for e in events]) for i in range(3)))
+
+
+def scores(death_steps, n_steps):
+    """Score at each game's end: SCORE_GAIN added once per step, as GameSim does."""
+    table = np.concatenate([[0.0], np.cumsum(np.full(n_steps, SCORE_GAIN))])
+    return np.floor(table[death_steps]).astype(int)
+
+
+def play(courses, events, n_steps, jump_height=HIGH_JUMP, duck_time=DUCK_TIME):
+    """
+    Play every game of `courses` with its `events` for up to n_steps steps.
+    Returns the step each game ended at (n_steps for the games still running).
+    """
+    n_games = courses.steps.shape[0]
+    duck_steps = steps_in(duck_time) if duck_time else -1  # -1: until "run"
+
+    # Events by step, then game, then given order; `rank` separates several commands of one game in one step
+    order = np.lexsort((np.arange(len(events.steps)), events.games, events.steps))
+    event_games, event_steps, event_codes = events.games[order], events.steps[order], events.codes[order]
+    first = np.r_[True, (event_steps[1:] != event_steps[:-1]) | (event_games[1:] != event_games[:-1])]
+    index = np.arange(len(event_steps))
+    rank = index - np.maximum.accumulate(np.where(first, index, 0))
+    bounds = np.searchsorted(event_steps, np.arange(n_steps + 1))
+
+    ids = np.arange(n_games)            # game of each row
+    row_of = np.arange(n_games)         # row of each game, -1 once it is over
+    y = np.full(n_games, float(GROUND_Y))
+    ducking = np.zeros(n_games, dtype=bool)
+    duck_left = np.zeros(n_games, dtype=np.int64)
+    ox = np.full((n_games, SLOTS), np.nan)  # obstacle centres; NaN never collides
+    oy = np.zeros((n_games, SLOTS))
+    half_w = np.zeros((n_games, SLOTS))
+    half_h = np.zeros((n_games, SLOTS))
+    spawned = np.zeros(n_games, dtype=np.int64)
+    next_spawn = courses.steps[:, 0].copy()
+    ended = np.full(n_games, n_steps)
+    speed = START_SPEED
+
+    for k in range(n_steps):
+        # Commands due at this step, like GameSim.step()
+        start, end = bounds[k], bounds[k + 1]
+        for r in range(rank[start:end].max() + 1 if end > start else 0):
+            pick = start + np.nonzero(rank[start:end] == r)[0]
+            rows = row_of[event_games[pick]]
+            codes = event_codes[pick][rows >= 0]
+            rows = rows[rows >= 0]
+            jump = rows[codes == JUMP]
+            jump = jump[y[jump] >= GROUND_Y]
+            y[jump] = GROUND_Y - jump_height
+            duck = rows[codes == DUCK]
+            ducking[duck] = True
+            y[duck] = DUCK_Y
+            duck_left[duck] = duck_steps
+            run = rows[codes == RUN]
+            ducking[run] = False
+            y[run] = GROUND_Y
+            duck_left[run] = 0
+
+        # Collisions (Body.collides on every obstacle)
+        dino_half_w = np.where(ducking, DUCK_SIZE[0] / 2, RUN_SIZE[0] / 2)
+        dino_half_h = np.where(ducking, DUCK_SIZE[1] / 2, RUN_SIZE[1] / 2)
+        left, right = DINO_X - dino_half_w, DINO_X + dino_half_w
+        top, bottom = y - dino_half_h, y + dino_half_h
+        hit = ((left[:, None] < ox + half_w) & (ox - half_w < right[:, None])
+               & (top[:, None] < oy + half_h) & (oy - half_h < bottom[:, None])).any(axis=1)
+        if hit.any():
+            ended[ids[hit]] = k
+            row_of[ids[hit]] = -1
+            keep = ~hit
+            ids, y, ducking, duck_left, spawned, next_spawn = (a[keep] for a in (ids, y, ducking, duck_left,
+                                                                                 spawned, next_spawn))
+            ox, oy, half_w, half_h = (a[keep] for a in (ox, oy, half_w, half_h))
+            row_of[ids] = np.arange(len(ids))
+            if not len(ids):
+                break
+
+        speed += SPEED_GAIN
+        spawn = np.nonzero(next_spawn == k)[0]
+        if len(spawn):
+            games, number = ids[spawn], spawned[spawn]
+            slot = number % SLOTS
+            cactus = courses.kinds[games, number] == CACTUS
+            ox[spawn, slot] = np.where(cactus, CACTUS_X, PTERO_X)
+            oy[spawn, slot] = courses.heights[games, number]
+            half_w[spawn, slot] = np.where(cactus, CACTUS_SIZE[0] / 2, PTERO_SIZE[0] / 2)
+            half_h[spawn, slot] = np.where(cactus, CACTUS_SIZE[1] / 2, PTERO_SIZE[1] / 2)
+            spawned[spawn] += 1
+            next_spawn[spawn] = courses.steps[games, number + 1]
+
+        # Dino: gravity down to the floor, then the duck timer
+        floor = np.where(ducking, DUCK_Y, GROUND_Y)
+        y = np.where(y < floor, np.minimum(y + GRAVITY, floor), y)
+        timed = duck_left > 0
+        duck_left[timed] -= 1
+        done = timed & (duck_left == 0)
+        ducking[done] = False
+        y[done] = GROUND_Y
+
+        ox -= speed
+        ox[ox + half_w < 0] = np.nan
+    return ended
+
+
+def distance_table(n_steps):
+    """Distance the obstacles have moved before each step (the game speed of each step, added up)."""
+    speeds = START_SPEED + SPEED_GAIN * np.arange(1, n_steps + 1)
+    return np.concatenate([[0.0], np.cumsum(speeds)])
+
+
+def ideal_commands(courses, n_steps, gap=REACTION_GAP):
+    """
+    (games, steps, codes) of the obstacles spawned within n_steps: the step at which
+    each is `gap` px ahead of the running dino, and the command that clears it.
+    """
+    games, number = np.nonzero(courses.steps < n_steps)
+    spawn, kinds, heights = (a[games, number] for a in courses)
+    distance = distance_table(2 * n_steps)
+    x = np.where(kinds == CACTUS, CACTUS_X - CACTUS_SIZE[0] / 2, PTERO_X - PTERO_SIZE[0] / 2)
+    steps = np.searchsorted(distance, distance[spawn] + x - (DINO_X + RUN_SIZE[0] / 2) - gap)
+    codes = np.where((kinds == PTERO) & (heights < PTERO_HEIGHTS[-1]), DUCK, JUMP)
+    keep = steps < n_steps
+    return games[keep], steps[keep], codes[keep]
+
+
+def open_loop_events(stream, n_games, n_steps, rng):
+    """A decision stream [(seconds, command)] looped, from a random point of it in every game."""
+    times = np.array([t for t, _ in stream], dtype=float)
+    codes = np.array([COMMAND_CODES[c] for _, c in stream])
+    times -= times.min()
+    length = times.max() + 1.0  # a second of nothing before it loops
+    repeats = int(np.ceil(n_steps * STEP / length)) + 1
+    offsets = rng.uniform(0, length, n_games)
+    at = (times[None, None, :] + length * np.arange(repeats)[None, :, None] - offsets[:, None, None])
+    steps = np.ceil(at / STEP - 1e-9).astype(np.int64)
+    games = np.broadcast_to(np.arange(n_games)[:, None, None], steps.shape)
+    keep = (steps >= 0) & (steps < n_steps)
+    return make_events(games[keep], steps[keep], np.broadcast_to(codes, steps.shape)[keep])
+
+
+def load_decision_log(path):
+    import pandas as pd
+
+    log = pd.read_csv(path)
+    return [(t, c) for t, c in zip(log["time"], log["command"]) if c in COMMAND_CODES]
+
+
+class ReplayedClassifier:
+    """
+    What the classifier decides on each recording: the windows of all recordings
+    are classified once; decisions() re-runs only the decision rule.
+    """
+
+    def __init__(self, model, recordings, window_size, overlap):
+        from feature_registry import model_features
+        from ring_buffer import hop_size
+        from training_windows import recording_window_features
+
+        hop = hop_size(window_size, overlap)
+        full = [r for r in recordings if len(r[2]) >= window_size]
+        rows = [features for _, features in recording_window_features(full, window_size, overlap,
+                                                                      features=model_features(model))]
+        probabilities = np.split(model.predict(np.concatenate(rows)), np.cumsum([len(r) for r in rows])[:-1])
+        self.label_classes = list(model.label_classes)
+        self.recordings = []        # (label, duration, window end times from the start, probabilities)
+        for (label, timestamps, _), p in zip(full, probabilities):
+            timestamps = np.asarray(timestamps, dtype=float)
+            ends = timestamps[np.arange(len(p)) * hop + window_size - 1] - timestamps[0]
+            self.recordings.append((label, timestamps[-1] - timestamps[0], ends, p))
+
+    def decisions(self, threshold, cooldown):
+        """Per recording: (label, duration, [(seconds from its start, command)])."""
+        from classification_server import GAME_COMMANDS, is_decision
+
+        result = []
+        for label, duration, ends, p in self.recordings:
+            last_label, last_time = None, 0
+            commands = []
+            for t, confidence, predicted in zip(ends.tolist(), p.max(axis=1).tolist(), p.argmax(axis=1).tolist()):
+                predicted = self.label_classes[predicted]
+                if is_decision(confidence, predicted, t, last_label, last_time, threshold, cooldown):
+                    last_label, last_time = predicted, t
+                    if predicted in GAME_COMMANDS:
+                        commands.append((t, GAME_COMMANDS[predicted]))
+            result.append((label, duration, commands))
+        return result
+
+
+def gesture_stats(decisions):
+    """
+    Per gesture: share of recordings with the right command, delay of the first
+    one (median, p10, p90), share with a wrong command.
+    """
+    stats = {}
+    for command, gesture in GESTURES.items():
+        runs = [commands for label, _, commands in decisions if label == gesture]
+        delays = [next(t for t, c in commands if c == command) for commands in runs
+                  if any(c == command for _, c in commands)]
+        wrong = sum(any(c != command for _, c in commands) for commands in runs)
+        p10, p50, p90 = np.percentile(delays, [10, 50, 90]) if delays else (0.0, 0.0, 0.0)
+        stats[command] = {"hit": len(delays) / max(len(runs), 1), "delay": float(p50), "p10": float(p10),
+                          "p90": float(p90), "wrong": wrong / max(len(runs), 1)}
+    rest = [(duration, commands) for label, duration, commands in decisions if label not in GESTURES.values()]
+    rest_time = sum(duration for duration, _ in rest)
+    stats["rest"] = {command: sum(c == command for _, commands in rest for _, c in commands) / max(rest_time, 1e-9)
+                     for command in GESTURES}  # false commands per second
+    return stats
+
+
+def classifier_events(courses, decisions, n_steps, rng, anticipation=None):
+    """
+    The commands of a player who makes the right gesture for every obstacle
+    (ideal_commands) `anticipation` seconds early, per command (default: the
+    classifier's median delay), as the classifier turns a random recording of that
+    gesture into commands; plus the false commands at rest.
+    """
+    stats = gesture_stats(decisions)
+    games, ideal, codes = ideal_commands(courses, n_steps)
+    parts = []
+    for command, gesture in GESTURES.items():
+        responses = [commands for label, _, commands in decisions if label == gesture]
+        lead = stats[command]["delay"] if anticipation is None else anticipation
+        pick = codes == COMMAND_CODES[command]
+        chosen = rng.integers(0, len(responses), pick.sum())
+        counts = np.array([len(r) for r in responses])[chosen]
+        offsets = np.array([t for r in responses for t, _ in r] + [0.0])
+        response_codes = np.array([COMMAND_CODES[c] for r in responses for _, c in r] + [0])
+        starts = np.concatenate([[0], np.cumsum([len(r) for r in responses])])[chosen]
+        flat = np.repeat(starts - np.cumsum(np.r_[0, counts[:-1]]), counts) + np.arange(counts.sum())
+        at = np.repeat(ideal[pick] * STEP - lead, counts) + offsets[flat]
+        parts.append(make_events(np.repeat(games[pick], counts), np.ceil(at / STEP - 1e-9), response_codes[flat]))
+        # False commands while resting, at the rate of the rest recordings
+        false = rng.poisson(stats["rest"][command] * n_steps * STEP, courses.steps.shape[0])
+        parts.append(make_events(np.repeat(np.arange(len(false)), false), rng.integers(0, n_steps, false.sum()),
+                                 np.full(false.sum(), COMMAND_CODES[command])))
+    return concat_events(*parts)
+
+
+def run_games(name, courses, events, n_steps, duck_time):
+    start = time.perf_counter()
+    ended = play(courses, events, n_steps, duck_time=duck_time)
+    elapsed = time.perf_counter() - start
+    frames = ended.sum()  # steps played
+    survived = ended * STEP
+    score = scores(ended, n_steps)
+    p10, p50, p90 = np.percentile(survived, [10, 50, 90])
+    print(f"{name:>28} {p10:>7.1f} {p50:>7.1f} {p90:>7.1f} {np.median(score):>9.0f} {score.mean():>7.0f} "
+          f"{np.mean(ended == n_steps):>9.1%} {frames / elapsed / 1e6:>10.2f}")
+
+
+def check(n_games=300, n_steps=steps_in(60), seed=0):
+    """game_batch and GameSim on the same courses and commands: every game has to end at the same step."""
+    from inference import load_classifier
+    from replay import load_recordings
+
+    rng = np.random.default_rng(seed)
+    courses = game_sim_courses(range(n_games), n_steps)
+    decisions = ReplayedClassifier(load_classifier("emg_classifier.npz"), load_recordings("data"), 100, 0).decisions(0.5, 0.5)
+    events = concat_events(make_events(*ideal_commands(courses, n_steps)),
+                           classifier_events(courses, decisions, n_steps, rng),
+                           # and every command at random, "run" included
+                           make_events(rng.integers(0, n_games, 20 * n_games), rng.integers(0, n_steps, 20 * n_games),
+                                       rng.integers(JUMP, RUN + 1, 20 * n_games)))
+    ended = play(courses, events, n_steps)
+    names = {code: name for name, code in COMMAND_CODES.items()}
+    mismatches = 0
+    for game in range(n_games):
+        sim = GameSim(game, jump_height=HIGH_JUMP, duck_time=DUCK_TIME)
+        mine = events.games == game
+        for step, code in zip(events.steps[mine], events.codes[mine]):
+            sim.command(names[code], step * STEP)
+        while sim.steps < n_steps and not sim.game_over:
+            sim.step()
+        mismatches += sim.steps != ended[game]
+    print(f"{n_games} games of up to {n_steps} steps, {len(events.steps)} commands: "
+          f"{n_games - mismatches} end at the same step in game_batch and game_sim "
+          f"(median {np.median(ended) * STEP:.1f} s)")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--replay', type=str, default="data", help='Recordings to replay through the classifier')
+    parser.add_argument('--decisions', type=str, help='Play this recorded decision log (time,command CSV) instead')
+    parser.add_argument('--model', type=str, default="emg_classifier.npz", help='Classifier to replay')
+    parser.add_argument('--games', type=int, default=10000, help='Games per setting')
+    parser.add_argument('--minutes', type=float, default=2, help='Longest game')
+    parser.add_argument('--threshold', type=float, nargs='+', default=[0.5, 0.7, 0.9], help='Confidence thresholds to compare')
+    parser.add_argument('--cooldown', type=float, nargs='+', default=[0.5], help='Prediction cooldowns (s) to compare')
+    parser.add_argument('--duck-time', type=float, nargs='+', default=[DUCK_TIME], help='Duck durations (s) to compare')
+    parser.add_argument('--anticipation', type=float, help='Seconds the player gestures early (default: the median delay)')
+    parser.add_argument('--window', type=int, default=100, help='Window size in samples')
+    parser.add_argument('--overlap', type=float, default=0, help='Overlap between windows')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the courses and of the sampled recordings')
+    parser.add_argument('--check', action='store_true', help='Check game_batch against game_sim.GameSim and exit')
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if check() else "FAILED: game_batch and game_sim disagree")
+
+    n_steps = steps_in(args.minutes * 60)
+    rng = np.random.default_rng(args.seed)
+    courses = random_courses(args.games, n_steps, rng)
+    header = (f"{'player':>28} {'survived s p10':>15} {'p50':>7} {'p90':>7} {'score p50':>9} {'mean':>7} "
+              f"{'full game':>9} {'Mframes/s':>10}")
+
+    if args.decisions:
+        stream = load_decision_log(args.decisions)
+        print(f"{len(stream)} decisions from {args.decisions}, {args.games} games of up to {args.minutes:g} min")
+        print(header)
+        for duck_time in args.duck_time:
+            run_games(f"log, duck {duck_time:g}s", courses, open_loop_events(stream, args.games, n_steps, rng),
+                      n_steps, duck_time)
+        raise SystemExit
+
+    from inference import load_classifier
+    from replay import load_recordings
+
+    start = time.perf_counter()
+    replayed = ReplayedClassifier(load_classifier(args.model), load_recordings(args.replay), args.window, args.overlap)
+    print(f"Classified the windows of {len(replayed.recordings)} recordings in {time.perf_counter() - start:.2f} s; "
+          f"{args.games} games of up to {args.minutes:g} min per setting")
+    print("On the recordings (right command, its delay: median (p10-p90), wrong command; "
+          "false commands per minute at rest):")
+    settings = [(t, c) for t in args.threshold for c in args.cooldown]
+    for threshold, cooldown in settings:
+        stats = gesture_stats(replayed.decisions(threshold, cooldown))
+        print(f"  threshold {threshold:g}, cooldown {cooldown:g}s: " + "; ".join(
+            f"{GESTURES[c]} {s['hit']:.0%} {s['delay']:.2f}s ({s['p10']:.2f}-{s['p90']:.2f}) wrong {s['wrong']:.0%}"
+            for c, s in stats.items() if c != "rest")
+            + "; rest " + " ".join(f"{c} {rate * 60:.1f}" for c, rate in stats["rest"].items()))
+    print(header)
+    for duck_time in args.duck_time:
+        run_games(f"perfect, duck {duck_time:g}s", courses, make_events(*ideal_commands(courses, n_steps)),
+                  n_steps, duck_time)
+        for threshold, cooldown in settings:
+            events = classifier_events(courses, replayed.decisions(threshold, cooldown), n_steps, rng, args.anticipation)
+            run_games(f"t {threshold:g} c {cooldown:g}s, duck {duck_time:g}s", courses, events, n_steps, duck_time)
+        run_games("no input", courses, make_events([], [], []), n_steps, duck_time)
@@ -0,0 +1,130 @@
+"""
+game_bridge.py
+
+Hand-off of classifier decisions to a pygame render loop without tying the frame
+rate to the sensor.
+
+The game no longer waits on a serial port or a socket, and no longer goes through
+pygame's event queue: producers put() commands into a CommandQueue from any thread,
+and the render loop drain()s everything once per frame, at the start of the frame,
+so a command is on screen in the first frame that begins after it arrived (at most
+one frame later at a steady frame rate). Every command is stamped when queued
+("posted") and when drained ("drained", the frame start), see latency.py.
+
+Producers:
+- in-process: the classifier runs in a worker thread (start_classifier_worker(),
+  a classification_server.ClassificationServer whose player sends to the queue)
+- out-of-process: command_server.CommandServer feeding the queue, over TCP
+  (host:port) or a Unix domain socket (unix:<path>, one copy less and no TCP stack
+  on the same machine; not available on Windows)
+
+Usage: see dino_game.py --bridge and UI/gameUIwithClassification.py
+"""
+
+import threading
+from collections import deque, namedtuple
+
+import numpy as np
+
+from latency import LatencyTrace, now
+
+# queued/drained: time.perf_counter() when put() and when taken by the frame
+Command = namedtuple("Command", ["command", "trace", "queued", "drained"])
+
+MAX_COMMANDS = 1024
+MAX_DELAYS = 10000
+
+
+class CommandQueue:
+    """
+    Thread-safe queue of game commands, drained once per frame. put() returns False
+    when `max_commands` are waiting (the game is stuck, e.g. on its game over screen),
+    which command_server.CommandServer turns into backpressure.
+    """
+
+    def __init__(self, max_commands=MAX_COMMANDS):
+        self.max_commands = max_commands
+        self._commands = deque()
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.refused = 0
+        self._delays = deque(maxlen=MAX_DELAYS)     # queued -> drained, seconds
+        self._frame_times = deque(maxlen=MAX_DELAYS)  # between consecutive drains, seconds
+        self._last_frame = None
+
+    def put(self, command, trace=None):
+        """Queue a command (from any thread); False if the queue is full."""
+        trace = (trace or LatencyTrace()).mark("posted")
+        with self._lock:
+            if len(self._commands) >= self.max_commands:
+                self.refused += 1
+                return False
+            self._commands.append((command, trace, trace.stamps["posted"]))
+        return True
+
+    def handle(self, command, fields):
+        """command_server.CommandServer handler: fields carry the latency stamps."""
+        return self.put(command, LatencyTrace.decode(fields) if fields else None)
+
+    # Game client interface of classification_server.Stream
+    send = put
+
+    def close(self):
+        pass
+
+    def drain(self, frame_time=None):
+        """All commands queued since the last frame, oldest first, stamped with the frame start."""
+        frame_time = now() if frame_time is None else frame_time
+        if self._last_frame is not None:
+            self._frame_times.append(frame_time - self._last_frame)
+        self._last_frame = frame_time
+        self.frames += 1
+        with self._lock:
+            if not self._commands:
+                return []
+            queued = list(self._commands)
+            self._commands.clear()
+        commands = []
+        for command, trace, queued_at in queued:
+            self._delays.append(frame_time - queued_at)
+            commands.append(Command(command, trace.mark("drained", frame_time), queued_at, frame_time))
+        return commands
+
+    def clear(self):
+        with self._lock:
+            self._commands.clear()
+
+    def stats(self):
+        """Frame intervals and queue -> frame delays in milliseconds (p50/p99/max)."""
+        result = {"frames": self.frames, "commands": len(self._delays), "refused": self.refused}
+        for name, values in (("frame_ms", list(self._frame_times)), ("delay_ms", list(self._delays))):
+            if values:
+                p50, p99 = np.percentile(values, [50, 99]) * 1000
+                result[name] = {"p50": float(p50), "p99": float(p99), "max": float(np.max(values) * 1000)}
+        return result
+
+    def format_line(self):
+        stats = self.stats()
+        line = f"{stats['frames']} frames"
+        if "frame_ms" in stats:
+            frame = stats["frame_ms"]
+            line += f", frame ms p50 {frame['p50']:.2f} p99 {frame['p99']:.2f} max {frame['max']:.2f}"
+        if "delay_ms" in stats:
+            delay = stats["delay_ms"]
+            line += (f"; {stats['commands']} commands, queue->frame ms p50 {delay['p50']:.2f} "
+                     f"p99 {delay['p99']:.2f} max {delay['max']:.2f}")
+        return line
+
+
+def start_classifier_worker(server, tick=None):
+    """
+    Start a classification_server.ClassificationServer (its acquisition threads and its
+    tick loop) in a daemon thread; stop it with server.stop().
+    """
+    # Only the in-process mode needs the classifier modules
+    from classification_server import TICK
+
+    server.start()
+    thread = threading.Thread(target=server.run, args=(tick or TICK,), name="classifier", daemon=True)
+    thread.start()
+    return thread
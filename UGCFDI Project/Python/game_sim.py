@@ -0,0 +1,407 @@
+"""
+game_sim.py
+
+Fixed-timestep simulation of the Dino game rules, used by dino_game.py and
+UI/gameUI.py for drawing, and runnable headless (no pygame).
+
+The games used to move everything once per rendered frame. Their constants were
+tuned for 120 FPS: gravity 4.5 px, game speed +0.0015 and the duck timer -1/120 s
+per frame. When the frame rate dropped (TensorFlow loading the CPU), the whole
+game slowed down and a muscle input landed at a different point of a jump. Now:
+- GameSim.step() advances the rules by exactly STEP (1/120 s, so the constants keep
+  their meaning)
+- FixedTimestep adds up the real time between frames and tells the game how many
+  steps to run (none, one or several). It also says how far the game is into the
+  next step (alpha). Sprites are drawn at alpha between the previous and the
+  current step's positions, so motion stays smooth at any frame rate
+- commands carry the game time they were issued at. Each is applied at the first
+  step that starts at or after that time, not at the frame that happens to drain it
+
+With the same seed and timed inputs, the game goes through the same states step by
+step at any frame rate.
+
+Rules (per step unless noted):
+- the dino jumps by jump_height from the ground, falls GRAVITY px and lands back
+  on the ground. A duck lasts duck_time seconds (None: until "run")
+- the game speed starts at START_SPEED px and grows by SPEED_GAIN, and the score
+  grows by SCORE_GAIN
+- with obstacles, every step after OBSTACLE_COOLDOWN seconds since the last
+  obstacle has a 6/50 chance of a cactus and 3/50 of a pterodactyl. Touching one
+  (overlapping rects) ends the game
+- a cloud drifts in every CLOUD_INTERVAL seconds
+
+dino_game.py plays with GameSim(obstacles=False). UI/gameUI.py plays with
+GameSim(jump_height=HIGH_JUMP, duck_time=None), where the dino ducks while the key
+is held.
+
+Usage: python game_sim.py [--fps 30 60 144] [--duration 30] [--seed 0]
+plays the same scripted inputs headless at each frame rate, with both rule sets.
+It checks that every step matches the 120 FPS run and that the interpolated
+frames lie on the 120 FPS trajectory. It also shows where the old once-per-frame
+loop would be after the same time.
+"""
+
+import argparse
+import bisect
+import math
+import random
+
+STEP = 1 / 120              # Seconds per simulation step (the frame rate the rules were tuned at)
+MAX_STEPS_PER_FRAME = 12    # Catch up at most 0.1 s per frame; a longer stall is skipped, not replayed
+
+WIDTH = 1280
+DINO_X = 50
+GROUND_Y = 360              # Dino centre when running, and when ducking
+DUCK_Y = 380
+RUN_SIZE = (80, 100)
+DUCK_SIZE = (110, 60)
+JUMP_HEIGHT = 50            # dino_game.py
+HIGH_JUMP = 270             # UI/gameUI.py (up to centre y 90)
+GRAVITY = 4.5               # px per step
+DUCK_TIME = 0.5             # Seconds a "duck" command lasts (dino_game.py)
+RUN_ANIMATION = 0.05        # Sprite frames per step
+START_SPEED = 7             # px per step
+SPEED_GAIN = 0.0015         # per step
+SCORE_GAIN = 0.1            # per step
+
+OBSTACLE_COOLDOWN = 1.0     # Seconds after an obstacle before the next can appear
+CACTUS_X = 1280
+CACTUS_Y = 340
+CACTUS_SIZE = (100, 100)
+CACTUS_VARIANTS = 6         # assets/cacti/cactus1-6.png
+PTERO_X = 1300
+PTERO_HEIGHTS = (280, 295, 350)
+PTERO_SIZE = (84, 62)
+PTERO_ANIMATION = 0.025
+
+CLOUD_INTERVAL = 3.0        # Seconds
+CLOUD_X = 1380
+CLOUD_HEIGHTS = (50, 300)
+CLOUD_SIZE = (200, 80)
+CLOUD_SPEED = 1             # px per step
+
+COMMANDS = ("jump", "duck", "run")
+
+
+def steps_in(seconds):
+    """Number of simulation steps in a duration."""
+    return int(round(seconds / STEP))
+
+
+class Body:
+    """A moving rect: its centre now and one step ago, for render interpolation."""
+
+    def __init__(self, kind, x, y, size, variant=0):
+        self.kind = kind
+        self.x = self.prev_x = x
+        self.y = self.prev_y = y
+        self.size = size
+        self.variant = variant      # which cactus image
+        self.frame = 0.0            # animation frame, int() picks the image
+
+    def save(self):
+        self.prev_x, self.prev_y = self.x, self.y
+
+    def position(self, alpha=1.0):
+        """Centre at `alpha` (0..1) of the way from the previous step to the current one."""
+        return (self.prev_x + (self.x - self.prev_x) * alpha, self.prev_y + (self.y - self.prev_y) * alpha)
+
+    def bounds(self):
+        w, h = self.size
+        return self.x - w / 2, self.y - h / 2, self.x + w / 2, self.y + h / 2
+
+    def collides(self, other):
+        left, top, right, bottom = self.bounds()
+        other_left, other_top, other_right, other_bottom = other.bounds()
+        return left < other_right and other_left < right and top < other_bottom and other_top < bottom
+
+
+class GameSim:
+    """
+    The game rules, one STEP at a time. command() schedules "jump", "duck" or
+    "run" at a game time (seconds since the start, None for the next step); step()
+    applies the commands that are due and advances everything. Sounds are left to
+    the game: step() appends "points" (every 100 points) and "game_over" to
+    `events`.
+    """
+
+    def __init__(self, seed=None, obstacles=True, clouds=True, jump_height=JUMP_HEIGHT, duck_time=DUCK_TIME):
+        self.seed = seed
+        self.obstacles_enabled = obstacles
+        self.clouds_enabled = clouds
+        self.jump_height = jump_height
+        self.duck_steps = steps_in(duck_time) if duck_time else None
+        self.reset()
+
+    def reset(self):
+        self.random = random.Random(self.seed)
+        # Clouds draw from their own generator, so they do not change the obstacles
+        self.scenery = random.Random(self.random.getrandbits(32))
+        self.steps = 0
+        self.speed = START_SPEED
+        self.score = 0.0
+        self.distance = self.prev_distance = 0.0  # ground scrolled, px
+        self.game_over = False
+        self.dino = Body("dino", DINO_X, GROUND_Y, RUN_SIZE)
+        self.ducking = False
+        self.duck_left = None       # steps until the duck ends
+        self.obstacles = []
+        self.clouds = []
+        self.next_obstacle = steps_in(OBSTACLE_COOLDOWN)
+        self.next_cloud = steps_in(CLOUD_INTERVAL)
+        self.events = []
+        self._pending = []          # (step, order, command), sorted
+        self._order = 0
+
+    @property
+    def time(self):
+        return self.steps * STEP
+
+    def command(self, command, at=None):
+        """Apply `command` at the first step starting at or after game time `at`."""
+        if command not in COMMANDS:
+            raise ValueError(f"command must be one of {COMMANDS}")
+        due = self.steps if at is None else max(self.steps, math.ceil(at / STEP - 1e-9))
+        self._order += 1
+        bisect.insort(self._pending, (due, self._order, command))
+
+    def take_events(self):
+        events, self.events = self.events, []
+        return events
+
+    def spawn_cloud(self):
+        self.clouds.append(Body("cloud", CLOUD_X, self.scenery.randint(*CLOUD_HEIGHTS), CLOUD_SIZE))
+
+    def bodies(self):
+        return [self.dino] + self.obstacles + self.clouds
+
+    def step(self):
+        """Advance the game by STEP seconds; does nothing once the game is over."""
+        if self.game_over:
+            return
+        while self._pending and self._pending[0][0] <= self.steps:
+            self._apply(self._pending.pop(0)[2])
+        # Commands move the dino at once (no interpolation across a jump)
+        for body in self.bodies():
+            body.save()
+        self.prev_distance = self.distance
+
+        if self.obstacles_enabled and any(self.dino.collides(obstacle) for obstacle in self.obstacles):
+            self.game_over = True
+            self.events.append("game_over")
+            return
+        self.speed += SPEED_GAIN
+        if round(self.score, 1) % 100 == 0 and int(self.score) > 0:
+            self.events.append("points")
+        if self.obstacles_enabled and self.steps >= self.next_obstacle:
+            self._spawn_obstacle()
+        if self.clouds_enabled and self.steps >= self.next_cloud:
+            self.spawn_cloud()
+            self.next_cloud += steps_in(CLOUD_INTERVAL)
+        self.score += SCORE_GAIN
+
+        for cloud in self.clouds:
+            cloud.x -= CLOUD_SPEED
+        self._update_dino()
+        for obstacle in self.obstacles:
+            obstacle.x -= self.speed
+            if obstacle.kind == "ptero":
+                obstacle.frame = (obstacle.frame + PTERO_ANIMATION) % 2
+        self.distance += self.speed
+        # Gone past the left edge for good
+        self.clouds = [c for c in self.clouds if c.x + c.size[0] / 2 >= 0]
+        self.obstacles = [o for o in self.obstacles if o.x + o.size[0] / 2 >= 0]
+        self.steps += 1
+
+    def _apply(self, command):
+        dino = self.dino
+        if command == "jump":
+            if dino.y >= GROUND_Y:
+                dino.y = GROUND_Y - self.jump_height
+        elif command == "duck":
+            self.ducking = True
+            dino.y = DUCK_Y
+            dino.size = DUCK_SIZE
+            self.duck_left = self.duck_steps
+        elif command == "run":
+            self._unduck()
+
+    def _unduck(self):
+        self.ducking = False
+        self.dino.y = GROUND_Y
+        self.dino.size = RUN_SIZE
+        self.duck_left = None
+
+    def _update_dino(self):
+        dino = self.dino
+        dino.frame = (dino.frame + RUN_ANIMATION) % 2
+        floor = DUCK_Y if self.ducking else GROUND_Y
+        if dino.y < floor:
+            dino.y = min(dino.y + GRAVITY, floor)
+        if self.duck_left is not None:
+            self.duck_left -= 1
+            if self.duck_left <= 0:
+                self._unduck()
+
+    def _spawn_obstacle(self):
+        roll = self.random.randint(1, 50)
+        if roll <= 6:
+            obstacle = Body("cactus", CACTUS_X, CACTUS_Y, CACTUS_SIZE, self.random.randrange(CACTUS_VARIANTS))
+        elif roll <= 9:
+            obstacle = Body("ptero", PTERO_X, self.random.choice(PTERO_HEIGHTS), PTERO_SIZE)
+        else:
+            return
+        self.obstacles.append(obstacle)
+        self.next_obstacle = self.steps + steps_in(OBSTACLE_COOLDOWN)
+
+    def state(self):
+        """Everything that moves, for comparing runs step by step."""
+        return (self.steps, self.dino.x, self.dino.prev_y, self.dino.y, self.ducking, self.speed, self.score, self.distance,
+                self.game_over, tuple((o.kind, o.variant, o.x, o.y) for o in self.obstacles),
+                tuple((c.x, c.y) for c in self.clouds))
+
+
+class FixedTimestep:
+    """
+    Turns the real time between frames into whole simulation steps. advance()
+    returns how many steps to run now. `alpha` is how far (0..1) the game is into
+    the next step, for drawing between positions. After a stall longer than
+    max_steps steps, the rest is dropped and added to `skipped`, so the game
+    does not fast-forward.
+    """
+
+    def __init__(self, step=STEP, max_steps=MAX_STEPS_PER_FRAME):
+        self.step = step
+        self.max_steps = max_steps
+        self.reset()
+
+    def reset(self):
+        self.accumulator = 0.0
+        self.skipped = 0.0
+
+    def advance(self, elapsed):
+        self.accumulator += elapsed
+        steps = int(self.accumulator / self.step + 1e-9)
+        if steps > self.max_steps:
+            self.skipped += (steps - self.max_steps) * self.step
+            steps = self.max_steps
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= steps * self.step
+        return steps
+
+    @property
+    def alpha(self):
+        return min(max(self.accumulator / self.step, 0.0), 1.0)
+
+
+def simulate(inputs, fps, duration, seed=0, per_frame=False, **rules):
+    """
+    Play timed inputs [(seconds, command), ...] headless at `fps` frames per second
+    for `duration` seconds, like the game loop does. Each frame drains the inputs
+    issued since the last one, runs the steps the FixedTimestep gives and "draws"
+    at alpha. per_frame=True is the old loop instead: one step per frame, and the
+    inputs at the frame that drains them.
+    Returns the state after every step and (time, dino y drawn) for every frame.
+    """
+    sim = GameSim(seed, **rules)
+    timestep = FixedTimestep()
+    inputs = sorted(inputs)
+    states, frames = [sim.state()], []
+    next_input = 0
+    for frame in range(1, int(round(duration * fps)) + 1):
+        frame_time = frame / fps
+        while next_input < len(inputs) and inputs[next_input][0] <= frame_time:
+            at, command = inputs[next_input]
+            sim.command(command, None if per_frame else at)
+            next_input += 1
+        steps = 1 if per_frame else timestep.advance(1 / fps)
+        for _ in range(steps):
+            sim.step()
+            states.append(sim.state())
+        frames.append((frame_time, sim.dino.position(1.0 if per_frame else timestep.alpha)[1]))
+    return states, frames
+
+
+def random_inputs(duration, seed):
+    """Random jumps and ducks, 0.3-1.5 s apart."""
+    rng = random.Random(seed)
+    inputs, t = [], rng.uniform(0.3, 1.5)
+    while t < duration:
+        inputs.append((t, "jump" if rng.random() < 0.6 else "duck"))
+        t += rng.uniform(0.3, 1.5)
+    return inputs
+
+
+def autopilot_inputs(duration, seed, gap=30, **rules):
+    """
+    Timed inputs of a simple player, recorded at 120 FPS: jump a cactus or a low
+    pterodactyl when it is `gap` px ahead, duck under a high one until it has passed.
+    """
+    sim = GameSim(seed, **rules)
+    inputs = []
+    while sim.time < duration and not sim.game_over:
+        dino_left, _, dino_right, _ = sim.dino.bounds()
+        ahead = [o for o in sim.obstacles if o.bounds()[2] > dino_left]
+        nearest = min(ahead, key=lambda o: o.x, default=None)
+        command = None
+        if nearest is not None and nearest.bounds()[0] - dino_right < gap:
+            if nearest.kind == "ptero" and nearest.y < PTERO_HEIGHTS[-1]:
+                command = None if sim.ducking else "duck"
+            elif not sim.ducking and sim.dino.y >= GROUND_Y:
+                command = "jump"
+        elif sim.ducking:
+            command = "run"
+        if command:
+            inputs.append((sim.time, command))
+            sim.command(command)
+        sim.step()
+    return inputs
+
+
+def drawn_error(frames, states):
+    """Largest distance (px) between a drawn dino y and the 120 FPS run's y at the same point of its step."""
+    error = 0.0
+    for frame_time, y in frames:
+        # Drawn between the start and the end of the last step run, `position` steps into the game
+        position = frame_time / STEP
+        k = min(max(int(position + 1e-9), 1), len(states) - 1)
+        alpha = position - k
+        expected = states[k][2] + (states[k][3] - states[k][2]) * alpha
+        error = max(error, abs(y - expected))
+    return error
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fps', type=float, nargs='+', default=[30, 60, 144], help='Frame rates to compare with 120 FPS')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of game per run')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the obstacles and of the scripted inputs')
+    args = parser.parse_args()
+
+    ui_rules = {"jump_height": HIGH_JUMP, "duck_time": None}
+    rule_sets = {
+        "dino_game.py": ({"obstacles": False}, random_inputs(args.duration, args.seed)),
+        "UI/gameUI.py": (ui_rules, autopilot_inputs(args.duration, args.seed, **ui_rules)),
+    }
+    failed = False
+    for name, (rules, inputs) in rule_sets.items():
+        reference, _ = simulate(inputs, 120, args.duration, args.seed, **rules)
+        end = reference[-1]
+        print(f"{name} rules, {len(inputs)} inputs: at 120 FPS, {len(reference) - 1} steps, score {int(end[6])}"
+              + (", game over" if end[8] else ""))
+        print(f"{'fps':>6} {'steps':>6} {'same states':>12} {'drawn y error':>14}   "
+              f"{'once-per-frame loop: score':>27} {'game time':>10}")
+        for fps in args.fps:
+            states, frames = simulate(inputs, fps, args.duration, args.seed, **rules)
+            common = min(len(states), len(reference))
+            same = states[:common] == reference[:common] and abs(len(states) - len(reference)) <= 1
+            error = drawn_error(frames, reference)
+            old, _ = simulate(inputs, fps, args.duration, args.seed, per_frame=True, **rules)
+            old_score = f"{int(old[-1][6])}" + (" (game over)" if old[-1][8] else "")
+            print(f"{fps:>6g} {len(states) - 1:>6} {'yes' if same else 'NO':>12} {error:>11.2e} px   "
+                  f"{old_score:>27} {old[-1][0] * STEP:>9.1f}s")
+            failed |= not same or error > 1e-6
+    if failed:
+        raise SystemExit("FAILED: the trajectory depends on the frame rate")
+    print("Every frame rate went through the same states, step for step")
@@ -0,0 +1,283 @@
+"""
+inference.py
+
+Lightweight inference backends for the Dense classifier trained by model_training.py.
+
+model.predict() builds a Keras data pipeline for every call, which costs milliseconds
+for a single feature row. load_classifier() returns an object with the same
+predict(features) -> probabilities interface, using one of these backends:
+- "numpy":  weights exported from the Keras model, evaluated with NumPy matmuls
+- "direct": the Keras model called directly, model(x, training=False)
+- "keras":  plain model.predict (the original behaviour)
+
+model_training.py also saves the classifier as emg_classifier.npz (weights, activations,
+label classes, feature columns and feature scaling). Loading the .npz with the "numpy"
+backend only needs NumPy, so the real-time scripts start without importing TensorFlow.
+quantization.py writes smaller .npz exports with float16 or int8 weights, which
+the "numpy" backend widens to float32 when loading: smaller files, same speed.
+
+Usage:
+python inference.py [--model emg_classifier.h5] [--runs 1000]
+    checks the NumPy and direct backends against model.predict and times them
+python inference.py --model emg_classifier.h5 --export --classes clench rest wrist
+    writes emg_classifier.npz for a model trained before the .npz export existed
+"""
+
+import os
+
+import numpy as np
+
+BACKENDS = ("numpy", "direct", "keras")
+
+
+def relu(x):
+    return np.maximum(x, 0)
+
+
+def softmax(x):
+    # Array methods and an in-place divide: np.max/np.sum cost more than the math on one row
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    e /= e.sum(axis=-1, keepdims=True)
+    return e
+
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": relu,
+    "sigmoid": lambda x: 1 / (1 + np.exp(-x)),
+    "tanh": np.tanh,
+    "softmax": softmax,
+}
+
+
+class Classifier:
+    """
+    Metadata shared by every backend: label classes, the ordered feature columns
+    the model was trained on, and the per-feature scaling applied before inference.
+    """
+
+    label_classes = None
+    feature_columns = None
+    feature_mean = None
+    feature_scale = None
+
+    def set_metadata(self, label_classes=None, feature_columns=None, feature_mean=None, feature_scale=None):
+        self.label_classes = None if label_classes is None else [str(c) for c in label_classes]
+        self.feature_columns = None if feature_columns is None else [str(c) for c in feature_columns]
+        self.feature_mean = None if feature_mean is None else np.asarray(feature_mean, dtype=float)
+        self.feature_scale = None if feature_scale is None else np.asarray(feature_scale, dtype=float)
+        return self
+
+    def copy_metadata(self, other):
+        return self.set_metadata(other.label_classes, other.feature_columns, other.feature_mean, other.feature_scale)
+
+    def load_metadata(self, data):
+        """Metadata from an opened .npz (missing entries stay None)."""
+        return self.set_metadata(*(data[key] if key in data else None for key in
+                                   ("label_classes", "feature_columns", "feature_mean", "feature_scale")))
+
+    def metadata_arrays(self):
+        """Metadata as .npz arrays (strings stored as unicode arrays)."""
+        arrays = {}
+        if self.label_classes is not None:
+            arrays["label_classes"] = np.array(self.label_classes)
+        if self.feature_columns is not None:
+            arrays["feature_columns"] = np.array(self.feature_columns)
+        if self.feature_mean is not None:
+            arrays["feature_mean"] = self.feature_mean
+            arrays["feature_scale"] = self.feature_scale
+        return arrays
+
+    def scale(self, features):
+        """Apply the training-time feature scaling, if the model has any."""
+        x = np.asarray(features, dtype=float)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+        if self.feature_mean is not None:
+            x = (x - self.feature_mean) / self.feature_scale
+        return x
+
+
+class NumpyDenseClassifier(Classifier):
+    """Stack of Dense layers evaluated with NumPy: x -> activation(x @ W + b) for each layer."""
+
+    def __init__(self, weights, biases, activations):
+        if not len(weights) == len(biases) == len(activations):
+            raise ValueError("weights, biases and activations must have one entry per layer")
+        for activation in activations:
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation: {activation}")
+        self.weights = [np.asarray(w) for w in weights]
+        self.biases = [np.asarray(b) for b in biases]
+        self.activations = [str(a) for a in activations]
+        self._layers = [(w, b, ACTIVATIONS[a]) for w, b, a in zip(self.weights, self.biases, self.activations)]
+        self.dtype = self.weights[0].dtype
+
+    @classmethod
+    def from_keras(cls, model):
+        """Export the kernels, biases and activations of a Sequential model of Dense layers."""
+        weights, biases, activations = [], [], []
+        for layer in model.layers:
+            params = layer.get_weights()
+            if not params:
+                continue  # InputLayer, Dropout, ... carry no weights at inference time
+            if layer.__class__.__name__ != "Dense":
+                raise ValueError(f"Only Dense layers can be exported, got {layer.__class__.__name__}")
+            weights.append(params[0])
+            biases.append(params[1] if len(params) > 1 else np.zeros(params[0].shape[1], params[0].dtype))
+            activations.append(layer.get_config()["activation"])
+        return cls(weights, biases, activations)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a classifier saved by save(); needs nothing but NumPy. float16 and int8
+        weights (quantization.py) are widened to float32, NumPy having no fast
+        float16/int8 matmul; int8 weights come with one scale per output unit.
+        """
+        def widen(a, scale=None):
+            if a.dtype == np.int8:
+                return a * scale.astype(np.float32)
+            return a.astype(np.float32) if a.dtype == np.float16 else a
+
+        with np.load(path, allow_pickle=False) as data:
+            if "quantization" in data and str(data["quantization"]) == "int8":
+                raise ValueError(f"{path} has int8 activations, which quantization.py only evaluates "
+                                 "offline; export float16 or int8-weights to deploy a smaller model")
+            layers = int(data["layers"])
+            classifier = cls([widen(data[f"W{i}"], data.get(f"w_scale{i}")) for i in range(layers)],
+                             [widen(data[f"b{i}"]) for i in range(layers)],
+                             data["activations"])
+            return classifier.load_metadata(data)
+
+    def save(self, path):
+        """Save weights and metadata as an uncompressed .npz (strings stored as unicode arrays)."""
+        arrays = {"layers": np.array(len(self.weights)), "activations": np.array(self.activations)}
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            arrays[f"W{i}"] = w
+            arrays[f"b{i}"] = b
+        arrays.update(self.metadata_arrays())
+        np.savez(path, **arrays)
+
+    @property
+    def input_size(self):
+        return self.weights[0].shape[0]
+
+    @property
+    def num_classes(self):
+        return self.weights[-1].shape[1]
+
+    def predict(self, features, verbose=None):
+        """Class probabilities for a (n_rows, n_features) array, like model.predict."""
+        x = self.scale(features).astype(self.dtype)
+        for w, b, activation in self._layers:
+            x = activation(x @ w + b)
+        return x
+
+    __call__ = predict
+
+
+class KerasClassifier(Classifier):
+    """
+    Keras model behind the common interface. With direct=True the model is called
+    directly, skipping the per-call data pipeline of predict().
+    """
+
+    def __init__(self, model, direct=True):
+        self.model = model
+        self.direct = direct
+
+    @property
+    def input_size(self):
+        return self.model.input_shape[-1]
+
+    def predict(self, features, verbose=None):
+        x = self.scale(features).astype(np.float32)
+        if self.direct:
+            return self.model(x, training=False).numpy()
+        return self.model.predict(x, verbose=0)
+
+    __call__ = predict
+
+
+def load_keras_model(path):
+    """Load a Keras model, importing TensorFlow only when it is actually needed."""
+    import tensorflow as tf
+
+    return tf.keras.models.load_model(path, compile=False)
+
+
+def load_classifier(path, backend="numpy"):
+    """
+    Load the classifier saved at `path` (.npz or Keras .h5) and wrap it in the
+    requested backend. Every backend returns class probabilities from predict(features).
+
+    A .npz with the "numpy" backend never imports TensorFlow. For the Keras backends
+    the .h5 saved next to the .npz is loaded and the .npz metadata is attached to it.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', choose from {BACKENDS}")
+
+    exported = None
+    if path.endswith(".npz"):
+        exported = NumpyDenseClassifier.load(path)
+        if backend == "numpy":
+            return exported
+        path = os.path.splitext(path)[0] + ".h5"
+
+    model = load_keras_model(path)
+    if backend == "numpy":
+        return NumpyDenseClassifier.from_keras(model)
+    classifier = KerasClassifier(model, direct=(backend == "direct"))
+    if exported is not None:
+        classifier.copy_metadata(exported)
+    return classifier
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', type=str, default="emg_classifier.h5", help='Keras model to check or export')
+    parser.add_argument('--runs', type=int, default=1000, help='Single-row predictions to time per backend')
+    parser.add_argument('--export', action='store_true', help='Write <model>.npz instead of checking')
+    parser.add_argument('--classes', nargs='+', help='Label classes in training order (for --export)')
+    parser.add_argument('--features', nargs='+', help='Feature columns in training order (for --export)')
+    args = parser.parse_args()
+
+    keras_model = load_keras_model(args.model)
+
+    if args.export:
+        classifier = NumpyDenseClassifier.from_keras(keras_model)
+        n_features = classifier.input_size
+        classifier.set_metadata(args.classes, args.features, np.zeros(n_features), np.ones(n_features))
+        npz_path = os.path.splitext(args.model)[0] + ".npz"
+        classifier.save(npz_path)
+        print(f"Classifier saved as {npz_path}")
+        raise SystemExit
+
+    backends = {
+        "keras": KerasClassifier(keras_model, direct=False),
+        "direct": KerasClassifier(keras_model, direct=True),
+        "numpy": NumpyDenseClassifier.from_keras(keras_model),
+    }
+    n_features = backends["numpy"].input_size
+
+    # Parity on random rows spanning the magnitude of real features
+    rng = np.random.default_rng(0)
+    X = rng.normal(0, 50, size=(512, n_features)).astype(np.float32)
+    expected = keras_model.predict(X, verbose=0)
+    for name in ("direct", "numpy"):
+        got = backends[name].predict(X)
+        print(f"{name:>6}: max |p - keras| = {np.max(np.abs(got - expected)):.2e}, "
+              f"argmax agreement {np.mean(np.argmax(got, 1) == np.argmax(expected, 1)):.1%}")
+
+    row = X[:1]
+    for name, backend in backends.items():
+        runs = args.runs if name != "keras" else max(1, args.runs // 20)
+        start = time.perf_counter()
+        for _ in range(runs):
+            backend.predict(row)
+        elapsed = (time.perf_counter() - start) / runs
+        print(f"{name:>6}: {elapsed * 1e6:10.1f} us per prediction")
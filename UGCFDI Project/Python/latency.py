@@ -0,0 +1,134 @@
+"""
+latency.py
+
+End-to-end input latency tracing, from the muscle sample that triggers a decision
+to the frame in which the dino reacts.
+
+Each decision carries a LatencyTrace with one timestamp per stage:
+    sample     block containing the newest sample of the window was read
+    window     window complete (hop due) in the classifier
+    features   feature vector computed
+    inference  model output available
+    sent       command written to the game socket
+    posted     command queued for the game loop (game_bridge.CommandQueue)
+    drained    taken by the game loop at the start of a frame
+    rendered   first frame drawn after the command was handled
+
+All stages use time.perf_counter(), which is a system-wide monotonic clock on
+Windows, Linux and macOS, so stamps taken in the classifier and in the game
+process (on the same machine) can be compared. The classifier sends its stamps
+along with the command; LatencyRecorder aggregates complete traces into
+p50/p95/p99 per stage and histograms, and exports them as JSON.
+"""
+
+import json
+import time
+
+import numpy as np
+
+STAGES = ["sample", "window", "features", "inference", "sent", "posted", "drained", "rendered"]
+
+# Histogram bins for sample -> stage latencies, in milliseconds
+HISTOGRAM_BINS_MS = [0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float("inf")]
+
+
+def now():
+    return time.perf_counter()
+
+
+class LatencyTrace:
+    """Timestamps of one decision as it moves through the pipeline."""
+
+    __slots__ = ("stamps",)
+
+    def __init__(self, stamps=None):
+        self.stamps = dict(stamps) if stamps else {}
+
+    def mark(self, stage, timestamp=None):
+        if stage not in STAGES:
+            raise ValueError(f"Unknown latency stage: {stage}")
+        self.stamps[stage] = now() if timestamp is None else timestamp
+        return self
+
+    def encode(self):
+        """Compact text form sent after the command: 'stage=seconds' pairs separated by spaces."""
+        return " ".join(f"{stage}={self.stamps[stage]:.6f}" for stage in STAGES if stage in self.stamps)
+
+    @classmethod
+    def decode(cls, text):
+        stamps = {}
+        for field in text.split():
+            stage, _, value = field.partition("=")
+            if stage in STAGES and value:
+                try:
+                    stamps[stage] = float(value)
+                except ValueError:
+                    continue  # a corrupt stamp only loses that stage, not the command
+        return cls(stamps)
+
+    def since_sample(self):
+        """Latency of every recorded stage relative to the triggering sample, in seconds."""
+        start = self.stamps.get("sample")
+        if start is None:
+            return {}
+        return {stage: t - start for stage, t in self.stamps.items()}
+
+
+class LatencyRecorder:
+    """Collects traces and reports percentiles and histograms per stage."""
+
+    def __init__(self, max_traces=100000):
+        self.max_traces = max_traces
+        self.traces = []
+
+    def add(self, trace):
+        if len(self.traces) >= self.max_traces:
+            del self.traces[:len(self.traces) // 2]
+        self.traces.append(trace)
+
+    def __len__(self):
+        return len(self.traces)
+
+    def latencies(self, stage):
+        """Sample -> stage latencies in milliseconds for the traces that reached `stage`."""
+        values = [trace.since_sample().get(stage) for trace in self.traces]
+        return np.array([v for v in values if v is not None]) * 1000
+
+    def summary(self):
+        """{stage: {"count", "p50", "p95", "p99", "max"}} in milliseconds since the sample."""
+        result = {}
+        for stage in STAGES[1:]:
+            latencies = self.latencies(stage)
+            if len(latencies) == 0:
+                continue
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            result[stage] = {"count": int(len(latencies)), "p50": float(p50), "p95": float(p95),
+                             "p99": float(p99), "max": float(np.max(latencies))}
+        return result
+
+    def histograms(self):
+        bins = np.array(HISTOGRAM_BINS_MS)
+        return {stage: np.histogram(self.latencies(stage), bins=bins)[0].tolist() for stage in STAGES[1:]}
+
+    def export(self, path):
+        """Write the summary, histograms and raw stage latencies to a JSON file."""
+        report = {
+            "clock": "time.perf_counter",
+            "unit": "ms since sample",
+            "stages": STAGES,
+            "summary": self.summary(),
+            "histogram_bins_ms": [b if b != float("inf") else None for b in HISTOGRAM_BINS_MS],
+            "histograms": self.histograms(),
+            "traces": [{stage: round(v * 1000, 4) for stage, v in trace.since_sample().items()}
+                       for trace in self.traces],
+        }
+        with open(path, "w") as f:
+            json.dump(report, f, indent=1)
+
+    def format_line(self, stage="rendered"):
+        """One-line p50/p95/p99 text for console output or an in-game overlay."""
+        stats = self.summary().get(stage)
+        if stats is None:
+            return f"{stage}: no data"
+        return (f"sample->{stage} ms  p50 {stats['p50']:.1f}  p95 {stats['p95']:.1f}  "
+                f"p99 {stats['p99']:.1f}  (n={stats['count']})")
@@ -1,47 +1,102 @@
 """
 model_training.py
 
-This script loads features.csv (with enhanced features),
-encodes the movement labels,
-trains a neural network classifier using TensorFlow/Keras, and saves the model.
+This script cuts the recordings in data/ into the same sliding windows the
+real-time classifier uses (see training_windows.py), computes the features of
+every window, encodes the movement labels,
+trains a neural network classifier using TensorFlow/Keras, and saves the model
+(Keras .h5 plus a NumPy-only .npz for the real-time scripts).
+
+Usage: python model_training.py [--data data] [--window 100] [--overlap 0] [--extended | --features auc rms ...]
+       python model_training.py --features-csv [features.csv]   (old mode: one row per recording from a features CSV)
+The ordered feature list is saved with the model (feature_columns in the .npz), and
+the real-time scripts compute exactly those features (see feature_registry.py).
+Recordings (not windows) are split into training and test sets, so windows of one
+recording never end up on both sides. The training windows are shuffled across
+recordings again on every epoch.
 """
 
+import argparse
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 import tensorflow as tf
 
+from feature_registry import FEATURES, select_features
+from inference import NumpyDenseClassifier
+from replay import load_recordings
+from training_windows import tf_window_dataset
+
 keras = tf.keras
 
-# Load features dataset (ensure features.csv has the new feature columns)
-data = pd.read_csv("features.csv")
-# Use the enhanced feature set: auc, mean, std, rms, max, min, mean_deriv, std_deriv
-feature_columns = ["auc", "mean", "std", "rms", "max", "min", "mean_deriv", "std_deriv"]
-X = data[feature_columns].values
-labels = data["label"].values
-print("Labels:", labels)
+parser = argparse.ArgumentParser()
+parser.add_argument('--data', type=str, default="data", help='Folder with data_<label>_<timestamp>.csv recordings, or a recording store')
+parser.add_argument('--window', type=int, default=100, help='Window size in samples (WINDOW_SIZE in OGrtc.py)')
+parser.add_argument('--overlap', type=float, default=0, help='Overlap between windows (OVERLAP_PERCENTAGE in OGrtc.py)')
+parser.add_argument('--extended', action='store_true', help='Use the 20-feature set instead of the basic 8')
+parser.add_argument('--features', nargs='+', choices=list(FEATURES), help='Train on these features, in this order')
+parser.add_argument('--features-csv', nargs='?', const="features.csv", help='Train on this features CSV (default features.csv; one row per recording) instead')
+args = parser.parse_args()
+
+# Features in model input order (default: auc, mean, std, rms, max, min, mean_deriv, std_deriv)
+feature_columns = select_features(args.extended, args.features)
 
 # Encode string labels to integers
 le = LabelEncoder()
-y_encoded = le.fit_transform(labels)
-num_classes = len(le.classes_)
-y = keras.utils.to_categorical(y_encoded, num_classes)
 
-# Split data into training and testing sets
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+if args.features_csv:
+    # Load features dataset (ensure features.csv has the new feature columns)
+    data = pd.read_csv(args.features_csv)
+    X = data[feature_columns].values
+    labels = data["label"].values
+    print("Labels:", labels)
+
+    y_encoded = le.fit_transform(labels)
+    num_classes = len(le.classes_)
+    y = keras.utils.to_categorical(y_encoded, num_classes)
+
+    # Split data into training and testing sets
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    train_data = (X_train, y_train)
+    validation_data = (X_test, y_test)
+else:
+    recordings = load_recordings(args.data)
+    labels = [label for label, _, _ in recordings]
+    print("Recordings per label:", dict(zip(*np.unique(labels, return_counts=True))))
+    le.fit(labels)
+    num_classes = len(le.classes_)
+
+    # Split data into training and testing sets
+    train_recordings, test_recordings = train_test_split(recordings, test_size=0.2, random_state=42, stratify=labels)
+    # Training windows are reshuffled on every epoch; validation keeps the recording order
+    train_data = tf_window_dataset(train_recordings, le, args.window, args.overlap, features=feature_columns,
+                                   shuffle=True, seed=42)
+    validation_data = tf_window_dataset(test_recordings, le, args.window, args.overlap, features=feature_columns)
 
 # Define a neural network model
 model = keras.models.Sequential([
-    keras.layers.Dense(32, activation='relu', input_shape=(X_train.shape[1],)),
+    keras.layers.Dense(32, activation='relu', input_shape=(len(feature_columns),)),
     keras.layers.Dense(32, activation='relu'),
     keras.layers.Dense(num_classes, activation='softmax')  # Output layer: softmax gives probabilities
 ])
 
 model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
-model.fit(X_train, y_train, epochs=150, batch_size=4, validation_data=(X_test, y_test))
+if args.features_csv:
+    model.fit(*train_data, epochs=150, batch_size=4, validation_data=validation_data)
+else:
+    # The window datasets are already batched
+    model.fit(train_data, epochs=150, validation_data=validation_data)
 
 # Save the trained model
 model.save("emg_classifier.h5")
 print("Trained classes:", le.classes_)
 print("Model saved as emg_classifier.h5")
+
+# Save a TensorFlow-free copy for the real-time scripts: weights, label classes,
+# feature order and feature scaling (features are not scaled during training, so identity)
+runtime_model = NumpyDenseClassifier.from_keras(model)
+runtime_model.set_metadata(le.classes_, feature_columns,
+                           np.zeros(len(feature_columns)), np.ones(len(feature_columns)))
+runtime_model.save("emg_classifier.npz")
+print("Runtime model saved as emg_classifier.npz")
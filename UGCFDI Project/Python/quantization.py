@@ -0,0 +1,334 @@
+"""
+quantization.py
+
+Post-training quantization of the Dense classifier exported by model_training.py
+(emg_classifier.npz):
+- float16:      weights and biases stored as float16, half the size; they are
+                widened back to float32 when loaded, so predictions only differ
+                by the float16 rounding
+- int8-weights: int8 weights with one scale per output unit, a quarter of the
+                size, also widened to float32 when loaded
+
+Full int8 (int8 weights and int8 activations, Int8DenseClassifier below with
+exact integer accumulation) is only an offline accuracy experiment: it is
+evaluated in the report but not saved, and load_classifier() does not run it.
+
+int8 activations need the range of every layer input. It is calibrated by
+running the float model on calibration rows (features.csv by default, the rows the
+shipped model was trained on; --data/--window for the sliding windows used by
+model_training.py's default mode). Each input channel gets its own range, mapped
+onto -127..127 around its midpoint, because the raw features have very different
+magnitudes (auc vs mean_deriv) and offsets (ADC readings around 500). Those
+steps and midpoints are folded into the int8 weights and the float bias, as is the
+model's feature scaling.
+
+Size is what quantization buys here, not speed. Single-row predict() of the
+shipped 8-32-32-3 model (best of 5, one core):
+- float32, float16, int8-weights: ~34 us. The last two run as float32 once
+  loaded, so they only shrink the file
+- full int8: ~47-55 us. Quantizing the activations adds a round and a clip per
+  layer, and NumPy has no int8 matmul to win that back on layers this small; the
+  weights are float32 in memory too. That is why it is not a deployable export
+
+Full int8 keeps its accuracy when the layer inputs have compact ranges. With
+unscaled, heavy-tailed inputs (the 20-feature model: wavelet_energy spans 10 to
+3.6e5) the outliers set the activation steps, typical values collapse onto a few
+levels and the report shows large accuracy deltas (--percentile clips the
+calibration ranges).
+
+The report compares each quantized model with the float one on the same rows:
+accuracy per class and its delta, agreement of the predicted labels, the largest
+probability difference, parameter bytes and time per single-row prediction.
+
+Usage: python quantization.py [--model emg_classifier.npz] [--csv features.csv] [--mode all]
+       python quantization.py --data data --window 100
+writes emg_classifier_<float16|int8-weights>.npz next to the model; load them
+like the float export (OGrtc.py's MODEL_PATH, load_classifier()).
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from inference import ACTIVATIONS, Classifier, NumpyDenseClassifier, load_classifier
+
+MODES = ("float16", "int8-weights")
+
+
+def save_float16(classifier, path):
+    """Save a NumpyDenseClassifier with float16 weights and biases."""
+    half = NumpyDenseClassifier([w.astype(np.float16) for w in classifier.weights],
+                                [b.astype(np.float16) for b in classifier.biases],
+                                classifier.activations)
+    half.copy_metadata(classifier).save(path)
+
+
+def quantize_columns(w):
+    """Symmetric int8 weights with one scale per output unit (column): w ~ q * scale."""
+    scale = np.max(np.abs(w), axis=0) / 127
+    scale = np.where(scale > 0, scale, 1)
+    return np.rint(w / scale).astype(np.int8), scale
+
+
+def save_int8_weights(classifier, path):
+    """Save a NumpyDenseClassifier with int8 weights; load() widens them to float32."""
+    arrays = {"quantization": np.array("int8-weights"), "layers": np.array(len(classifier.weights)),
+              "activations": np.array(classifier.activations)}
+    for i, (w, b) in enumerate(zip(classifier.weights, classifier.biases)):
+        arrays[f"W{i}"], arrays[f"w_scale{i}"] = quantize_columns(w)
+        arrays[f"b{i}"] = b
+    arrays.update(classifier.metadata_arrays())
+    np.savez(path, **arrays)
+
+
+def unscaled_layers(classifier):
+    """
+    (weights, biases) with the model's feature scaling folded into the first layer:
+    ((x - mean) / scale) @ w + b = x @ (w / scale) + (b - (mean / scale) @ w)
+    """
+    weights = [w.astype(np.float64) for w in classifier.weights]
+    biases = [b.astype(np.float64) for b in classifier.biases]
+    if classifier.feature_mean is not None:
+        w = weights[0]
+        weights[0] = w / classifier.feature_scale[:, None]
+        biases[0] = biases[0] - (classifier.feature_mean / classifier.feature_scale) @ w
+    return weights, biases
+
+
+def layer_inputs(weights, biases, activations, X):
+    """Input of every layer of the float model for the calibration rows X."""
+    x = np.asarray(X, dtype=np.float64)
+    inputs = []
+    for w, b, activation in zip(weights, biases, activations):
+        inputs.append(x)
+        x = ACTIVATIONS[activation](x @ w + b)
+    return inputs
+
+
+class Int8DenseClassifier(Classifier):
+    """
+    Dense layers with int8 weights and int8 activations: the offline experiment of
+    this script, never saved or loaded by load_classifier(). Each layer quantizes
+    its input per channel, multiplies the integers and rescales:
+        q = clip(round((x - input_zero) / input_step), -127, 127)
+        x = activation((q @ W) * weight_scale + bias)
+    The input steps are folded into the int8 weights and the zero points into the
+    float bias by quantize_int8(), so nothing else is needed at prediction time.
+
+    q @ W runs as a float32 BLAS product of the integer values: every product and
+    partial sum is an integer below 2**24 (127 * 127 * inputs, for up to 1040
+    inputs per layer), so float32 holds it exactly and the result is the same as
+    int32 accumulation, without NumPy's slow integer matmul. The weights are
+    therefore kept as float32 (integer valued) in memory.
+
+    predict() runs in buffers allocated once per batch size. A relu or linear layer
+    followed by another layer is rescaled straight onto the next layer's input
+    grid: max(y, 0) quantized with (step, zero) is max(y / step - zero / step,
+    -zero / step), so one multiply and one add give the values to round, and relu
+    becomes the lower bound of the clip.
+    """
+
+    def __init__(self, weights, weight_scales, input_steps, input_zeros, biases, activations):
+        if not len(weights) == len(weight_scales) == len(input_steps) == len(input_zeros) == len(biases) == len(activations):
+            raise ValueError("every quantized layer needs weights, scales, input steps/zeros, bias and activation")
+        if max(np.shape(w)[0] for w in weights) * 127 * 127 >= 2**24:
+            raise ValueError("Layers with more than 1040 inputs cannot be accumulated exactly in float32")
+        for activation in activations:
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation: {activation}")
+        self._weights = [np.asarray(w, dtype=np.int8).astype(np.float32) for w in weights]
+        self.weight_scales = [np.asarray(s, dtype=np.float32) for s in weight_scales]
+        self.input_steps = [np.asarray(s, dtype=np.float32) for s in input_steps]
+        self.input_zeros = [np.asarray(z, dtype=np.float32) for z in input_zeros]
+        self.biases = [np.asarray(b, dtype=np.float32) for b in biases]
+        self.activations = [str(a) for a in activations]
+        self._rows = None
+        self._buffers = None
+
+        # Input quantization of the first layer: q = x * scale + shift, rounded and clipped
+        step, zero = self.input_steps[0].astype(np.float64), self.input_zeros[0].astype(np.float64)
+        self._input = ((1 / step).astype(np.float32), (-zero / step).astype(np.float32))
+        # Per layer: (scale, shift, lower bound) onto the next layer's input grid, or None to
+        # apply the activation unfolded (last layer, or activations other than relu/linear)
+        self._rescale = []
+        for i, activation in enumerate(self.activations):
+            if i + 1 == len(self.activations) or activation not in ("relu", "linear"):
+                self._rescale.append(None)
+                continue
+            step, zero = self.input_steps[i + 1].astype(np.float64), self.input_zeros[i + 1].astype(np.float64)
+            scale = self.weight_scales[i] / step
+            shift = (self.biases[i] - zero) / step
+            low = np.maximum(np.rint(-zero / step), -127) if activation == "relu" else np.full(len(zero), -127.0)
+            self._rescale.append(tuple(a.astype(np.float32) for a in (scale, shift, low)))
+
+    @property
+    def parameter_bytes(self):
+        """Bytes the int8 weights, scales, input steps/zeros and biases would take in a file."""
+        return sum(w.size for w in self._weights) + sum(
+            a.nbytes for arrays in (self.weight_scales, self.input_steps, self.input_zeros, self.biases) for a in arrays)
+
+    @property
+    def input_size(self):
+        return self._weights[0].shape[0]
+
+    @property
+    def num_classes(self):
+        return self._weights[-1].shape[1]
+
+    def _allocate(self, rows):
+        self._rows = rows
+        self._buffers = [np.empty((rows, w.shape[0]), dtype=np.float32) for w in self._weights]
+        self._buffers.append(np.empty((rows, self.num_classes), dtype=np.float32))
+
+    @staticmethod
+    def _round_clip(q, low):
+        np.rint(q, out=q)
+        np.maximum(q, low, out=q)
+        np.minimum(q, 127, out=q)
+
+    def predict(self, features, verbose=None):
+        x = self.scale(features)
+        if x.shape[0] != self._rows:
+            self._allocate(x.shape[0])
+        buffers = self._buffers
+        q = buffers[0]
+        np.multiply(x, self._input[0], out=q, casting="same_kind")
+        np.add(q, self._input[1], out=q)
+        self._round_clip(q, -127)
+        last = len(self._weights) - 1
+        for i, w in enumerate(self._weights):
+            out = buffers[i + 1]
+            np.matmul(q, w, out=out)
+            rescale = self._rescale[i]
+            if rescale is not None:
+                # Straight onto the next layer's int8 grid
+                np.multiply(out, rescale[0], out=out)
+                np.add(out, rescale[1], out=out)
+                self._round_clip(out, rescale[2])
+            else:
+                np.multiply(out, self.weight_scales[i], out=out)
+                np.add(out, self.biases[i], out=out)
+                x = ACTIVATIONS[self.activations[i]](out)
+                if i == last:
+                    # A new array: the caller may keep it past the next predict()
+                    return x if x is not out else out.copy()
+                step, zero = self.input_steps[i + 1], self.input_zeros[i + 1]
+                np.subtract(x, zero, out=out)
+                np.divide(out, step, out=out)
+                self._round_clip(out, -127)
+            q = out
+
+    __call__ = predict
+
+
+def quantize_int8(classifier, X, percentile=100.0):
+    """
+    Int8DenseClassifier calibrated on the rows X. Each layer input channel is
+    clipped to its [100 - percentile, percentile] percentile range of the calibration
+    rows; percentile=100 keeps the full min..max range.
+    """
+    float_weights, float_biases = unscaled_layers(classifier)
+    weights, weight_scales, steps, zeros, biases = [], [], [], [], []
+    for x, w, b in zip(layer_inputs(float_weights, float_biases, classifier.activations, X), float_weights, float_biases):
+        low = np.percentile(x, 100 - percentile, axis=0)
+        high = np.percentile(x, percentile, axis=0)
+        zero = (high + low) / 2
+        step = (high - low) / 254
+        # Constant channels quantize to 0, which is exactly their value
+        step = np.where(step > 0, step, 1).astype(np.float32)
+        # x ~ zero + step * q, so x @ w = q @ (step * w) + zero @ w
+        q, scale = quantize_columns(step[:, None] * w)
+        weights.append(q)
+        weight_scales.append(scale)
+        steps.append(step)
+        zeros.append(zero)
+        biases.append(b + zero @ w)
+    quantized = Int8DenseClassifier(weights, weight_scales, steps, zeros, biases, classifier.activations)
+    # The feature scaling is part of the first layer now
+    return quantized.set_metadata(classifier.label_classes, classifier.feature_columns)
+
+
+def per_class_accuracy(probabilities, labels, classes):
+    predicted = np.asarray(classes)[np.argmax(probabilities, axis=1)]
+    return {c: float(np.mean(predicted[labels == c] == c)) for c in classes if np.any(labels == c)}
+
+
+def parameter_bytes(path):
+    """Bytes of weights, biases and quantization constants in a saved .npz."""
+    with np.load(path, allow_pickle=False) as data:
+        return sum(data[key].nbytes for key in data.files if key[0] in "Wbwi" and key != "layers")
+
+
+def time_per_prediction(classifier, row, runs=400, repeats=5):
+    """Best of `repeats` timings, so a busy machine does not reorder the models."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(runs):
+            classifier.predict(row)
+        best = min(best, (time.perf_counter() - start) / runs)
+    return best
+
+
+def calibration_rows(args, feature_columns):
+    """(X, labels) from a features CSV or from the sliding windows of the recordings."""
+    if args.data:
+        from replay import load_recordings
+        from training_windows import window_dataset
+
+        X, labels = window_dataset(load_recordings(args.data), args.window, args.overlap, features=feature_columns)
+        return X, labels.astype(str)
+    import pandas as pd
+
+    data = pd.read_csv(args.csv)
+    return data[feature_columns].values.astype(float), data["label"].values.astype(str)
+
+
+if __name__ == "__main__":
+    from feature_registry import model_features
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', type=str, default="emg_classifier.npz", help='Float .npz export from model_training.py')
+    parser.add_argument('--csv', type=str, default="features.csv", help='Calibration and evaluation rows')
+    parser.add_argument('--data', type=str, help='Use the sliding windows of these recordings instead of --csv')
+    parser.add_argument('--window', type=int, default=100, help='Window size in samples for --data')
+    parser.add_argument('--overlap', type=float, default=0, help='Overlap between windows for --data')
+    parser.add_argument('--mode', choices=MODES + ("all",), default="all", help='Which export to write')
+    parser.add_argument('--percentile', type=float, default=100.0, help='Clip the full int8 activation ranges to this percentile')
+    args = parser.parse_args()
+
+    model = load_classifier(args.model)
+    feature_columns = model_features(model)
+    X, labels = calibration_rows(args, feature_columns)
+    classes = model.label_classes
+    print(f"{len(X)} calibration rows from {args.data or args.csv}")
+
+    base = os.path.splitext(args.model)[0]
+    exports = {mode: f"{base}_{mode}.npz" for mode in MODES if args.mode in (mode, "all")}
+    if "float16" in exports:
+        save_float16(model, exports["float16"])
+    if "int8-weights" in exports:
+        save_int8_weights(model, exports["int8-weights"])
+    models = {mode: (load_classifier(path), parameter_bytes(path)) for mode, path in exports.items()}
+    int8 = quantize_int8(model, X, args.percentile)
+    models["int8"] = (int8, int8.parameter_bytes)
+
+    reference = model.predict(X)
+    reference_accuracy = per_class_accuracy(reference, labels, classes)
+    row = X[:1]
+    print(f"{'model':>12} {'bytes':>7} {'us/pred':>8} {'agree':>7} {'max |dp|':>9}  "
+          + "  ".join(f"{c:>16}" for c in reference_accuracy))
+    print(f"{'float32':>12} {parameter_bytes(args.model):>7} {time_per_prediction(model, row) * 1e6:>8.1f} "
+          f"{'':>7} {'':>9}  " + "  ".join(f"{a:>16.3f}" for a in reference_accuracy.values()))
+    for name, (quantized, size) in models.items():
+        probabilities = quantized.predict(X)
+        accuracy = per_class_accuracy(probabilities, labels, classes)
+        agree = np.mean(np.argmax(probabilities, 1) == np.argmax(reference, 1))
+        cells = [f"{accuracy[c]:.3f} ({accuracy[c] - reference_accuracy[c]:+.3f})" for c in reference_accuracy]
+        print(f"{name:>12} {size:>7} {time_per_prediction(quantized, row) * 1e6:>8.1f} "
+              f"{agree:>7.1%} {np.max(np.abs(probabilities - reference)):>9.4f}  "
+              + "  ".join(f"{cell:>16}" for cell in cells))
+    print("Per-class accuracy against the labels, (delta) against the float32 model. int8 is "
+          "the offline full-int8 experiment (not saved). Saved: " + ", ".join(exports.values()))
@@ -8,32 +8,29 @@ processing a sliding window of data, and using the trained model to predict the
 import serial
 import time
 import numpy as np
-import tensorflow as tf
-from collections import deque
 
-# Load the trained model
-model = tf.keras.models.load_model("emg_classifier.h5")
-# Define label classes as per the training (update these based on your actual labels)
-label_classes = ['index_finger_up', 'wrist_flexion', 'rest']  # Example labels
+from feature_registry import model_features
+from inference import load_classifier
+from streaming_features import StreamingFeatures
+
+# Load the trained model. The .npz export loads with NumPy only (no TensorFlow import);
+# "direct"/"keras" load the .h5 saved next to it and need TensorFlow
+MODEL_PATH = "emg_classifier.npz"
+INFERENCE_BACKEND = "numpy"  # "numpy", "direct" (model(x, training=False)) or "keras" (model.predict)
+model = load_classifier(MODEL_PATH, backend=INFERENCE_BACKEND)
+# Label classes in training order, stored with the model
+label_classes = model.label_classes
 
 # Parameters for the sliding window
 window_size = 100  # Number of samples in each window
-data_buffer = deque(maxlen=window_size)
+# Features the model was trained on, in its input order (this script used to compute
+# 5 ad-hoc features for an 8-input model); classifies on every new sample (hop=1)
+feature_engine = StreamingFeatures(window_size, hop=1, features=model_features(model))
 
 # Open serial connection (adjust port if necessary)
 ser = serial.Serial('COM4', 9600)
 time.sleep(2)
 
-def extract_features(window):
-    """Extract features from a list of sensor values."""
-    window = np.array(window)
-    mean_val = np.mean(window)
-    std_val = np.std(window)
-    rms_val = np.sqrt(np.mean(np.square(window)))
-    max_val = np.max(window)
-    min_val = np.min(window)
-    return np.array([mean_val, std_val, rms_val, max_val, min_val]).reshape(1, -1)
-
 print("Starting real-time classification. Press Ctrl+C to stop.")
 
 try:
@@ -41,10 +38,10 @@ try:
         line = ser.readline().decode('utf-8').strip()
         try:
             value = int(line)
-            data_buffer.append(value)
+            feature_engine.push(time.time(), value)
             # Once we have enough samples, extract features and classify
-            if len(data_buffer) == window_size:
-                features = extract_features(list(data_buffer))
+            if feature_engine.hop_due():
+                features = feature_engine.features()
                 prediction = model.predict(features)
                 predicted_label = label_classes[np.argmax(prediction)]
                 print(f"Predicted movement: {predicted_label}")
@@ -0,0 +1,189 @@
+"""
+recording_store.py
+
+Append-only binary store for EMG recordings, replacing one small CSV per session.
+
+A store is a folder with three files:
+    timestamps.f8   float64 timestamps of every sample, all sessions back to back
+    values.i2       int16 ADC readings, same order
+    sessions.csv    one row per session: session, label, start_time, offset, count,
+                    sample_rate, subject, source
+
+The sample files are opened with np.memmap, so loading the whole corpus is a single
+mmap and session() returns zero-copy slices of it. New sessions are appended to the
+end of the sample files first and then indexed; bytes left behind by an interrupted
+append are discarded on the next one.
+
+Usage: python recording_store.py [--store recordings] [--import data] [--subject name]
+--import adds the data_<label>_<timestamp>.csv files of a folder (files already in the
+store are skipped), then a summary of the store is printed.
+"""
+
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+TIMESTAMPS_FILE = "timestamps.f8"
+VALUES_FILE = "values.i2"
+INDEX_FILE = "sessions.csv"
+SESSION_COLUMNS = ["session", "label", "start_time", "offset", "count", "sample_rate", "subject", "source"]
+
+TIMESTAMP_DTYPE = np.dtype("<f8")
+VALUE_DTYPE = np.dtype("<i2")
+
+
+def sample_rate(timestamps):
+    """
+    Average samples per second over the session (0 if unknown). Host timestamps of
+    lines read in bursts repeat, so the span is used rather than per-sample periods.
+    """
+    if len(timestamps) < 2:
+        return 0.0
+    span = timestamps[-1] - timestamps[0]
+    return float((len(timestamps) - 1) / span) if span > 0 else 0.0
+
+
+class RecordingStore:
+    """Reader/writer for one store folder (created on first use)."""
+
+    def __init__(self, path="recordings"):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        index_path = os.path.join(path, INDEX_FILE)
+        if os.path.exists(index_path):
+            self.sessions = pd.read_csv(index_path, keep_default_na=False)
+        else:
+            self.sessions = pd.DataFrame(columns=SESSION_COLUMNS)
+        self._timestamps = None
+        self._values = None
+
+    def __len__(self):
+        return len(self.sessions)
+
+    @property
+    def total_samples(self):
+        if len(self.sessions) == 0:
+            return 0
+        last = self.sessions.iloc[-1]
+        return int(last["offset"] + last["count"])
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _map(self, name, dtype):
+        count = self.total_samples
+        if count == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._file(name), dtype=dtype, mode='r', shape=(count,))
+
+    @property
+    def timestamps(self):
+        """Timestamps of the whole corpus (read-only memmap)."""
+        if self._timestamps is None:
+            self._timestamps = self._map(TIMESTAMPS_FILE, TIMESTAMP_DTYPE)
+        return self._timestamps
+
+    @property
+    def values(self):
+        """ADC values of the whole corpus (read-only memmap)."""
+        if self._values is None:
+            self._values = self._map(VALUES_FILE, VALUE_DTYPE)
+        return self._values
+
+    def session(self, i):
+        """(timestamps, values) of session `i` as zero-copy views."""
+        row = self.sessions.iloc[i]
+        start, end = int(row["offset"]), int(row["offset"] + row["count"])
+        return self.timestamps[start:end], self.values[start:end]
+
+    def iter_sessions(self, labels=None):
+        """Yield (label, timestamps, values) for every session, optionally only `labels`."""
+        for i, label in enumerate(self.sessions["label"]):
+            if labels is None or label in labels:
+                timestamps, values = self.session(i)
+                yield label, timestamps, values
+
+    def sources(self):
+        return set(self.sessions["source"])
+
+    def append(self, label, timestamps, values, subject="", source=""):
+        """Add one session and return its number."""
+        timestamps = np.asarray(timestamps, dtype=TIMESTAMP_DTYPE)
+        values = np.asarray(values)
+        if len(timestamps) != len(values) or len(values) == 0:
+            raise ValueError("A session needs the same, non-zero number of timestamps and values")
+        if not np.all(np.mod(values, 1) == 0):
+            raise ValueError("Values must be integer ADC readings")
+        info = np.iinfo(VALUE_DTYPE)
+        if values.min() < info.min or values.max() > info.max:
+            raise ValueError(f"Values must fit in {VALUE_DTYPE.name}")
+
+        offset = self.total_samples
+        for name, data in ((TIMESTAMPS_FILE, timestamps), (VALUES_FILE, values.astype(VALUE_DTYPE))):
+            with open(self._file(name), 'ab') as f:
+                f.truncate(offset * data.itemsize)  # drop bytes from an interrupted append
+                f.write(data.tobytes())
+
+        session = int(self.sessions["session"].max()) + 1 if len(self.sessions) else 0
+        row = pd.DataFrame([[session, label, float(timestamps[0]), offset, len(values),
+                             sample_rate(timestamps), subject, source]], columns=SESSION_COLUMNS)
+        index_path = self._file(INDEX_FILE)
+        row.to_csv(index_path, mode='a', header=not os.path.exists(index_path), index=False)
+        self.sessions = pd.concat([self.sessions, row], ignore_index=True) if len(self.sessions) else row
+
+        # The memmaps cover the old length, remap on next access
+        self._timestamps = None
+        self._values = None
+        return session
+
+
+def import_csv_folder(store, data_folder="data", subject=""):
+    """
+    Append every data_<label>_<timestamp>.csv in `data_folder` (sorted by name) whose
+    filename is not in the store yet (the filename carries the recording time, so the
+    copies in data/ and extra_files/data/ are imported once). Returns the number of
+    sessions added.
+    """
+    imported = store.sources()
+    added = 0
+    for file in sorted(glob.glob(os.path.join(data_folder, "*.csv"))):
+        basename = os.path.basename(file)
+        parts = basename.split('_')
+        if len(parts) < 3 or basename in imported:
+            continue
+        df = pd.read_csv(file)
+        if 'value' not in df.columns or len(df) == 0:
+            continue
+        values = df['value'].values
+        # Without timestamps, assume the original 100 Hz (delay(10)) sampling
+        timestamps = df['timestamp'].values if 'timestamp' in df.columns else np.arange(len(df)) * 0.01
+        try:
+            store.append(parts[1], timestamps, values, subject=subject, source=basename)
+        except ValueError as e:
+            print(f"Skipping {file}: {e}")
+            continue
+        added += 1
+    return added
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--store', type=str, default="recordings", help='Store folder')
+    parser.add_argument('--import', dest='import_folder', type=str, help='Import the CSV recordings of this folder')
+    parser.add_argument('--subject', type=str, default="", help='Subject recorded in the imported sessions')
+    args = parser.parse_args()
+
+    store = RecordingStore(args.store)
+    if args.import_folder:
+        added = import_csv_folder(store, args.import_folder, subject=args.subject)
+        print(f"Imported {added} sessions from {args.import_folder}")
+
+    print(f"{args.store}: {len(store)} sessions, {store.total_samples} samples")
+    if len(store):
+        summary = store.sessions.groupby("label").agg(sessions=("session", "count"), samples=("count", "sum"),
+                                                      sample_rate=("sample_rate", "median"))
+        print(summary.to_string())
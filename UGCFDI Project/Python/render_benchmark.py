@@ -0,0 +1,89 @@
+"""
+render_benchmark.py
+
+Headless frame rate and CPU benchmark of the dino_game.py render loop, using SDL's
+dummy video and audio drivers (no window or sound card needed).
+
+Each render mode (dino_game.py --render) plays the same scripted game uncapped for
+--frames frames, one game step (1/120 s) per frame, so a cloud comes every 360
+frames; it jumps every 60 frames and ducks every 150. Reported per mode:
+- frames per second and CPU time per frame (process time, so other processes do
+  not count), and the share of a 120 FPS frame budget that CPU time uses
+- the average fraction of the window passed to display.update(); with a real
+  display that is the part copied to the screen every frame
+
+The CPU time not spent rendering is what the classifier running alongside gets
+(dino_game.py --bridge inprocess, or OGrtc.py on the same machine).
+
+Usage: python render_benchmark.py [--frames 3000] [--modes dirty full]
+"""
+
+import argparse
+import os
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+from dino_game import FPS, RENDER_MODES, DinoGame
+from game_sim import STEP
+
+
+class UpdateCounter:
+    """Wraps pygame.display.update to add up the area of the updated rects."""
+
+    def __init__(self, screen_rect):
+        self.screen_rect = screen_rect
+        self.screen_area = screen_rect.width * screen_rect.height
+        self.area = 0
+        self.calls = 0
+        self._update = pygame.display.update
+
+    def __call__(self, rects=None):
+        self.calls += 1
+        if rects is None:
+            self.area += self.screen_area
+        else:
+            rects = [rects] if isinstance(rects, pygame.Rect) else rects
+            clipped = [self.screen_rect.clip(rect) for rect in rects if rect]
+            self.area += sum(rect.width * rect.height for rect in clipped)
+        return self._update(rects)
+
+
+def run_mode(mode, frames, warmup=200):
+    game = DinoGame(render=mode, fps=0)
+    counter = UpdateCounter(game.screen.get_rect())
+    pygame.display.update = counter
+    try:
+        for i in range(warmup + frames):
+            if i == warmup:
+                counter.area = counter.calls = 0
+                start_wall, start_cpu = time.perf_counter(), time.process_time()
+            if i % 60 == 0:
+                game.sim.command("jump")
+            if i % 150 == 75:
+                game.sim.command("duck")
+            game.frame(elapsed=STEP)
+        wall = time.perf_counter() - start_wall
+        cpu = time.process_time() - start_cpu
+    finally:
+        pygame.display.update = counter._update
+        pygame.quit()
+    return {"fps": frames / wall, "cpu_ms": cpu / frames * 1000,
+            "updated": counter.area / counter.calls / counter.screen_area}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=3000, help='Frames to time per mode')
+    parser.add_argument('--modes', nargs='+', choices=RENDER_MODES, default=list(RENDER_MODES), help='Render modes to compare')
+    args = parser.parse_args()
+
+    budget_ms = 1000 / FPS
+    print(f"{'mode':>6} {'fps':>8} {'cpu ms/frame':>13} {'of 120 FPS budget':>18} {'window updated':>15}")
+    for mode in args.modes:
+        result = run_mode(mode, args.frames)
+        print(f"{mode:>6} {result['fps']:>8.0f} {result['cpu_ms']:>13.3f} {result['cpu_ms'] / budget_ms:>18.1%} "
+              f"{result['updated']:>15.1%}")
@@ -0,0 +1,208 @@
+"""
+replay.py
+
+Hardware-free stand-ins for the Arduino, fed from the recordings in data/.
+
+- ReplaySource: a sample source (same read_block()/close() interface as
+  acquisition.SerialSource) that plays data_<label>_<timestamp>.csv files back
+  in real time, accelerated, or as fast as possible.
+- FakeSerialDevice: a pseudo-terminal that writes the recordings in the same
+  ASCII (or binary frame) format as emg_sensor.ino, so scripts that open a serial
+  port can run unchanged.
+
+Usage: python replay.py [--data data] [--speed 1.0] [--binary] [--link COM4]
+Creates a fake serial device and prints its path. With --link COM4 a symlink named
+COM4 is created in the current folder; pyserial on Linux/macOS opens serial.Serial('COM4')
+as that relative path, so the scripts' hardcoded port works as is.
+"""
+
+import glob
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from recording_store import INDEX_FILE, RecordingStore
+from serial_protocol import encode_frames
+
+
+def load_recordings(data_folder="data", labels=None):
+    """
+    Load data_<label>_<timestamp>.csv files (sorted by name) as a list of
+    (label, timestamps, values) tuples. `data_folder` can also be a
+    recording_store.py store, whose sessions are read from the memory map.
+    """
+    if os.path.exists(os.path.join(data_folder, INDEX_FILE)):
+        return [(label, np.asarray(ts), vs.astype(np.int64))
+                for label, ts, vs in RecordingStore(data_folder).iter_sessions(labels)]
+
+    recordings = []
+    for file in sorted(glob.glob(os.path.join(data_folder, "*.csv"))):
+        parts = os.path.basename(file).split('_')
+        if len(parts) < 3:
+            continue
+        label = parts[1]
+        if labels is not None and label not in labels:
+            continue
+        df = pd.read_csv(file)
+        if 'value' not in df.columns or len(df) == 0:
+            continue
+        timestamps = df['timestamp'].values if 'timestamp' in df.columns else np.arange(len(df)) * 0.01
+        recordings.append((label, timestamps.astype(float), df['value'].values))
+    return recordings
+
+
+class ReplaySource:
+    """
+    Plays recordings back as one continuous stream of (timestamps, values) blocks.
+
+    speed: 1.0 replays in real time, 10.0 ten times faster, None as fast as possible.
+    Timestamps are rebased so the stream is monotonic across recordings; when paced,
+    they are on the host clock (time.time()) like the live serial readers.
+    """
+
+    def __init__(self, recordings, speed=1.0, block_size=16, loop=False):
+        if not recordings:
+            raise ValueError("No recordings to replay")
+        self.speed = speed
+        self.block_size = block_size
+        self.loop = loop
+        self.labels = [label for label, _, _ in recordings]
+
+        # Concatenate into one timeline, leaving one median sample period between recordings
+        timestamps = []
+        values = []
+        offset = 0.0
+        for _, ts, vs in recordings:
+            period = np.median(np.diff(ts)) if len(ts) > 1 else 0.01
+            period = period if period > 0 else 0.01
+            rebased = ts - ts[0] + offset
+            timestamps.append(rebased)
+            values.append(vs)
+            offset = rebased[-1] + period
+        self.timestamps = np.concatenate(timestamps)
+        self.values = np.concatenate(values)
+        self.duration = offset
+        self._pos = 0
+        self._laps = 0
+        self._start = None
+
+    @property
+    def exhausted(self):
+        return not self.loop and self._pos >= len(self.values)
+
+    def read_block(self):
+        if self._start is None:
+            self._start = time.time()
+        if self._pos >= len(self.values):
+            if not self.loop:
+                time.sleep(0.01)  # behave like a serial read timeout
+                return np.empty(0), np.empty(0, dtype=self.values.dtype)
+            self._pos = 0
+            self._laps += 1
+
+        end = min(self._pos + self.block_size, len(self.values))
+        timestamps = self.timestamps[self._pos:end] + self._laps * self.duration
+        values = self.values[self._pos:end]
+        self._pos = end
+
+        if self.speed:
+            # Wait until the last sample of the block is "due"
+            due = self._start + timestamps[-1] / self.speed
+            delay = due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            return self._start + timestamps / self.speed, values
+        return timestamps, values
+
+    def close(self):
+        pass
+
+
+class FakeSerialDevice:
+    """
+    Pseudo-terminal fed by a ReplaySource in a background thread.
+    `port` is the path of the slave side, to be opened with serial.Serial(port).
+    """
+
+    def __init__(self, source, binary=False):
+        import pty
+        import tty
+
+        self.source = source
+        self.binary = binary
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)  # no echo or newline translation
+        self.port = os.ttyname(self._slave)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="fake-serial", daemon=True)
+        self._seq = 0
+        self._t0 = None
+        self.samples_written = 0
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(1.0)
+        os.close(self._master)
+        os.close(self._slave)
+
+    def _encode(self, timestamps, values):
+        if self.binary:
+            if self._t0 is None:
+                self._t0 = timestamps[0]
+            seq = np.arange(self._seq, self._seq + len(values))
+            self._seq += len(values)
+            return encode_frames(seq, ((timestamps - self._t0) * 1e6).astype(np.int64), values)
+        # Serial.println() terminates lines with \r\n
+        return "".join(f"{int(v)}\r\n" for v in values).encode()
+
+    def _run(self):
+        while not self._stop.is_set() and not self.source.exhausted:
+            timestamps, values = self.source.read_block()
+            if len(values) == 0:
+                continue
+            try:
+                os.write(self._master, self._encode(timestamps, values))
+            except OSError:
+                break
+            self.samples_written += len(values)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', type=str, default="data", help='Folder with data_<label>_<timestamp>.csv recordings, or a recording store')
+    parser.add_argument('--speed', type=float, default=1.0, help='Replay speed (1.0 = real time, 0 = as fast as possible)')
+    parser.add_argument('--binary', action='store_true', help='Write binary frames instead of ASCII lines')
+    parser.add_argument('--loop', action='store_true', help='Start over when the recordings run out')
+    parser.add_argument('--link', type=str, help='Also create a symlink with this name (e.g. COM4) to the device')
+    args = parser.parse_args()
+
+    source = ReplaySource(load_recordings(args.data), speed=args.speed or None, loop=args.loop)
+    device = FakeSerialDevice(source, binary=args.binary).start()
+    if args.link:
+        if os.path.islink(args.link):
+            os.remove(args.link)
+        os.symlink(device.port, args.link)
+    print(f"Fake serial device on {device.port}" + (f" (linked as {args.link})" if args.link else ""))
+    print(f"Replaying {len(source.labels)} recordings, {source.duration:.1f} s. Press Ctrl+C to stop.")
+    try:
+        while device.running:
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    device.stop()
+    if args.link and os.path.islink(args.link):
+        os.remove(args.link)
+    print(f"Wrote {device.samples_written} samples")
@@ -0,0 +1,142 @@
+"""
+ring_buffer.py
+
+Fixed-capacity ring buffer of (timestamp, value) samples backed by preallocated
+NumPy arrays.
+
+Every sample is written twice (at i and i + capacity), so the most recent window
+is always one contiguous slice of the backing array: window() returns zero-copy
+views and sliding the window by a hop is just a counter, with no list/deque rebuild.
+"""
+
+import numpy as np
+
+
+def hop_size(window_size, overlap):
+    """Number of new samples between two windows for an overlap fraction in [0, 1)."""
+    if not 0 <= overlap < 1:
+        raise ValueError("overlap must be in [0, 1)")
+    return max(1, int(window_size * (1 - overlap)))
+
+
+class SampleRingBuffer:
+    """
+    Holds the last `capacity` (timestamp, value) samples.
+    If `hop` is given, hop_due()/next_window() report when the buffer is full
+    and `hop` new samples have arrived since the previous window.
+    """
+
+    def __init__(self, capacity, hop=None, value_dtype=float):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.hop = hop if hop is not None else capacity
+        self._timestamps = np.zeros(2 * capacity, dtype=float)
+        self._values = np.zeros(2 * capacity, dtype=value_dtype)
+        self._pos = -1              # index of the newest sample in [0, capacity)
+        self._size = 0
+        self._since_hop = 0
+        self.total = 0              # samples pushed since creation/clear
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def full(self):
+        return self._size == self.capacity
+
+    def clear(self):
+        self._pos = -1
+        self._size = 0
+        self._since_hop = 0
+        self.total = 0
+
+    def push(self, timestamp, value):
+        """Append one sample, overwriting the oldest one when full."""
+        pos = self._pos + 1
+        if pos == self.capacity:
+            pos = 0
+        self._timestamps[pos] = self._timestamps[pos + self.capacity] = timestamp
+        self._values[pos] = self._values[pos + self.capacity] = value
+        self._pos = pos
+        if self._size < self.capacity:
+            self._size += 1
+        self._since_hop += 1
+        self.total += 1
+
+    def extend(self, timestamps, values):
+        """Append a block of samples with slice assignments instead of a Python loop."""
+        timestamps = np.asarray(timestamps)
+        values = np.asarray(values)
+        count = len(values)
+        if count == 0:
+            return
+        self._since_hop += count
+        self.total += count
+        if count > self.capacity:
+            timestamps = timestamps[-self.capacity:]
+            values = values[-self.capacity:]
+            count = self.capacity
+
+        start = (self._pos + 1) % self.capacity
+        first = min(count, self.capacity - start)
+        for offset, length, src in ((start, first, 0), (0, count - first, first)):
+            if length == 0:
+                continue
+            for array, block in ((self._timestamps, timestamps), (self._values, values)):
+                array[offset:offset + length] = block[src:src + length]
+                array[offset + self.capacity:offset + self.capacity + length] = block[src:src + length]
+        self._pos = (start + count - 1) % self.capacity
+        self._size = min(self.capacity, self._size + count)
+
+    def _bounds(self, n):
+        if n is None:
+            n = self._size
+        elif n > self._size:
+            raise ValueError(f"requested {n} samples but only {self._size} are buffered")
+        end = self._pos + self.capacity + 1
+        return end - n, end
+
+    def window(self, n=None):
+        """Zero-copy (timestamps, values) views of the newest `n` samples, oldest first."""
+        start, end = self._bounds(n)
+        return self._timestamps[start:end], self._values[start:end]
+
+    def values(self, n=None):
+        start, end = self._bounds(n)
+        return self._values[start:end]
+
+    def timestamps(self, n=None):
+        start, end = self._bounds(n)
+        return self._timestamps[start:end]
+
+    def value_at(self, i):
+        """Value of the i-th sample in the window (negative i counts from the newest)."""
+        if i < 0:
+            i += self._size
+        return self._values[self._pos + self.capacity + 1 - self._size + i]
+
+    def timestamp_at(self, i):
+        if i < 0:
+            i += self._size
+        return self._timestamps[self._pos + self.capacity + 1 - self._size + i]
+
+    def sample_at(self, i):
+        """(timestamp, value) of the i-th sample in the window as Python scalars (negative i counts from the newest)."""
+        if i < 0:
+            i += self._size
+        i += self._pos + self.capacity + 1 - self._size
+        return self._timestamps.item(i), self._values.item(i)
+
+    def hop_due(self):
+        """True (and restarts the hop count) when the buffer is full and a hop has elapsed."""
+        if self._size == self.capacity and self._since_hop >= self.hop:
+            self._since_hop = 0
+            return True
+        return False
+
+    def next_window(self):
+        """Window views if a hop is due, otherwise None."""
+        if self.hop_due():
+            return self.window()
+        return None
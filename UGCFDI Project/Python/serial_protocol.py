@@ -0,0 +1,164 @@
+"""
+serial_protocol.py
+
+Decoder for the binary frames sent by emg_sensor.ino when BINARY_MODE is enabled.
+
+Frame layout (10 bytes, little endian):
+    byte 0     sync byte 0xA5
+    bytes 1-2  sequence counter (uint16, wraps around)
+    bytes 3-6  micros() on the Arduino when the sample was taken (uint32, wraps around)
+    bytes 7-8  sample: bits 0-9 ADC value, bits 12-15 channel (0 for the single A0 sensor)
+    byte 9     checksum: XOR of bytes 1-8
+
+FrameDecoder parses whole ser.read(ser.in_waiting) chunks with np.frombuffer, so there is
+no per-sample readline/decode/int() in Python. Corrupted or partial frames are skipped
+by searching for the next sync byte with a valid checksum.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+SYNC_BYTE = 0xA5
+FRAME_SIZE = 10
+BINARY_BAUD = 250000    # 16 MHz boards hit 250000 exactly; 1 kHz x 10 bytes uses 40% of it
+ASCII_BAUD = 9600
+VALUE_MASK = 0x03FF
+CHANNEL_SHIFT = 12
+
+FRAME_DTYPE = np.dtype([
+    ("sync", "u1"),
+    ("seq", "<u2"),
+    ("micros", "<u4"),
+    ("sample", "<u2"),
+    ("checksum", "u1"),
+])
+
+Frames = namedtuple("Frames", ["seq", "device_time", "values", "channels"])
+
+_OFFSETS = np.arange(FRAME_SIZE)
+
+
+def encode_frames(seq, micros, values, channels=0):
+    """Build binary frames (used by the replay/fake serial tools and for testing the decoder)."""
+    values = np.asarray(values)
+    frames = np.zeros(len(values), dtype=FRAME_DTYPE)
+    frames["sync"] = SYNC_BYTE
+    frames["seq"] = np.asarray(seq) & 0xFFFF
+    frames["micros"] = np.asarray(micros) & 0xFFFFFFFF
+    frames["sample"] = (values.astype(np.int64) & VALUE_MASK) | (np.asarray(channels, dtype=np.int64) << CHANNEL_SHIFT)
+    raw = frames.view(np.uint8).reshape(-1, FRAME_SIZE)
+    raw[:, 9] = np.bitwise_xor.reduce(raw[:, 1:9], axis=1)
+    return frames.tobytes()
+
+
+class FrameDecoder:
+    """
+    Incremental decoder: feed() raw bytes as they arrive and get back the complete
+    frames as arrays. Keeps the trailing partial frame for the next call and unwraps
+    the device micros() counter into seconds.
+
+    Counters: frames, dropped (forward gaps in the sequence counter), bad_bytes (bytes
+    skipped while resynchronising), restarts (the board was reset: micros() went
+    back, device time carries on from the last frame instead of wrapping).
+    Repeated or backwards sequence numbers are duplicates or restarts, not losses.
+    """
+
+    def __init__(self):
+        self._pending = b""
+        self._last_seq = None
+        self._last_micros = None
+        self._micros_offset = 0
+        self.frames = 0
+        self.dropped = 0
+        self.bad_bytes = 0
+        self.restarts = 0
+
+    def feed(self, data):
+        """Decode as many frames as possible from the buffered bytes plus `data`."""
+        if self._pending:
+            data = self._pending + data
+        buf = np.frombuffer(data, dtype=np.uint8)
+
+        count = len(buf) // FRAME_SIZE
+        aligned = buf[:count * FRAME_SIZE].reshape(count, FRAME_SIZE)
+        if count and np.all(aligned[:, 0] == SYNC_BYTE) and \
+                np.all(np.bitwise_xor.reduce(aligned[:, 1:9], axis=1) == aligned[:, 9]):
+            # Fast path: the stream is in sync, every FRAME_SIZE bytes is a frame
+            raw = aligned
+            end = count * FRAME_SIZE
+        else:
+            raw, end = self._resync(buf)
+
+        self._pending = data[end:]
+        if len(raw) == 0:
+            return Frames(*(np.empty(0, dtype=dt) for dt in (np.uint16, float, np.int16, np.uint8)))
+        frames = np.ascontiguousarray(raw).view(FRAME_DTYPE).reshape(-1)
+        return self._unpack(frames)
+
+    def _resync(self, buf):
+        """Find frames at any byte offset: sync byte followed by a matching checksum."""
+        last_start = len(buf) - FRAME_SIZE
+        if last_start < 0:
+            return buf[:0].reshape(0, FRAME_SIZE), 0
+        starts = np.flatnonzero(buf[:last_start + 1] == SYNC_BYTE)
+        candidates = buf[starts[:, None] + _OFFSETS]
+        valid = np.bitwise_xor.reduce(candidates[:, 1:9], axis=1) == candidates[:, 9]
+        starts = starts[valid]
+        candidates = candidates[valid]
+        # A sync byte inside a valid frame can pass the checksum by chance (1 in 256);
+        # drop candidates that overlap the previously kept frame. Overlaps are rare,
+        # so only those few candidates are walked in Python.
+        overlaps = np.flatnonzero(np.diff(starts) < FRAME_SIZE) + 1
+        if len(overlaps):
+            keep = np.ones(len(starts), dtype=bool)
+            for i in overlaps:
+                prev = i - 1
+                while not keep[prev]:
+                    prev -= 1
+                if starts[i] - starts[prev] < FRAME_SIZE:
+                    keep[i] = False
+            starts = starts[keep]
+            candidates = candidates[keep]
+
+        # Keep the tail that may still hold the beginning of a frame
+        end = starts[-1] + FRAME_SIZE if len(starts) else 0
+        end = max(end, last_start + 1)
+        self.bad_bytes += end - FRAME_SIZE * len(starts)
+        return candidates, end
+
+    def _unpack(self, frames):
+        seq = frames["seq"]
+        micros = frames["micros"].astype(np.int64)
+        seq64 = seq.astype(np.int64)
+        prev_seq = np.concatenate(([(seq64[0] - 1) & 0xFFFF if self._last_seq is None else self._last_seq], seq64[:-1]))
+        prev_micros = np.concatenate(([micros[0] if self._last_micros is None else self._last_micros], micros[:-1]))
+        self._last_seq = int(seq[-1])
+        self._last_micros = int(micros[-1])
+
+        # micros() overflows every ~71.6 minutes; running back by more than half its
+        # range means the board restarted (micros() and the sequence counter from 0)
+        restart = ((micros - prev_micros) & 0xFFFFFFFF) > 0x80000000
+        self.restarts += int(np.count_nonzero(restart))
+
+        # Forward sequence gaps are samples lost on the wire or in the OS buffer; a step
+        # of 0 (repeated frame) or backwards (above 0x8000) loses nothing
+        step = (seq64 - prev_seq) & 0xFFFF
+        lost = (step > 0) & (step <= 0x8000) & ~restart
+        self.dropped += int(np.sum(step[lost] - 1))
+
+        # Unwrap micros(); after a restart the device time carries on from the last frame
+        wrap = (micros < prev_micros) & ~restart
+        offsets = np.cumsum(np.where(wrap, 1 << 32, np.where(restart, prev_micros - micros, 0)))
+        unwrapped = micros + offsets + self._micros_offset
+        self._micros_offset += int(offsets[-1])
+        self.frames += len(frames)
+
+        sample = frames["sample"]
+        return Frames(seq, unwrapped * 1e-6, (sample & VALUE_MASK).astype(np.int16),
+                      (sample >> CHANNEL_SHIFT).astype(np.uint8))
+
+
+def read_frames(ser, decoder):
+    """Read whatever is waiting on `ser` (at least one frame's worth) and decode it."""
+    return decoder.feed(ser.read(max(ser.in_waiting, FRAME_SIZE)))
@@ -0,0 +1,171 @@
+"""
+spectral.py
+
+Power spectral moments (ps_moment1: mean frequency, ps_moment2: spread) of EMG
+windows, as used by the extended feature set.
+
+The original code took a full complex np.fft.fft of every window, built
+np.fft.fftfreq and a freqs >= 0 mask, then threw half of the spectrum away.
+Here:
+- np.fft.rfft only computes the non-negative half (about half the FLOPs);
+- the frequency axis is a cached table of bin numbers per window length, and dt
+  only scales the moments at the end (frequency = bin / (n * dt)), so nothing is
+  allocated for the frequency axis per window, whatever dt is;
+- SlidingDFT updates the spectrum of a sliding window in O(n) per sample, for
+  real-time paths that refresh the moments every few samples.
+
+As with fftfreq's freqs >= 0 mask, bins 0 .. (n - 1) // 2 are used (no Nyquist bin
+for even n), so the features keep their meaning.
+
+Usage: python spectral.py [--data data] [--window 200] [--hop 1]
+(compares the moments against the original fft/fftfreq code and times both paths)
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def positive_bins(n):
+    """Read-only float array of the non-negative frequency bins 0 .. (n - 1) // 2."""
+    bins = np.arange((n - 1) // 2 + 1, dtype=float)
+    bins.setflags(write=False)
+    return bins
+
+
+def moments_from_power(power, n, dt):
+    """Spectral moments from the power of bins 0 .. (n - 1) // 2 of an n-sample window."""
+    bins = positive_bins(n)
+    total_power = np.sum(power)
+    if total_power > 0:
+        mean_bin = np.sum(bins * power) / total_power
+        spread_bins = np.sqrt(np.sum(((bins - mean_bin)**2) * power) / total_power)
+        # NumPy division: a window whose timestamps are all equal (dt = 0) gives inf
+        # (nan for a DC-only spectrum) like batch_spectral_moments(), instead of raising
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scale = np.divide(1.0, n * dt)
+            return mean_bin * scale, spread_bins * scale
+    return 0, 0
+
+
+def spectral_moments(values, dt):
+    """Power spectral moments (mean frequency and spread) of a window, as in NEWdatapp.py."""
+    n = len(values)
+    power = np.abs(np.fft.rfft(values)[:len(positive_bins(n))])**2
+    return moments_from_power(power, n, dt)
+
+
+def batch_spectral_moments(values, dt):
+    """spectral_moments() of every row of `values`, with one sampling period per row."""
+    n = values.shape[1]
+    bins = positive_bins(n)
+    power = np.abs(np.fft.rfft(values, axis=1)[:, :len(bins)])**2
+    total_power = np.sum(power, axis=1)
+    has_power = total_power > 0
+    safe_total = np.where(has_power, total_power, 1)
+    scale = 1.0 / (n * dt)
+    mean_bin = np.sum(bins * power, axis=1) / safe_total
+    spread_bins = np.sqrt(np.sum(((bins - mean_bin[:, None])**2) * power, axis=1) / safe_total)
+    return np.where(has_power, mean_bin * scale, 0), np.where(has_power, spread_bins * scale, 0)
+
+
+class SlidingDFT:
+    """
+    Spectrum (bins 0 .. (n - 1) // 2) of a sliding n-sample window, updated per sample:
+        X_k <- (X_k - oldest + newest) * exp(2j * pi * k / n)
+    which costs n / 2 complex multiply-adds instead of an FFT per window. Rounding
+    errors accumulate through the rotations, so the owner should reset() from the
+    window now and then (StreamingFeatures does it every window_size samples).
+    """
+
+    def __init__(self, n):
+        self.n = n
+        bins = positive_bins(n)
+        self._twiddle = np.exp(2j * np.pi * bins / n)
+        self.spectrum = np.zeros(len(bins), dtype=complex)
+        self._power = np.empty(len(bins))
+
+    def reset(self, values):
+        """Recompute the spectrum of a full window with an FFT."""
+        self.spectrum[:] = np.fft.rfft(values)[:len(self.spectrum)]
+
+    def update(self, oldest, newest):
+        """Slide the window by one sample: `oldest` leaves, `newest` enters."""
+        self.spectrum += newest - oldest
+        self.spectrum *= self._twiddle
+
+    def moments(self, dt):
+        np.abs(self.spectrum, out=self._power)
+        self._power *= self._power
+        return moments_from_power(self._power, self.n, dt)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from replay import load_recordings
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', type=str, default="data", help='Folder with data_<label>_<timestamp>.csv recordings, or a recording store')
+    parser.add_argument('--window', type=int, default=200, help='Window size in samples')
+    parser.add_argument('--hop', type=int, default=1, help='Samples between two moment refreshes for the sliding DFT')
+    args = parser.parse_args()
+
+    def fft_moments(values, dt):
+        # The original NEWdatapp.py computation
+        power_spectrum = np.abs(np.fft.fft(values))**2
+        freqs = np.fft.fftfreq(len(values), d=dt)
+        pos_mask = freqs >= 0
+        pos_freqs = freqs[pos_mask]
+        pos_power = power_spectrum[pos_mask]
+        total_power = np.sum(pos_power)
+        if total_power == 0:
+            return 0, 0
+        ps_moment1 = np.sum(pos_freqs * pos_power) / total_power
+        return ps_moment1, np.sqrt(np.sum(((pos_freqs - ps_moment1)**2) * pos_power) / total_power)
+
+    n = args.window
+    worst = np.zeros(2)
+    timings = {"fft + fftfreq": 0.0, "rfft + bin table": 0.0, "sliding DFT": 0.0}
+    windows = 0
+    for _, timestamps, values in load_recordings(args.data):
+        values = values.astype(float)
+        if len(values) < n:
+            continue
+        sdft = SlidingDFT(n)
+        sdft.reset(values[:n])
+        for end in range(n, len(values) + 1):
+            if end > n:
+                start = time.perf_counter()
+                sdft.update(values[end - n - 1], values[end - 1])
+                if (end - n) % n == 0:
+                    sdft.reset(values[end - n:end])
+                timings["sliding DFT"] += time.perf_counter() - start
+            if (end - n) % args.hop:
+                continue
+            window = values[end - n:end]
+            dt = np.mean(np.diff(timestamps[end - n:end]))
+            if dt <= 0:
+                continue
+
+            start = time.perf_counter()
+            expected = fft_moments(window, dt)
+            timings["fft + fftfreq"] += time.perf_counter() - start
+            start = time.perf_counter()
+            rfft_result = spectral_moments(window, dt)
+            timings["rfft + bin table"] += time.perf_counter() - start
+            start = time.perf_counter()
+            sdft_result = sdft.moments(dt)
+            timings["sliding DFT"] += time.perf_counter() - start
+
+            for got in (rfft_result, sdft_result):
+                rel = np.abs(np.subtract(got, expected)) / np.maximum(np.abs(expected), 1e-9)
+                worst = np.maximum(worst, rel)
+            windows += 1
+
+    print(f"{windows} windows of {n} samples, moments refreshed every {args.hop} samples")
+    print(f"max relative difference to fft/fftfreq: ps_moment1 {worst[0]:.1e}, ps_moment2 {worst[1]:.1e}")
+    for name, seconds in timings.items():
+        print(f"{name:>18}: {seconds / max(windows, 1) * 1e6:.1f} us per refresh")
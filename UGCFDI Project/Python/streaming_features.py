@@ -0,0 +1,336 @@
+"""
+streaming_features.py
+
+Incremental sliding-window feature engine for the real-time classifiers.
+
+Instead of rebuilding the window and recomputing every statistic for each
+prediction, StreamingFeatures keeps running sums (values, squares, derivative
+moments, trapezoid areas, ...) and monotonic deques for max/min, so that
+pushing a sample and reading the feature vector are both O(1).
+
+The feature vectors match the ones produced by the training scripts:
+- basic (8):     data_preprocessing.py
+  auc, mean, std, rms, max, min, mean_deriv, std_deriv
+- extended (20): extra_files/NEWdatapp.py
+  basic + ps_moment1, ps_moment2, sparsity, irregularity_factor,
+  waveform_length_ratio, cov, tkeo, wavelet_energy, wavelet_variance,
+  wavelet_std, wavelet_wl, wavelet_entropy
+or any ordered list of features, e.g. the one a model was trained on. The
+formulas themselves live in feature_registry.py.
+
+The spectral and wavelet features of the extended set still need the whole
+window, so they are computed (only if one of them is requested) from the zero-copy ring buffer view when
+features() is called (see spectral.py; with sliding_dft=True the spectrum is
+instead updated per sample). The ring buffer is the only copy of the window:
+push() writes each sample into it and keeps only the samples at both ends of
+the window as Python floats. The wavelet band is kept by a
+streaming_wavelet.StreamingWavelet, which reuses the coefficients that did not
+change since the previous call when the hop is small (no reuse without overlap,
+see streaming_wavelet.py).
+
+The running sums cost a few microseconds of Python per sample, which only pays
+off when windows overlap a lot. With a hop above INCREMENTAL_MAX_HOP samples
+(e.g. OGrtc.py's OVERLAP_PERCENTAGE = 0, hop = window), StreamingFeatures only
+fills the ring buffer and computes each window with the batch formulas instead.
+
+batch_window_features() computes the same vectors for a whole stack of windows
+at once (offline extraction, training sets).
+
+Usage: python streaming_features.py [--extended] [--window 100] [--sliding-dft]
+(checks the streaming vectors against window_features() on the recordings in data/)
+"""
+
+from collections import deque
+
+import numpy as np
+
+from feature_registry import FEATURES, StreamWindow, batch_features, select_features, uses_group
+from ring_buffer import SampleRingBuffer
+from spectral import SlidingDFT, spectral_moments
+from streaming_wavelet import StreamingWavelet, wavelet_features
+
+# Largest hop (new samples per window) for which the running sums beat recomputing
+# every window: push() costs a few microseconds per sample, a recompute ~130 us, or
+# ~450 us with spectral/wavelet features (windows of 100 to 1000 samples)
+INCREMENTAL_MAX_HOP = 25
+INCREMENTAL_MAX_HOP_WHOLE_WINDOW = 60
+
+
+def window_features(values, timestamps, extended=False, features=None):
+    """
+    Reference (full recompute) feature vector for one window, following
+    data_preprocessing.py (basic) and NEWdatapp.py (extended), or the named
+    `features` in that order. Returns a 1-D numpy array.
+    """
+    return batch_features(values, timestamps, select_features(extended, features))
+
+
+def batch_window_features(values, timestamps, extended=False, features=None):
+    """
+    window_features() for a stack of windows: `values` and `timestamps` are
+    (n_windows, window_len) arrays (e.g. strided views from training_windows.py).
+    Returns an (n_windows, n_features) array, every feature computed with axis-wise
+    NumPy operations over all windows at once.
+
+    Each row reduces in the same order as the 1-D code, so the result is identical
+    to calling window_features() on every row.
+    """
+    return batch_features(values, timestamps, select_features(extended, features))
+
+
+class StreamingFeatures:
+    """
+    Sliding window of the last `window_size` (timestamp, value) samples with
+    running statistics, so that push() and features() cost O(1) per sample
+    (except the spectral/wavelet part of the extended set).
+
+    Sums of integer ADC readings are exact in float64, so the running values agree
+    with a full recompute up to the last bit or two. Sums that can drift (trapezoid
+    areas, non-integer samples) are recomputed from the buffered samples once
+    every `window_size` pushes, which keeps the amortized cost constant.
+
+    The samples live only in the SampleRingBuffer. The two oldest and two newest
+    samples are also kept as Python floats, so push() reads a single sample back
+    from the buffer per eviction, the running sums never turn into np.float64
+    arithmetic and nothing is copied when a window view is needed.
+
+    `hop`: new samples between two windows, see hop_due() (default: `window_size`).
+
+    `incremental` chooses between the running sums and a recompute of the ring
+    buffer view on every features() call (the window_features() formulas). By
+    default the running sums are used up to a hop of INCREMENTAL_MAX_HOP samples
+    (INCREMENTAL_MAX_HOP_WHOLE_WINDOW if spectral or wavelet features are selected).
+
+    `features` selects the features and their order (default: the basic 8, or the
+    extended 20 with extended=True); only the spectrum and wavelet band needed by
+    those features are computed.
+
+    sliding_dft=True keeps the spectrum of the extended set up to date with a
+    spectral.SlidingDFT on every push instead of an FFT per features() call. That
+    only pays off when features are read every few samples (small hops), and is
+    ignored without the running sums.
+    """
+
+    def __init__(self, window_size, extended=False, hop=None, sliding_dft=False, features=None, incremental=None):
+        self.window_size = window_size
+        self.hop = hop if hop is not None else window_size
+        self.feature_names = select_features(extended, features)
+        whole_window = uses_group(self.feature_names, "spectral") or uses_group(self.feature_names, "wavelet")
+        if incremental is None:
+            incremental = self.hop <= (INCREMENTAL_MAX_HOP_WHOLE_WINDOW if whole_window else INCREMENTAL_MAX_HOP)
+        self.incremental = incremental
+        self._stream = [FEATURES[name].stream for name in self.feature_names]
+        self.buffer = SampleRingBuffer(window_size, self.hop)
+        if not incremental:
+            # Nothing to update per sample, the window is recomputed by features()
+            self.push = self.buffer.push
+        spectral = incremental and uses_group(self.feature_names, "spectral")
+        self._sdft = SlidingDFT(window_size) if spectral and sliding_dft else None
+        wavelet = incremental and uses_group(self.feature_names, "wavelet")
+        self._wavelet = StreamingWavelet(window_size) if wavelet else None
+        self._wavelet_total = None          # buffer.total when the wavelet band was last computed
+        self.reset()
+
+    def reset(self):
+        self.buffer.clear()
+        self._wavelet_total = None
+        self._max_q = deque()               # (index, value), values decreasing
+        self._min_q = deque()               # (index, value), values increasing
+        self._since_resync = 0
+
+        # Two oldest and two newest samples, so push() reads the buffer once per eviction
+        self._first_timestamp = self._first = 0.0
+        self._second_timestamp = self._second = 0.0
+        self._last_timestamp = self._last = 0.0
+        self._before_last = 0.0
+
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._sum_abs = 0.0
+        self._area = 0.0                    # sum of trapezoid areas between consecutive samples
+        self._diff_sq = 0.0                 # sum of squared first differences
+        self._diff_abs = 0.0                # sum of absolute first differences
+        self._lag2 = 0.0                    # sum of v[i] * v[i + 2], used by TKEO
+
+    def __len__(self):
+        return len(self.buffer)
+
+    @property
+    def ready(self):
+        """True once the window holds `window_size` samples."""
+        return self.buffer.full
+
+    def hop_due(self):
+        """True (and restarts the hop count) when the window is full and `hop` samples arrived since the last time."""
+        return self.buffer.hop_due()
+
+    def push(self, timestamp, value):
+        """Add one sample, evicting the oldest one once the window is full."""
+        timestamp = float(timestamp)
+        value = float(value)
+        buffer = self.buffer
+        size = len(buffer)
+        was_full = size == self.window_size
+        if was_full:
+            oldest = self._evict()
+            size -= 1
+
+        if size:
+            last = self._last
+            diff = value - last
+            self._area += 0.5 * (timestamp - self._last_timestamp) * (value + last)
+            self._diff_sq += diff * diff
+            self._diff_abs += abs(diff)
+            if size >= 2:
+                self._lag2 += self._before_last * value
+            if size == 1:
+                self._second_timestamp, self._second = timestamp, value
+        else:
+            self._first_timestamp, self._first = timestamp, value
+        self._before_last = self._last
+        self._last_timestamp, self._last = timestamp, value
+
+        buffer.push(timestamp, value)
+        if was_full and self._sdft is not None:
+            self._sdft.update(oldest, value)
+        self._sum += value
+        self._sum_sq += value * value
+        self._sum_abs += abs(value)
+
+        index = buffer.total
+        while self._max_q and self._max_q[-1][1] <= value:
+            self._max_q.pop()
+        self._max_q.append((index, value))
+        while self._min_q and self._min_q[-1][1] >= value:
+            self._min_q.pop()
+        self._min_q.append((index, value))
+
+        self._since_resync += 1
+        if self._since_resync >= self.window_size:
+            self._resync()
+
+    def extend(self, timestamps, values):
+        """Push a block of samples."""
+        if not self.incremental:
+            self.buffer.extend(np.asarray(timestamps, dtype=float), np.asarray(values, dtype=float))
+            return
+        for timestamp, value in zip(timestamps, values):
+            self.push(timestamp, value)
+
+    def _evict(self):
+        """Remove the contributions of the oldest sample before push() overwrites it; returns its value."""
+        buffer = self.buffer
+        oldest_timestamp, oldest = self._first_timestamp, self._first
+        size = self.window_size - 1
+        if size:
+            second_timestamp, second = self._second_timestamp, self._second
+            diff = second - oldest
+            self._diff_sq -= diff * diff
+            self._diff_abs -= abs(diff)
+            self._area -= 0.5 * (second_timestamp - oldest_timestamp) * (second + oldest)
+            if size >= 2:
+                # The third sample becomes the second (push() fills it in for a window of 2)
+                self._second_timestamp, self._second = buffer.sample_at(2)
+                self._lag2 -= oldest * self._second
+            self._first_timestamp, self._first = second_timestamp, second
+        self._sum -= oldest
+        self._sum_sq -= oldest * oldest
+        self._sum_abs -= abs(oldest)
+
+        # Indices in the monotonic deques are 1-based push counts
+        first_index = buffer.total - size + 1
+        if self._max_q[0][0] < first_index:
+            self._max_q.popleft()
+        if self._min_q[0][0] < first_index:
+            self._min_q.popleft()
+        return oldest
+
+    def _resync(self):
+        """Recompute the running sums from the buffer to cancel floating point drift."""
+        self._since_resync = 0
+        timestamps, values = self.buffer.window()
+        diffs = np.diff(values)
+        self._sum = float(np.sum(values))
+        self._sum_sq = float(np.sum(values * values))
+        self._sum_abs = float(np.sum(np.abs(values)))
+        self._area = float(np.sum(0.5 * np.diff(timestamps) * (values[1:] + values[:-1])))
+        self._diff_sq = float(np.sum(diffs * diffs))
+        self._diff_abs = float(np.sum(np.abs(diffs)))
+        self._lag2 = float(np.sum(values[:-2] * values[2:])) if len(values) >= 3 else 0.0
+        if self._sdft is not None and self.buffer.full:
+            self._sdft.reset(values)
+
+    def values(self):
+        """Zero-copy view of the current window values."""
+        return self.buffer.values()
+
+    def features(self):
+        """
+        Feature vector of the current window, shaped (1, n_features)
+        so it can be fed to the model directly.
+        """
+        n = len(self.buffer)
+        if n == 0:
+            raise ValueError("StreamingFeatures window is empty")
+        if not self.incremental:
+            timestamps, values = self.buffer.window()
+            return batch_features(values, timestamps, self.feature_names).reshape(1, -1)
+
+        sums = (self._sum, self._sum_sq, self._sum_abs, self._area, self._diff_sq, self._diff_abs, self._lag2)
+        window = StreamWindow(n, sums, self._first, self._last, self._max_q[0][1], self._min_q[0][1],
+                              self._last_timestamp - self._first_timestamp, self._spectral_moments,
+                              self._wavelet_features)
+        return np.array([stream(window) for stream in self._stream], dtype=float).reshape(1, -1)
+
+    def _spectral_moments(self, dt):
+        if self._sdft is not None and self.ready:
+            return self._sdft.moments(dt)
+        return spectral_moments(self.buffer.values(), dt)
+
+    def _wavelet_features(self):
+        buffer = self.buffer
+        if not buffer.full:
+            return wavelet_features(buffer.values())
+        # Reuses the interior detail coefficients when the window moved by a multiple of 8
+        total = buffer.total
+        shift = total - self._wavelet_total if self._wavelet_total is not None else None
+        self._wavelet_total = total
+        return self._wavelet.features(buffer.values(), shift)
+
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+    import os
+
+    import pandas as pd
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', type=str, default="data", help='Folder with data_<label>_<timestamp>.csv recordings')
+    parser.add_argument('--window', type=int, default=100, help='Window size in samples')
+    parser.add_argument('--extended', action='store_true', help='Check the 20-feature set instead of the basic 8')
+    parser.add_argument('--files', type=int, default=20, help='Number of recordings to check')
+    parser.add_argument('--sliding-dft', action='store_true', help='Use the per-sample sliding DFT for the spectral moments')
+    args = parser.parse_args()
+
+    worst = np.zeros(len(select_features(args.extended)))
+    checked = 0
+    for file in sorted(glob.glob(os.path.join(args.data, "*.csv")))[:args.files]:
+        df = pd.read_csv(file)
+        values = df['value'].values
+        timestamps = df['timestamp'].values
+        # Features are read after every sample, so hop=1 (running sums)
+        engine = StreamingFeatures(args.window, extended=args.extended, hop=1, sliding_dft=args.sliding_dft)
+        for i, (t, v) in enumerate(zip(timestamps, values)):
+            engine.push(t, v)
+            if engine.ready:
+                start = i + 1 - args.window
+                expected = window_features(values[start:i + 1], timestamps[start:i + 1], args.extended)
+                got = engine.features()[0]
+                rel = np.abs(got - expected) / np.maximum(np.abs(expected), 1e-9)
+                worst = np.maximum(worst, rel)
+                checked += 1
+
+    for name, err in zip(engine.feature_names, worst):
+        print(f"{name:>22}: max relative error {err:.2e}")
+    print(f"Checked {checked} windows")
@@ -0,0 +1,156 @@
+"""
+training_windows.py
+
+Windowed training sets: instead of one feature row per recording (features.csv),
+every recording is cut into the same sliding windows the real-time classifier
+sees (WINDOW_SIZE samples every hop_size(WINDOW_SIZE, OVERLAP_PERCENTAGE)), and
+each window becomes one training example.
+
+Windows are strided views of the recordings (np.lib.stride_tricks.sliding_window_view),
+so no window is copied, and their features are computed for a whole recording at
+once with streaming_features.batch_window_features().
+
+Usage: python training_windows.py [--data data] [--window 100] [--overlap 0] [--extended]
+(prints the number of windows per label, then times and checks the batched features
+against window_features() on every window; they should be identical)
+"""
+
+import numpy as np
+
+from ring_buffer import hop_size
+from feature_registry import select_features
+from streaming_features import batch_window_features
+
+
+def sliding_windows(timestamps, values, window_size, hop):
+    """
+    (timestamps, values) of every full window of one recording, as read-only
+    (n_windows, window_size) views. Windows start every `hop` samples.
+    """
+    timestamps = np.asarray(timestamps)
+    values = np.asarray(values)
+    if len(values) < window_size:
+        return np.empty((0, window_size), dtype=timestamps.dtype), np.empty((0, window_size), dtype=values.dtype)
+    view = np.lib.stride_tricks.sliding_window_view
+    return view(timestamps, window_size)[::hop], view(values, window_size)[::hop]
+
+
+def recording_window_features(recordings, window_size=100, overlap=0, extended=False, features=None):
+    """
+    Yield (label, features) per recording, features being an (n_windows, n_features) array
+    of the basic 8, extended 20 or named `features`.
+    `recordings` is a list of (label, timestamps, values), e.g. from replay.load_recordings().
+    """
+    hop = hop_size(window_size, overlap)
+    for label, timestamps, values in recordings:
+        # Widen int16 store values so squares and products cannot overflow
+        ts_windows, value_windows = sliding_windows(timestamps, np.asarray(values, dtype=np.int64), window_size, hop)
+        if len(value_windows):
+            yield label, batch_window_features(value_windows, ts_windows, extended, features)
+
+
+def window_batches(recordings, window_size=100, overlap=0, extended=False, batch_size=256, features=None):
+    """
+    Yield (features, labels) batches of at most `batch_size` windows, in recording order.
+    Only the windows of the recordings being batched are held in memory.
+    """
+    width = len(select_features(extended, features))
+    pending_x = np.empty((0, width))
+    pending_y = np.empty(0, dtype=object)
+    for label, rows in recording_window_features(recordings, window_size, overlap, extended, features):
+        pending_x = np.concatenate([pending_x, rows])
+        pending_y = np.concatenate([pending_y, np.full(len(rows), label, dtype=object)])
+        while len(pending_x) >= batch_size:
+            yield pending_x[:batch_size], pending_y[:batch_size]
+            pending_x, pending_y = pending_x[batch_size:], pending_y[batch_size:]
+    if len(pending_x):
+        yield pending_x, pending_y
+
+
+def window_count(recordings, window_size=100, overlap=0):
+    """Number of full windows in `recordings`, without computing any features."""
+    hop = hop_size(window_size, overlap)
+    return sum((len(values) - window_size) // hop + 1 for _, _, values in recordings if len(values) >= window_size)
+
+
+def window_dataset(recordings, window_size=100, overlap=0, extended=False, features=None):
+    """All windows of `recordings` as (features, labels) arrays."""
+    width = len(select_features(extended, features))
+    xs = []
+    ys = []
+    for label, rows in recording_window_features(recordings, window_size, overlap, extended, features):
+        xs.append(rows)
+        ys.append(np.full(len(rows), label, dtype=object))
+    if not xs:
+        return np.empty((0, width)), np.empty(0, dtype=object)
+    return np.concatenate(xs), np.concatenate(ys)
+
+
+def tf_window_dataset(recordings, label_encoder, window_size=100, overlap=0, extended=False, batch_size=256,
+                      features=None, shuffle=False, seed=None):
+    """
+    Batched tf.data.Dataset of (features, one-hot labels) generated from the windows
+    of `recordings` on every epoch; `label_encoder` is a fitted sklearn LabelEncoder.
+
+    shuffle=True (training sets) visits the recordings in a new order on every
+    epoch and shuffles the windows across all of them, so a batch is not a run of
+    adjacent windows of one recording. Otherwise batches follow the recording
+    order (validation sets).
+    """
+    import tensorflow as tf
+
+    width = len(select_features(extended, features))
+    num_classes = len(label_encoder.classes_)
+    rng = np.random.default_rng(seed)
+
+    def generate():
+        # Called again on every epoch
+        order = rng.permutation(len(recordings)) if shuffle else range(len(recordings))
+        for x, labels in window_batches([recordings[i] for i in order], window_size, overlap, extended,
+                                        batch_size, features):
+            one_hot = np.eye(num_classes, dtype=np.float32)[label_encoder.transform(labels)]
+            yield x.astype(np.float32), one_hot
+
+    dataset = tf.data.Dataset.from_generator(generate, output_signature=(
+        tf.TensorSpec(shape=(None, width), dtype=tf.float32),
+        tf.TensorSpec(shape=(None, num_classes), dtype=tf.float32),
+    ))
+    if shuffle:
+        # A buffer as large as the training set shuffles it completely (8-20 floats per window)
+        buffer_size = max(1, window_count(recordings, window_size, overlap))
+        dataset = dataset.unbatch().shuffle(buffer_size, seed=seed, reshuffle_each_iteration=True).batch(batch_size)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from replay import load_recordings
+    from streaming_features import window_features
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', type=str, default="data", help='Folder with data_<label>_<timestamp>.csv recordings, or a recording store')
+    parser.add_argument('--window', type=int, default=100, help='Window size in samples')
+    parser.add_argument('--overlap', type=float, default=0, help='Overlap fraction between windows')
+    parser.add_argument('--extended', action='store_true', help='Use the 20-feature set instead of the basic 8')
+    args = parser.parse_args()
+
+    recordings = load_recordings(args.data)
+    start = time.perf_counter()
+    X, labels = window_dataset(recordings, args.window, args.overlap, args.extended)
+    elapsed = time.perf_counter() - start
+    print(f"{len(X)} windows from {len(recordings)} recordings in {elapsed:.2f} s")
+    for label, count in zip(*np.unique(labels, return_counts=True)):
+        print(f"{label:>10}: {count}")
+
+    # Same windows, one window_features() call each
+    hop = hop_size(args.window, args.overlap)
+    expected = []
+    start = time.perf_counter()
+    for _, timestamps, values in recordings:
+        ts_windows, value_windows = sliding_windows(timestamps, values, args.window, hop)
+        expected += [window_features(v, t, args.extended) for v, t in zip(value_windows, ts_windows)]
+    print(f"Per-window window_features(): {time.perf_counter() - start:.2f} s")
+    mismatches = np.sum(np.any(X != np.array(expected).reshape(X.shape), axis=1))
+    print(f"Windows differing from window_features(): {mismatches}")
@@ -1,151 +1,113 @@
+import os
 import pygame
 import sys
-import random
+
+# The game rules (fixed 1/120 s steps, see game_sim.py) and the assets live in the Python folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Python"))
+from asset_cache import CACTI, DINO_DUCKING, DINO_RUNNING, GROUND_SIZE, PTERO, shared
+from game_sim import CACTUS_SIZE, CLOUD_SIZE, DUCK_SIZE, HIGH_JUMP, PTERO_SIZE, RUN_SIZE, FixedTimestep, GameSim
 
 pygame.init()
 screen = pygame.display.set_mode((1280, 720))
 clock = pygame.time.Clock()
 pygame.display.set_caption("Dino Game")
 
-game_font = pygame.font.Font(None, 24)
+# Every image, sound and font, loaded once before the game starts (no disk reads per spawn)
+assets = shared().preload()
+
+game_font = assets.font(None, 24)
 
 # Classes
 
 
+# Sprites draw the bodies of the game state between its last two steps (alpha)
+
+
+def drawn_rect(image, body, alpha):
+    x, y = body.position(alpha)
+    return image.get_rect(center=(round(x), round(y)))
+
+
 class Cloud(pygame.sprite.Sprite):
-    def __init__(self, image, x_pos, y_pos):
+    def __init__(self, image, body):
         super().__init__()
         self.image = image
-        self.x_pos = x_pos
-        self.y_pos = y_pos
-        self.rect = self.image.get_rect(center=(self.x_pos, self.y_pos))
+        self.body = body
+        self.rect = drawn_rect(self.image, body, 1.0)
 
-    def update(self):
-        self.rect.x -= 1
+    def update(self, alpha):
+        self.rect = drawn_rect(self.image, self.body, alpha)
 
 
 class Dino(pygame.sprite.Sprite):
-    def __init__(self, x_pos, y_pos):
+    def __init__(self, sim):
         super().__init__()
-        self.running_sprites = []
-        self.ducking_sprites = []
-
-        self.running_sprites.append(pygame.transform.scale(
-            pygame.image.load("Universal-Game-Controller-for-Disabled-Individuals/UGCFDI Project/assets/Dino1.png"), (80, 100)))
-        self.running_sprites.append(pygame.transform.scale(
-            pygame.image.load("Universal-Game-Controller-for-Disabled-Individuals/UGCFDI Project/assets/Dino2.png"), (80, 100)))
-
-        self.ducking_sprites.append(pygame.transform.scale(
-            pygame.image.load(f"Universal-Game-Controller-for-Disabled-Individuals/UGCFDI Project/assets/DinoDucking1.png"), (110, 60)))
-        self.ducking_sprites.append(pygame.transform.scale(
-            pygame.image.load(f"Universal-Game-Controller-for-Disabled-Individuals/UGCFDI Project/assets/DinoDucking2.png"), (110, 60)))
-
-        self.x_pos = x_pos
-        self.y_pos = y_pos
-        self.current_image = 0
-        self.image = self.running_sprites[self.current_image]
-        self.rect = self.image.get_rect(center=(self.x_pos, self.y_pos))
-        self.velocity = 50
-        self.gravity = 4.5
-        self.ducking = False
+        self.running_sprites = assets.images(DINO_RUNNING, RUN_SIZE)
+        self.ducking_sprites = assets.images(DINO_DUCKING, DUCK_SIZE)
+
+        self.sim = sim
+        self.image = self.running_sprites[0]
+        self.rect = drawn_rect(self.image, sim.dino, 1.0)
 
     def jump(self):
         jump_sfx.play()
-        if self.rect.centery >= 360:
-            while self.rect.centery - self.velocity > 40:
-                self.rect.centery -= 1
+        self.sim.command("jump")
 
     def duck(self):
-        self.ducking = True
-        self.rect.centery = 380
+        self.sim.command("duck")
 
     def unduck(self):
-        self.ducking = False
-        self.rect.centery = 360
-
-    def apply_gravity(self):
-        if self.rect.centery <= 360:
-            self.rect.centery += self.gravity
-
-    def update(self):
-        self.animate()
-        self.apply_gravity()
+        self.sim.command("run")
 
-    def animate(self):
-        self.current_image += 0.05
-        if self.current_image >= 2:
-            self.current_image = 0
+    @property
+    def ducking(self):
+        return self.sim.ducking
 
-        if self.ducking:
-            self.image = self.ducking_sprites[int(self.current_image)]
-        else:
-            self.image = self.running_sprites[int(self.current_image)]
+    def update(self, alpha):
+        sprites = self.ducking_sprites if self.sim.ducking else self.running_sprites
+        self.image = sprites[int(self.sim.dino.frame)]
+        self.rect = drawn_rect(self.image, self.sim.dino, alpha)
 
 
 class Cactus(pygame.sprite.Sprite):
-    def __init__(self, x_pos, y_pos):
+    def __init__(self, body):
         super().__init__()
-        self.x_pos = x_pos
-        self.y_pos = y_pos
-        self.sprites = []
-        for i in range(1, 7):
-            current_sprite = pygame.transform.scale(
-                pygame.image.load(f"Universal-Game-Controller-for-Disabled-Individuals/UGCFDI Project/assets/cacti/cactus{i}.png"), (100, 100))
-            self.sprites.append(current_sprite)
-        self.image = random.choice(self.sprites)
-        self.rect = self.image.get_rect(center=(self.x_pos, self.y_pos))
+        self.body = body
+        self.sprites = assets.images(CACTI, CACTUS_SIZE)
+        self.image = self.sprites[body.variant]
+        self.rect = drawn_rect(self.image, body, 1.0)
 
-    def update(self):
-        self.x_pos -= game_speed
-        self.rect = self.image.get_rect(center=(self.x_pos, self.y_pos))
+    def update(self, alpha):
+        self.rect = drawn_rect(self.image, self.body, alpha)
 
 
 class Ptero(pygame.sprite.Sprite):
-    def __init__(self):
+    def __init__(self, body):
         super().__init__()
-        self.x_pos = 1300
-        self.y_pos = random.choice([280, 295, 350])
-        self.sprites = []
-        self.sprites.append(
-            pygame.transform.scale(
-                pygame.image.load("Universal-Game-Controller-for-Disabled-Individuals/UGCFDI Project/assets/Ptero1.png"), (84, 62)))
-        self.sprites.append(
-            pygame.transform.scale(
-                pygame.image.load("Universal-Game-Controller-for-Disabled-Individuals/UGCFDI Project/assets/Ptero2.png"), (84, 62)))
-        self.current_image = 0
-        self.image = self.sprites[self.current_image]
-        self.rect = self.image.get_rect(center=(self.x_pos, self.y_pos))
-
-    def update(self):
-        self.animate()
-        self.x_pos -= game_speed
-        self.rect = self.image.get_rect(center=(self.x_pos, self.y_pos))
-
-    def animate(self):
-        self.current_image += 0.025
-        if self.current_image >= 2:
-            self.current_image = 0
-        self.image = self.sprites[int(self.current_image)]
+        self.body = body
+        self.sprites = assets.images(PTERO, PTERO_SIZE)
+        self.image = self.sprites[0]
+        self.rect = drawn_rect(self.image, body, 1.0)
+
+    def update(self, alpha):
+        self.image = self.sprites[int(self.body.frame)]
+        self.rect = drawn_rect(self.image, self.body, alpha)
 
 # Variables
 
 
-game_speed = 7
-jump_count = 10
-player_score = 0
-game_over = False
-obstacle_timer = 0
-obstacle_spawn = False
-obstacle_cooldown = 1000
+# Speed, score, obstacle spawning and collisions, in fixed steps; ducks last while
+# the key is held
+sim = GameSim(jump_height=HIGH_JUMP, duck_time=None)
+timestep = FixedTimestep()
+sprites = {}  # game state body -> its sprite
 
 # Surfaces
 
-ground = pygame.image.load("Universal-Game-Controller-for-Disabled-Individuals/UGCFDI Project/assets/ground.png")
-ground = pygame.transform.scale(ground, (1280, 20))
+ground = assets.image("ground.png", GROUND_SIZE)
 ground_x = 0
 ground_rect = ground.get_rect(center=(640, 400))
-cloud = pygame.image.load("Universal-Game-Controller-for-Disabled-Individuals/UGCFDI Project/assets/cloud.png")
-cloud = pygame.transform.scale(cloud, (200, 80))
+cloud = assets.image("cloud.png", CLOUD_SIZE)
 
 # Groups
 cloud_group = pygame.sprite.Group()
@@ -154,28 +116,37 @@ dino_group = pygame.sprite.GroupSingle()
 ptero_group = pygame.sprite.Group()
 
 # Objects
-dinosaur = Dino(50, 360)
+dinosaur = Dino(sim)
 dino_group.add(dinosaur)
 
 # Sounds
-death_sfx = pygame.mixer.Sound("Universal-Game-Controller-for-Disabled-Individuals/UGCFDI Project/assets/sfx/lose.mp3")
-points_sfx = pygame.mixer.Sound("Universal-Game-Controller-for-Disabled-Individuals/UGCFDI Project/assets/sfx/100points.mp3")
-jump_sfx = pygame.mixer.Sound("Universal-Game-Controller-for-Disabled-Individuals/UGCFDI Project/assets/sfx/jump.mp3")
-
-# Events
-CLOUD_EVENT = pygame.USEREVENT
-pygame.time.set_timer(CLOUD_EVENT, 3000)
+death_sfx = assets.sound("sfx/lose.mp3")
+points_sfx = assets.sound("sfx/100points.mp3")
+jump_sfx = assets.sound("sfx/jump.mp3")
 
 # Functions
 
 
-def end_game():
-    global player_score, game_speed, game_over
+def sync_sprites():
+    """One sprite per cloud and obstacle of the game state; drop the ones that left the screen."""
+    for body in sim.clouds + sim.obstacles:
+        if body not in sprites:
+            if body.kind == "cloud":
+                sprites[body] = Cloud(cloud, body)
+                cloud_group.add(sprites[body])
+            else:
+                sprites[body] = Cactus(body) if body.kind == "cactus" else Ptero(body)
+                obstacle_group.add(sprites[body])
+    current = set(sim.clouds + sim.obstacles)
+    for body in [body for body in sprites if body not in current]:
+        sprites.pop(body).kill()
 
+
+def end_game():
     screen.fill("white")
     game_over_text = game_font.render("Game Over!", True, "black")
     game_over_rect = game_over_text.get_rect(center=(640, 300))
-    score_text = game_font.render(f"Score: {int(player_score)}", True, "black")
+    score_text = game_font.render(f"Score: {int(sim.score)}", True, "black")
     score_rect = score_text.get_rect(center=(640, 340))
 
     restart_button = pygame.Rect(540, 380, 200, 50)
@@ -199,20 +170,22 @@ def end_game():
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if restart_button.collidepoint(event.pos):
                     # Reset game state
-                    player_score = 0
-                    game_speed = 7
-                    cloud_group.empty()
-                    obstacle_group.empty()
-                    dinosaur.rect.centery = 360  # Reset dino position
-                    game_over = False
+                    sim.reset()
+                    timestep.reset()
+                    sync_sprites()
+                    clock.tick()  # the time on this screen is not game time
                     waiting = False
 
 
 
+clock.tick()  # game time starts now, not at pygame.init()
 while True:
+    # Real time since the last frame; the game advances by it in fixed steps
+    elapsed = clock.tick(120) / 1000
     keys = pygame.key.get_pressed()
     if keys[pygame.K_DOWN]:
-        dinosaur.duck()
+        if not dinosaur.ducking:
+            dinosaur.duck()
     else:
         if dinosaur.ducking:
             dinosaur.unduck()
@@ -220,72 +193,43 @@ while True:
         if event.type == pygame.QUIT:
             pygame.quit()
             sys.exit()
-        if event.type == CLOUD_EVENT:
-            current_cloud_y = random.randint(50, 300)
-            current_cloud = Cloud(cloud, 1380, current_cloud_y)
-            cloud_group.add(current_cloud)
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_SPACE or event.key == pygame.K_UP:
                 dinosaur.jump()
-                if game_over:
-                    game_over = False
-                    game_speed = 7
-                    player_score = 0
 
     screen.fill("white")
 
-    # Collisions
-    if pygame.sprite.spritecollide(dino_group.sprite, obstacle_group, False):
-        game_over = True
-        death_sfx.play()
-    if game_over:
+    for _ in range(timestep.advance(elapsed)):
+        sim.step()
+    for sim_event in sim.take_events():
+        if sim_event == "points":
+            points_sfx.play()
+        elif sim_event == "game_over":
+            death_sfx.play()
+    if sim.game_over:
         end_game()
 
-    if not game_over:
-        game_speed += 0.0015
-        if round(player_score, 1) % 100 == 0 and int(player_score) > 0:
-            points_sfx.play()
+    if not sim.game_over:
+        alpha = timestep.alpha
+        sync_sprites()
 
-        if pygame.time.get_ticks() - obstacle_timer >= obstacle_cooldown:
-            obstacle_spawn = True
-
-        if obstacle_spawn:
-            obstacle_random = random.randint(1, 50)
-            if obstacle_random in range(1, 7):
-                new_obstacle = Cactus(1280, 340)
-                obstacle_group.add(new_obstacle)
-                obstacle_timer = pygame.time.get_ticks()
-                obstacle_spawn = False
-            elif obstacle_random in range(7, 10):
-                new_obstacle = Ptero()
-                obstacle_group.add(new_obstacle)
-                obstacle_timer = pygame.time.get_ticks()
-                obstacle_spawn = False
-
-        player_score += 0.1
         player_score_surface = game_font.render(
-            str(int(player_score)), True, ("black"))
+            str(int(sim.score)), True, ("black"))
         screen.blit(player_score_surface, (1150, 10))
 
-        cloud_group.update()
+        cloud_group.update(alpha)
         cloud_group.draw(screen)
 
-        ptero_group.update()
-        ptero_group.draw(screen)
-
-        dino_group.update()
+        dino_group.update(alpha)
         dino_group.draw(screen)
 
-        obstacle_group.update()
+        obstacle_group.update(alpha)
         obstacle_group.draw(screen)
 
-        ground_x -= game_speed
+        distance = sim.prev_distance + (sim.distance - sim.prev_distance) * alpha
+        ground_x = -round(distance % 1280)
 
         screen.blit(ground, (ground_x, 360))
         screen.blit(ground, (ground_x + 1280, 360))
 
-        if ground_x <= -1280:
-            ground_x = 0
-
-    clock.tick(120)
     pygame.display.update()
\ No newline at end of file
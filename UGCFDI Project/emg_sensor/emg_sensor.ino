@@ -1,11 +1,70 @@
+// Set BINARY_MODE to 1 to stream fixed-size binary frames at SAMPLE_RATE_HZ
+// (decoded by Python/serial_protocol.py). 0 keeps the original ASCII output at 9600 baud.
+#define BINARY_MODE 0
+
+#if BINARY_MODE
+const unsigned long BAUD_RATE = 250000;          // Matches BINARY_BAUD in serial_protocol.py
+const unsigned long SAMPLE_RATE_HZ = 1000;       // 500-1000 Hz fits comfortably in 250000 baud
+const unsigned long SAMPLE_PERIOD_US = 1000000UL / SAMPLE_RATE_HZ;
+const byte SYNC_BYTE = 0xA5;
+
+// Electrodes read every sample period, one frame each with the channel in bits 12-15
+// (classification_server.py routes every channel to its own player). Each channel
+// adds 10 bytes per sample: keep NUM_CHANNELS * SAMPLE_RATE_HZ * 10 under ~20000
+// bytes/s at 250000 baud, e.g. 2 channels at 1000 Hz or 4 at 500 Hz.
+const byte NUM_CHANNELS = 1;
+const byte CHANNEL_PINS[] = {A0, A1, A2, A3};
+
+unsigned int sequence = 0;
+unsigned long nextSampleTime = 0;
+#endif
+
 void setup() {
-  Serial.begin(9600); //Start serial communication at 9600 baud rate 
+#if BINARY_MODE
+  Serial.begin(BAUD_RATE);
+  nextSampleTime = micros();
+#else
+  Serial.begin(9600); //Start serial communication at 9600 baud rate
+#endif
 }
 
+#if BINARY_MODE
+// Frame: sync, seq (2 bytes), micros (4 bytes), sample (2 bytes), XOR checksum of bytes 1-8
+void sendFrame(unsigned long timestamp, int muscleSignal, byte channel) {
+  byte frame[10];
+  frame[0] = SYNC_BYTE;
+  frame[1] = sequence & 0xFF;
+  frame[2] = sequence >> 8;
+  frame[3] = timestamp & 0xFF;
+  frame[4] = (timestamp >> 8) & 0xFF;
+  frame[5] = (timestamp >> 16) & 0xFF;
+  frame[6] = (timestamp >> 24) & 0xFF;
+  frame[7] = muscleSignal & 0xFF;                // bits 0-9: ADC value
+  frame[8] = ((muscleSignal >> 8) & 0x03) | (channel << 4);  // bits 12-15: channel
+  byte checksum = 0;
+  for (int i = 1; i < 9; i++) {
+    checksum ^= frame[i];
+  }
+  frame[9] = checksum;
+  Serial.write(frame, sizeof(frame));
+  sequence++;
+}
+#endif
+
 void loop() {
+#if BINARY_MODE
+  // Sample on a fixed schedule instead of delay() so the rate does not drift
+  unsigned long now = micros();
+  if ((long)(now - nextSampleTime) >= 0) {
+    nextSampleTime += SAMPLE_PERIOD_US;
+    for (byte channel = 0; channel < NUM_CHANNELS; channel++) {
+      sendFrame(micros(), analogRead(CHANNEL_PINS[channel]), channel);
+    }
+  }
+#else
   //Repeatedly run this code to read the sensor
   int muscleSignal = analogRead(A0);  // Read the processed muscle signal from A0
   Serial.println(muscleSignal);       // Output the value to the serial port
   delay(10);                          // Short delay to allow a smooth update on the plot
+#endif
 }
-
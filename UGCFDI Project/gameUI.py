@@ -1,13 +1,22 @@
+import os
 import pygame
 import sys
 import random
 
+# The shared asset cache lives in the Python folder, next to the assets
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Python"))
+from asset_cache import DINO_DUCKING, DINO_RUNNING, GROUND_SIZE, shared
+from game_sim import CLOUD_SIZE, DUCK_SIZE, RUN_SIZE
+
 pygame.init()
 screen = pygame.display.set_mode((1280, 720))
 clock = pygame.time.Clock()
 pygame.display.set_caption("Dino Game")
 
-game_font = pygame.font.Font(None, 24)
+# Every image, sound and font, loaded once before the game starts
+assets = shared().preload()
+
+game_font = assets.font(None, 24)
 
 # Classes
 
@@ -26,18 +35,8 @@ class Cloud(pygame.sprite.Sprite):
 class Dino(pygame.sprite.Sprite):
     def __init__(self, x_pos, y_pos):
         super().__init__()
-        self.running_sprites = []
-        self.ducking_sprites = []
-
-        self.running_sprites.append(pygame.transform.scale(
-            pygame.image.load("assets/Dino1.png"), (80, 100)))
-        self.running_sprites.append(pygame.transform.scale(
-            pygame.image.load("assets/Dino2.png"), (80, 100)))
-
-        self.ducking_sprites.append(pygame.transform.scale(
-            pygame.image.load(f"assets/DinoDucking1.png"), (110, 60)))
-        self.ducking_sprites.append(pygame.transform.scale(
-            pygame.image.load(f"assets/DinoDucking2.png"), (110, 60)))
+        self.running_sprites = assets.images(DINO_RUNNING, RUN_SIZE)
+        self.ducking_sprites = assets.images(DINO_DUCKING, DUCK_SIZE)
 
         self.x_pos = x_pos
         self.y_pos = y_pos
@@ -89,12 +88,10 @@ game_over = False
 
 # Surfaces
 
-ground = pygame.image.load("assets/ground.png")
-ground = pygame.transform.scale(ground, (1280, 20))
+ground = assets.image("ground.png", GROUND_SIZE)
 ground_x = 0
 ground_rect = ground.get_rect(center=(640, 400))
-cloud = pygame.image.load("assets/cloud.png")
-cloud = pygame.transform.scale(cloud, (200, 80))
+cloud = assets.image("cloud.png", CLOUD_SIZE)
 
 # Groups
 
@@ -106,9 +103,9 @@ dinosaur = Dino(50, 360)
 dino_group.add(dinosaur)
 
 # Sounds
-death_sfx = pygame.mixer.Sound("assets/sfx/lose.mp3")
-points_sfx = pygame.mixer.Sound("assets/sfx/100points.mp3")
-jump_sfx = pygame.mixer.Sound("assets/sfx/jump.mp3")
+death_sfx = assets.sound("sfx/lose.mp3")
+points_sfx = assets.sound("sfx/100points.mp3")
+jump_sfx = assets.sound("sfx/jump.mp3")
 
 # Events
 CLOUD_EVENT = pygame.USEREVENT